@@ -8,7 +8,8 @@ Mutation scatter interactive with mutation table
 
 import pandas as pd
 import numpy as np
-from dash import dcc, html
+import dash
+from dash import dcc, html, Patch, ctx
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
@@ -16,20 +17,38 @@ import plotly.subplots
 from matplotlib import patches
 from scipy.stats import beta
 import pickle
+import hashlib
+import re
 import functools
+from collections import namedtuple
+from types import SimpleNamespace
 
 from AnnoMate.ReviewDataApp import AppComponent
-from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier, freezeargs, cached_read_csv
+from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier, freezeargs, cached_read_csv, get_maf, \
+    get_maf_ids
+from AnnoMate.AppComponents.cache import file_cache
 from AnnoMate.DataTypes.PatientSampleData import PatientSampleData
 
 from cnv_suite.visualize import plot_acr_subplots, update_cnv_color_absolute, \
     update_cnv_scatter_sigma_toggle, plot_acr_interactive, add_background
-from cnv_suite.utils import calc_cn_levels, apply_segment_data_to_df, get_segment_interval_trees, switch_contigs
+from cnv_suite.utils import calc_cn_levels, switch_contigs
 
 
 
-def gen_cnv_plot_app_component():
-    """Generate CNV Plot app component"""
+def gen_cnv_plot_app_component(max_segments=None, max_mutations=None):
+    """Generate CNV Plot app component
+
+    Parameters
+    ----------
+    max_segments
+        level of detail: plot at most max_segments segments per sample, merging the most similar adjacent segments
+        (see merge_similar_segments). None (default) plots all segments.
+    max_mutations
+        level of detail: plot at most max_mutations mutations per sample, binned by genomic position and multiplicity
+        over the displayed range (see downsample_mutations). The mutations are downsampled again when the plot is
+        zoomed or panned. None (default) plots all mutations.
+    """
+    level_of_detail = dict(max_segments=max_segments, max_mutations=max_mutations)
     return AppComponent(
         'CNV Plot',
         layout=gen_cnv_plot_layout(),
@@ -39,21 +58,25 @@ def gen_cnv_plot_app_component():
             Input('cnv-color-radioitem', 'value'),
             Input('absolute-cnv-box', 'value'),  # todo implement as switch, not checkbox
             Input('cnv-button', 'n_clicks'),
-            Input('cnv_plot', 'figure'),
-            Input('sample-selection-checklist', 'options')
+            Input('cnv_plot', 'relayoutData'),
         ],
         callback_output=[
             Output('cnv_plot', 'figure'),
             Output('sample-selection-checklist', 'options'),
             Output('sample-selection-checklist', 'value'),
-            Output('cnv-button', 'n_clicks')
+            Output('cnv-button', 'n_clicks'),
+            Output('cnv-plot-state', 'data')
+        ],
+        callback_state=[
+            State('cnv-plot-state', 'data')  # what the displayed cnv_plot shows, see gen_cnv_plot
         ],
         callback_state_external=[
             State('mutation-selected-ids', 'value'),  # selected rows regardless of filtering
             State('mutation-filtered-ids', 'value')  # all rows in table after filtering
         ],
-        new_data_callback=gen_absolute_components,
-        internal_callback=internal_gen_absolute_components
+        new_data_callback=functools.partial(gen_absolute_components, **level_of_detail),
+        internal_callback=functools.partial(internal_gen_absolute_components, **level_of_detail),
+        prefetch_callback=functools.partial(prefetch_absolute_components, max_segments=max_segments)
     )
 
 def gen_cnv_plot_layout():
@@ -65,6 +88,7 @@ def gen_cnv_plot_layout():
                     id='cnv_plot',
                     figure=go.Figure()
                 ),
+                dcc.Store(id='cnv-plot-state', data=None),
             ],
             width=10),
             dbc.Col([
@@ -117,6 +141,18 @@ def calculate_error(alt, ref, purity, percentile):
     else:
         return (beta.ppf(percentile, alt, ref) - alt / (alt + ref)) / purity
 
+def calculate_errors(alt, ref, purity, percentile):
+    """Calculate error for mutation scatter error bars for arrays of mutations (vectorized calculate_error)"""
+    alt = np.asarray(alt, dtype=float)
+    ref = np.asarray(ref, dtype=float)
+    purity = np.asarray(purity, dtype=float)
+
+    error = np.zeros(alt.shape)
+    has_alt = alt != 0
+    alt, ref, purity = alt[has_alt], ref[has_alt], purity[has_alt]
+    error[has_alt] = (beta.ppf(percentile, alt, ref) - alt / (alt + ref)) / purity
+    return error
+
 def gen_mut_scatter(maf_df, mut_sigma, sample, maf_cluster_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col, maf_variant_class_col, maf_protein_change_col):
     """Generate mutation scatterplot trace.
 
@@ -174,9 +210,76 @@ def gen_mut_scatter(maf_df, mut_sigma, sample, maf_cluster_col, maf_hugo_col, ma
 
     return mut_scatter
 
+seg_allelic_cn_cols = [('mu.major', 'mu.minor'), ('hscr.a2', 'hscr.a1')]
+seg_summed_cols = ['length', 'n_probes', 'n_hets']
+
+
+def merge_similar_segments(seg_df, max_segments):
+    """Merge the most similar adjacent segments until there are at most max_segments segments.
+
+    Adjacent segments of the same contig are merged in order of similarity of their allelic copy number
+    (largest of the major and minor differences), so near-identical segments are merged first. Segments of
+    different contigs and segments with missing allelic copy number are never merged, so there may be more than
+    max_segments segments left if there are more contigs.
+
+    Merged segments span from the first start to the last end. Length and probe/het counts (seg_summed_cols) are
+    summed, other float columns are length weighted means and the remaining columns are taken from the first segment.
+
+    Parameters
+    ----------
+    seg_df: pd.DataFrame
+        segments, in genomic order, with 'Chromosome', 'Start.bp', 'End.bp' and allelic copy number columns
+        (see seg_allelic_cn_cols)
+    max_segments: int
+        maximum number of segments
+
+    Returns
+    -------
+    pd.DataFrame
+        merged segments (seg_df itself if it already has at most max_segments segments)
+    """
+    if len(seg_df) <= max_segments:
+        return seg_df
+
+    major_col, minor_col = next(
+        ((major_col, minor_col) for major_col, minor_col in seg_allelic_cn_cols if major_col in seg_df),
+        (None, None)
+    )
+    if major_col is None:
+        raise ValueError(f'Segments have no allelic copy number columns ({seg_allelic_cn_cols})')
+
+    # distance to the previous segment, infinite if it cannot be merged
+    distance = np.maximum(
+        seg_df[major_col].diff().abs().to_numpy(dtype=float),
+        seg_df[minor_col].diff().abs().to_numpy(dtype=float)
+    )
+    chromosome = seg_df['Chromosome'].astype(str).to_numpy()
+    distance[1:][chromosome[1:] != chromosome[:-1]] = np.inf
+    distance[np.isnan(distance)] = np.inf
+    distance[0] = np.inf
+
+    # keep the max_segments - 1 largest breaks between segments
+    is_break = distance == np.inf
+    is_break[1 + np.argsort(-distance[1:], kind='stable')[:max_segments - 1]] = True
+    segment_group = np.cumsum(is_break) - 1
+
+    lengths = seg_df['length'] if 'length' in seg_df else seg_df['End.bp'] - seg_df['Start.bp']
+    weights = pd.Series(lengths.to_numpy(dtype=float), index=seg_df.index).groupby(segment_group)
+    merged_df = seg_df.groupby(segment_group).first()
+    merged_df['End.bp'] = seg_df.groupby(segment_group)['End.bp'].last()
+    for col in seg_df.columns:
+        if col in seg_summed_cols:
+            merged_df[col] = seg_df[col].groupby(segment_group).sum()
+        elif col not in ['Start.bp', 'End.bp'] and pd.api.types.is_float_dtype(seg_df[col]):
+            weighted_sum = (seg_df[col] * lengths.to_numpy(dtype=float)).groupby(segment_group).sum(min_count=1)
+            merged_df[col] = weighted_sum / weights.sum()
+
+    return merged_df.reset_index(drop=True)
+
+
 @freezeargs
-@functools.lru_cache(maxsize=32)
-def gen_seg_figure(cnv_seg_fn, csize, purity=None, ploidy=None):
+@file_cache(file_args=['cnv_seg_fn'])
+def gen_seg_figure(cnv_seg_fn, csize, purity=None, ploidy=None, max_segments=None):
     """Generate a CNV Plot from given seg file, purity, and ploidy
 
     Parameters
@@ -189,12 +292,16 @@ def gen_seg_figure(cnv_seg_fn, csize, purity=None, ploidy=None):
         Tumor purity for this sample (optional)
     ploidy: float
         Tumor ploidy for this sample (optional)
+    max_segments: int
+        Merge similar adjacent segments to plot at most max_segments segments (optional, see merge_similar_segments)
 
     Returns
     -------
     (cnv_plot, cnv_seg_df_mod, start_trace, end_trace): (plotly.Figure, pd.DataFrame, int, int)
     """
     cnv_seg_df = cached_read_csv(cnv_seg_fn, sep='\t') 
+    if max_segments:
+        cnv_seg_df = merge_similar_segments(cnv_seg_df, max_segments)
     cnv_plot, cnv_seg_df_mod, start_trace, end_trace = plot_acr_interactive(cnv_seg_df, csize,
                                                                             purity=purity, ploidy=ploidy)
 
@@ -202,7 +309,7 @@ def gen_seg_figure(cnv_seg_fn, csize, purity=None, ploidy=None):
 
 
 @freezeargs
-@functools.lru_cache(maxsize=16)
+@file_cache(file_args=['cnv_seg_filenames', 'maf_fn'], disk=True)
 def gen_participant_cnv_and_maf(
     cnv_seg_filenames, 
     maf_fn, 
@@ -215,7 +322,9 @@ def gen_participant_cnv_and_maf(
     maf_chromosome_col, 
     maf_cluster_col
 ):
-    """Generate a CNV Plot to be stored in a pickle file
+    """Generate the CNV Plots and annotated maf of a participant
+
+    Cached in memory and, if a directory is set with set_disk_cache_dir, on disk.
 
     Parameters
     ----------
@@ -248,13 +357,81 @@ def gen_participant_cnv_and_maf(
         cnv_plot_dict[sample] = cnv_plot
         trace_dict[sample] = (start_trace, end_trace)
 
-    seg_trees = get_segment_interval_trees(pd.concat(cnv_seg_dict.values()))
-    participant_maf_df = gen_maf(maf_fn, purity_dict, ploidy_dict, seg_trees, maf_start_pos_col, maf_sample_id_col, maf_chromosome_col, maf_cluster_col)
+    cnv_seg_df = pd.concat(cnv_seg_dict.values())
+    participant_maf_df = gen_maf(maf_fn, purity_dict, ploidy_dict, cnv_seg_df, maf_start_pos_col, maf_sample_id_col, maf_chromosome_col, maf_cluster_col)
 
     return participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict
 
 
-def gen_maf(maf_fn, purity_dict, ploidy_dict, seg_trees, maf_start_pos_col, maf_sample_id_col, maf_chromosome_col, maf_cluster_col):
+def apply_segment_data_to_df(df, seg_df):
+    """Annotate loci with the data of the segment containing them in the same sample.
+
+    Same output as cnv_suite.utils.apply_segment_data_to_df(df, get_segment_interval_trees(seg_df)), but segments
+    are looked up with a binary search on the sorted segments of each sample and contig instead of interval trees.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        loci with 'Chromosome' (int or castable to int) and 'Start_position' columns, and optionally 'Sample_ID'
+    seg_df: pd.DataFrame
+        segments with 'Chromosome', 'Start.bp', 'End.bp' and 'length' columns, and optionally 'Sample_ID'
+
+    Returns
+    -------
+    pd.DataFrame
+        df with a reset index and the segment data columns ('.' replaced by '_' in the names, and
+        Cluster_assignment). NaN for loci outside of the segments of their sample.
+    """
+    df_copy = df.copy()
+    if 'Sample_ID' not in df_copy:
+        df_copy['Sample_ID'] = 'SAMPLE'
+    df_copy = df_copy.reset_index(drop=True)
+
+    seg_df = seg_df.astype({'Start.bp': int, 'End.bp': int})
+    if 'Sample_ID' not in seg_df:
+        seg_df['Sample_ID'] = 'SAMPLE'
+    seg_df = seg_df[seg_df['length'] > 0]
+    seg_df = seg_df.assign(contig=seg_df['Chromosome'].astype(int)).sort_values(['Sample_ID', 'contig', 'Start.bp'])
+    data_columns = seg_df.columns.drop(['Sample_ID', 'Chromosome', 'Start.bp', 'End.bp', 'contig'])
+    # same column names as the interval tree data namedtuples
+    data_column_names = namedtuple(
+        'Data_Tuple', [*[c.replace('.', '_') for c in data_columns], 'Cluster_assignment'], rename=True
+    )._fields
+
+    try:
+        contigs = df_copy['Chromosome'].astype(int)
+    except ValueError as e:
+        raise ValueError('Contig must be an int (or castable to int). Consider using switch_contigs if contigs include X/Y') from e
+    positions = df_copy['Start_position'].to_numpy()
+
+    seg_starts = seg_df['Start.bp'].to_numpy()
+    seg_ends = seg_df['End.bp'].to_numpy()
+    seg_groups = seg_df.groupby(['Sample_ID', 'contig'], sort=False).indices
+    seg_idx = np.full(df_copy.shape[0], -1)
+    for group, loci_idx in pd.Series(df_copy.index).groupby([df_copy['Sample_ID'], contigs], sort=False).indices.items():
+        group_seg_idx = seg_groups.get(group)
+        if group_seg_idx is None:
+            continue
+        # last segment starting at or before each position, if it also ends after it
+        i = np.searchsorted(seg_starts[group_seg_idx], positions[loci_idx], side='right') - 1
+        found = i >= 0
+        i = group_seg_idx[np.maximum(i, 0)]
+        found &= positions[loci_idx] < seg_ends[i]
+        seg_idx[loci_idx[found]] = i[found]
+
+    if (seg_idx < 0).all():
+        data_df = pd.DataFrame({'No_Segment_Data': np.nan}, index=df_copy.index)
+    else:
+        data_df = seg_df[data_columns].reset_index(drop=True).reindex(seg_idx).reset_index(drop=True)
+        cluster_assignment = np.full(seg_idx.shape, np.nan, dtype=object)
+        cluster_assignment[seg_idx >= 0] = '0'  # no cluster data, as in get_segment_interval_trees
+        data_df['Cluster_assignment'] = pd.Series(cluster_assignment).infer_objects()
+        data_df.columns = data_column_names
+
+    return pd.concat([df_copy, data_df], axis=1)
+
+
+def gen_maf(maf_fn, purity_dict, ploidy_dict, cnv_seg_df, maf_start_pos_col, maf_sample_id_col, maf_chromosome_col, maf_cluster_col):
     """
 
     Parameters
@@ -265,20 +442,17 @@ def gen_maf(maf_fn, purity_dict, ploidy_dict, seg_trees, maf_start_pos_col, maf_
         Dictionary with purity values for this participant, keys given by sample_id
     ploidy_dict: dict
         Dictionary with ploidy values for this participant, keys given by sample_id
-    seg_trees: list of IntervalTrees
-        IntervalTree for each contig with copy number data
+    cnv_seg_df: pd.DataFrame
+        Segments of all samples of this participant, with a Sample_ID column
 
     Returns
     -------
     maf_df: pd.DataFrame
         Modified maf for this participant, including copy number data and additional annotations
     """
-    maf_df = cached_read_csv(maf_fn, sep='\t')
-    # start_pos = maf_df.columns[maf_df.columns.isin(['Start_position', 'Start_Position'])][0]
-    alt = maf_df.columns[maf_df.columns.isin(['Tumor_Seq_Allele2', 'Tumor_Seq_Allele'])][0]
-    # sample_id_col = maf_df.columns[maf_df.columns.isin(['Tumor_Sample_Barcode', 'Sample_ID', 'sample_id', 'Sample_id'])][0]
-    maf_df['id'] = maf_df.apply(lambda x: get_unique_identifier(x, start_pos=maf_start_pos_col, alt=alt), axis=1)
-
+    # shared maf store, with mutation ids built from the given start position column
+    maf_df = get_maf(maf_fn)
+    maf_df['id'] = get_maf_ids(maf_fn, start_pos=maf_start_pos_col)
     maf_df['Sample_ID'] = maf_df[maf_sample_id_col]
 
     maf_sample_names = set(maf_df['Sample_ID'])
@@ -288,23 +462,23 @@ def gen_maf(maf_fn, purity_dict, ploidy_dict, seg_trees, maf_start_pos_col, maf_
             raise ValueError("Maf sample names don't match what is given")
         else:
             # remove '_pair' from sample ids in maf
-            maf_df['Sample_ID'] = maf_df['Sample_ID'].apply(lambda x: x[:-5])
+            maf_df['Sample_ID'] = maf_df['Sample_ID'].str[:-5]
 
     # maf_df = switch_contigs(maf_df)
     # .replace giving: Series.replace cannot use dict-like to_replace and non-None value ?? todo
     maf_df[maf_chromosome_col] = maf_df[maf_chromosome_col].apply(lambda x: '23' if x == 'X' else '24' if x == 'Y' else x)
 
-    maf_df = apply_segment_data_to_df(maf_df, seg_trees)
+    maf_df = apply_segment_data_to_df(maf_df, cnv_seg_df)
     maf_df.set_index('id', inplace=True, drop=False)
 
     c_values = [calc_cn_levels(pur, plo) for pur, plo in zip(purity_dict.values(), ploidy_dict.values())]
     c_0 = {sample: c[0] for sample, c in zip(purity_dict.keys(), c_values)}
     c_delta = {sample: c[1] for sample, c in zip(purity_dict.keys(), c_values)}
 
-    maf_df['purity'] = maf_df['Sample_ID'].replace(purity_dict)
-    maf_df['ploidy'] = maf_df['Sample_ID'].replace(ploidy_dict)
-    maf_df['c_0'] = maf_df['Sample_ID'].replace(c_0)
-    maf_df['c_delta'] = maf_df['Sample_ID'].replace(c_delta)
+    maf_df['purity'] = maf_df['Sample_ID'].map(purity_dict)
+    maf_df['ploidy'] = maf_df['Sample_ID'].map(ploidy_dict)
+    maf_df['c_0'] = maf_df['Sample_ID'].map(c_0)
+    maf_df['c_delta'] = maf_df['Sample_ID'].map(c_delta)
 
     # cluster_assignment = maf_df.columns[maf_df.columns.isin(['Cluster_Assignment', 'cluster'])][0]
     maf_df[maf_chromosome_col] = maf_df[maf_chromosome_col].astype(int)
@@ -312,18 +486,17 @@ def gen_maf(maf_fn, purity_dict, ploidy_dict, seg_trees, maf_start_pos_col, maf_
         maf_df['cluster_color'] = maf_df[maf_cluster_col].astype(int).apply(lambda x: cluster_color(x))
 
     c_size_cumsum = np.cumsum([0] + list(csize.values()))
-    maf_df['x_loc'] = maf_df.apply(lambda x: c_size_cumsum[x[maf_chromosome_col] - 1] + x[maf_start_pos_col], axis=1)
+    maf_df['x_loc'] = np.take(c_size_cumsum, maf_df[maf_chromosome_col].to_numpy() - 1) + maf_df[maf_start_pos_col]
     maf_df['VAF'] = maf_df['t_alt_count'] / (maf_df['t_alt_count'] + maf_df['t_ref_count'])
 
     maf_df['mu_major_adj'] = (maf_df['mu_major'] - maf_df['c_0']) / maf_df['c_delta']
     maf_df['mu_minor_adj'] = (maf_df['mu_minor'] - maf_df['c_0']) / maf_df['c_delta']
-    maf_df['multiplicity_ccf'] = maf_df.apply(
-        lambda x: x.VAF * (x['purity'] * (x.mu_major_adj + x.mu_minor_adj) + 2 * (1 - x['purity'])) / x['purity'], axis=1)
+    maf_df['multiplicity_ccf'] = maf_df['VAF'] * (
+        maf_df['purity'] * (maf_df['mu_major_adj'] + maf_df['mu_minor_adj']) + 2 * (1 - maf_df['purity'])
+    ) / maf_df['purity']
     # calculate error bars for mutations
-    maf_df['error_top'] = maf_df.apply(
-        lambda x: calculate_error(x.t_alt_count, x.t_ref_count, x['purity'], 0.975), axis=1)
-    maf_df['error_bottom'] = maf_df.apply(
-        lambda x: -1 * calculate_error(x.t_alt_count, x.t_ref_count, x['purity'], 0.025), axis=1)
+    maf_df['error_top'] = calculate_errors(maf_df['t_alt_count'], maf_df['t_ref_count'], maf_df['purity'], 0.975)
+    maf_df['error_bottom'] = -1 * calculate_errors(maf_df['t_alt_count'], maf_df['t_ref_count'], maf_df['purity'], 0.025)
 
     return maf_df
 
@@ -361,7 +534,209 @@ def updated_plot_acr_subplots(fig_list, title, fig_names, csize, height_per_samp
 
     return fig
     
-def gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col):
+def load_participant_cnv_and_maf(df, idx, samples_df, maf_start_pos_col, maf_sample_id_col, maf_chromosome_col, maf_cluster_col, max_segments=None):
+    """Collect the participant's samples and load their CNV figures and mutations (cached).
+
+    Parameters
+    ----------
+    df
+        participant level DataFrame
+    idx
+        Index - participant
+    samples_df
+        sample level dataframe
+    max_segments
+        if given, the CNV figures plot at most max_segments merged segments per sample (see gen_seg_figure).
+        The mutations are still annotated with the original segments.
+
+    Returns
+    -------
+    (sample_list, (participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict))
+        samples ordered by collection date and the output of gen_participant_cnv_and_maf
+    """
+    sample_list = samples_df[samples_df['participant_id'] == idx].sort_values('collection_date_dfd').index.tolist()
+
+    purity_dict = samples_df.loc[sample_list, 'wxs_purity'].to_dict()
+    ploidy_dict = samples_df.loc[sample_list, 'wxs_ploidy'].to_dict()
+    cnv_seg_filenames = samples_df.loc[sample_list, 'cnv_seg_fn'].values.tolist()
+    maf_fn = df.loc[idx, 'maf_fn']
+    participant_cnv_and_maf = gen_participant_cnv_and_maf(
+        cnv_seg_filenames, 
+        maf_fn, 
+        sample_list, 
+        csize, 
+        purity_dict, 
+        ploidy_dict, 
+        maf_start_pos_col, 
+        maf_sample_id_col, 
+        maf_chromosome_col, 
+        maf_cluster_col
+    )
+    if max_segments:
+        participant_maf_df = participant_cnv_and_maf[0]
+        cnv_seg_dict = {}
+        cnv_plot_dict = {}
+        trace_dict = {}
+        for cnv_seg_fn, sample in zip(cnv_seg_filenames, sample_list):
+            cnv_plot, cnv_seg_df_mod, start_trace, end_trace = gen_seg_figure(
+                cnv_seg_fn, csize, purity=purity_dict[sample], ploidy=ploidy_dict[sample], max_segments=max_segments
+            )
+            cnv_seg_dict[sample] = cnv_seg_df_mod
+            cnv_plot_dict[sample] = cnv_plot
+            trace_dict[sample] = (start_trace, end_trace)
+        participant_cnv_and_maf = (participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict)
+
+    return sample_list, participant_cnv_and_maf
+
+
+def downsample_mutations(maf_df, max_mutations, x_range=None, y_bins=20):
+    """Mutations to plot in the mutation scatter, at most max_mutations.
+
+    Mutations outside of the x_range are dropped. If more than max_mutations are left, the displayed range is split in
+    a grid of genomic position bins by y_bins multiplicity bins and only the first mutation of each grid cell is kept.
+    The number of position bins is halved until at most max_mutations grid cells have mutations.
+
+    Parameters
+    ----------
+    maf_df
+        mutations with 'x_loc' (genomic position) and 'multiplicity_ccf' columns
+    max_mutations: int
+        maximum number of mutations
+    x_range
+        [start, end] genomic range displayed, None for all
+    y_bins: int
+        number of multiplicity bins
+
+    Returns
+    -------
+    pd.DataFrame
+        rows of maf_df to plot
+    """
+    if x_range is not None:
+        maf_df = maf_df[(maf_df['x_loc'] >= x_range[0]) & (maf_df['x_loc'] <= x_range[1])]
+    if len(maf_df) <= max_mutations:
+        return maf_df
+
+    y_bins = min(y_bins, max_mutations)
+    x = maf_df['x_loc'].to_numpy(dtype=float)
+    y = np.nan_to_num(maf_df['multiplicity_ccf'].to_numpy(dtype=float))
+    x_start, x_end = x_range if x_range is not None else (x.min(), x.max())
+    y_start, y_end = y.min(), y.max()
+    x_position = (x - x_start) / ((x_end - x_start) or 1)
+    y_bin = np.clip(((y - y_start) / ((y_end - y_start) or 1) * y_bins).astype(int), 0, y_bins - 1)
+
+    x_bins = len(maf_df)
+    while True:
+        x_bin = np.clip((x_position * x_bins).astype(int), 0, x_bins - 1)
+        _, first_in_cell = np.unique(x_bin * y_bins + y_bin, return_index=True)
+        if len(first_in_cell) <= max_mutations or x_bins == 1:
+            break
+        x_bins = max(x_bins // 2, 1)
+
+    return maf_df.iloc[np.sort(first_in_cell)]
+
+
+def get_relayout_x_range(relayout_data):
+    """Genomic range displayed after a zoom or pan of the CNV Plot.
+
+    Parameters
+    ----------
+    relayout_data
+        dcc.Graph relayoutData
+
+    Returns
+    -------
+    [start, end] of the x axis, None if the x axis was reset to its full range or False if it did not change
+    """
+    if not relayout_data:
+        return False
+    for key, value in relayout_data.items():
+        axis, _, prop = key.partition('.')
+        if not re.fullmatch(r'xaxis\d*', axis):
+            continue
+        if prop == 'autorange' and value:
+            return None
+        if prop == 'range':
+            return [float(value[0]), float(value[1])]
+        if prop == 'range[0]' and f'{axis}.range[1]' in relayout_data:
+            return [float(value), float(relayout_data[f'{axis}.range[1]'])]
+    return False
+
+
+def gen_cnv_trace_values(cnv_plot, seg_df, absolute, color, start_trace, end_trace):
+    """Segment trace values of a sample CNV figure for the given absolute and color settings.
+
+    Gives the values update_cnv_color_absolute would set, without modifying cnv_plot (a cached figure).
+
+    Parameters
+    ----------
+    cnv_plot
+        sample CNV figure (see gen_seg_figure)
+    seg_df
+        sample segment dataframe (see gen_seg_figure)
+    absolute : bool
+        display absolute CN
+    color
+        color radioitem value
+    start_trace, end_trace
+        segment traces of cnv_plot
+
+    Returns
+    -------
+    list of dict
+        {'y': ..., 'fillcolor': ...} for each segment trace
+    """
+    traces = SimpleNamespace(data=[{'y': trace.y} for trace in cnv_plot.data[start_trace:end_trace]])
+    update_cnv_color_absolute(traces, seg_df, absolute, color, 0, end_trace - start_trace)
+    return traces.data
+
+
+def get_cnv_yaxis_title(absolute):
+    return "Absolute Copy Number" if absolute else "Allelic Copy Ratio"
+
+
+def get_mutation_selection_key(selected_mutation_rows, filtered_mutation_rows):
+    """Short key of the mutations shown in the CNV Plot, to detect changes of the mutation table selection"""
+    if selected_mutation_rows:
+        rows = ['selected'] + list(selected_mutation_rows)
+    elif filtered_mutation_rows:
+        rows = ['filtered'] + list(filtered_mutation_rows)
+    else:
+        return None
+    return hashlib.sha1('\n'.join(map(str, rows)).encode()).hexdigest()
+
+
+def gen_sample_mut_scatters(participant_maf_df, sample_selection, sigmas_val, selected_mutation_rows, filtered_mutation_rows, maf_sample_id_col, maf_cluster_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col, maf_variant_class_col, maf_protein_change_col, max_mutations=None, x_range=None):
+    """Generate the mutation scatter trace of each sample (see gen_mut_scatter)
+
+    With max_mutations, each trace has at most max_mutations mutations of the displayed x_range (see downsample_mutations).
+    """
+    if selected_mutation_rows:
+        participant_maf_df = participant_maf_df.loc[selected_mutation_rows]
+    elif filtered_mutation_rows:
+        participant_maf_df = participant_maf_df.loc[filtered_mutation_rows]
+    # else (if all mutations in table are filtered out and none selected): use all mutations
+
+    sample_maf_dfs = [participant_maf_df[participant_maf_df[maf_sample_id_col] == sample_id] for sample_id in sample_selection]
+    if max_mutations:
+        sample_maf_dfs = [downsample_mutations(sample_maf_df, max_mutations, x_range) for sample_maf_df in sample_maf_dfs]
+
+    return [
+        gen_mut_scatter(
+            sample_maf_df,
+            sigmas_val,
+            sample_id,
+            maf_cluster_col,
+            maf_hugo_col,
+            maf_chromosome_col,
+            maf_start_pos_col,
+            maf_variant_class_col,
+            maf_protein_change_col
+        ) for sample_id, sample_maf_df in zip(sample_selection, sample_maf_dfs)
+    ]
+
+
+def gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col, max_segments=None, max_mutations=None):
     """Generate CNV Plot with all customizations.
 
     Parameters
@@ -383,8 +758,10 @@ def gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mu
         rows filtered in the mutations table, None if none selected
     samples_df
         sample level dataframe
-    preprocess_data_dir  TODO: remove
-        directory path in which preprocessed CNV pickle files are stored
+    max_segments
+        level of detail: maximum number of segments plotted per sample, None for all (see merge_similar_segments)
+    max_mutations
+        level of detail: maximum number of mutations plotted per sample, None for all (see downsample_mutations)
 
     Returns
     -------
@@ -393,12 +770,24 @@ def gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mu
         sample checkbox options
     sample_selection_corrected
         first two selections in the sample selection checkbox
+    cnv_plot_state : dict
+        what the figure shows (participant, samples, settings, mutation selection, x range) and where the segment
+        and mutation traces of each sample are, used by update_cnv_plot to patch the figure
 
     Notes
     -----
     No mutation scatter plot if no purity and ploidy in data
     """
-    sample_list = samples_df[samples_df['participant_id'] == idx].sort_values('collection_date_dfd').index.tolist()
+    sample_list, (participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict) = load_participant_cnv_and_maf(
+        df, 
+        idx, 
+        samples_df, 
+        maf_start_pos_col, 
+        maf_sample_id_col, 
+        maf_chromosome_col, 
+        maf_cluster_col,
+        max_segments=max_segments
+    )
     # start with only first sample selected
     sample_selection_corrected = [sample_list[0]] if sample_selection == [] else \
         [s for s in sample_list if s in sample_selection]  # get correct order
@@ -406,74 +795,172 @@ def gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mu
     sigmas_val = 'Show CNV Sigmas' in sigmas
     absolute_val = 'Display Absolute CN' in absolute
 
-    # collect Figures and mutation maf
-    purity_dict = samples_df.loc[sample_list, 'wxs_purity'].to_dict()
-    ploidy_dict = samples_df.loc[sample_list, 'wxs_ploidy'].to_dict()
-    cnv_seg_filenames = samples_df.loc[sample_list, 'cnv_seg_fn'].values.tolist()
-    maf_fn = df.loc[idx, 'maf_fn']
-    participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict = gen_participant_cnv_and_maf(
-        cnv_seg_filenames, 
-        maf_fn, 
-        sample_list, 
-        csize, 
-        purity_dict, 
-        ploidy_dict, 
+    fig_list = [cnv_plot_dict[sample_id] for sample_id in sample_selection_corrected]
+    cnv_subplots_fig = updated_plot_acr_subplots(fig_list, 'Copy Number Plots', sample_selection_corrected, csize)
+
+    # the cached sample figures are not modified: CN values and colors are set on the subplot traces
+    seg_traces = []
+    trace_offset = 0
+    for i, sample_id in enumerate(sample_selection_corrected):
+        start_trace, end_trace = trace_dict[sample_id]
+        trace_values = gen_cnv_trace_values(cnv_plot_dict[sample_id], cnv_seg_dict[sample_id], absolute_val, color,
+                                            start_trace, end_trace)
+        for trace, values in zip(cnv_subplots_fig.data[trace_offset + start_trace:trace_offset + end_trace], trace_values):
+            trace.update(values)
+        cnv_subplots_fig.update_yaxes(title_text=get_cnv_yaxis_title(absolute_val), row=i+1, col=1)
+
+        seg_traces.append([trace_offset + start_trace, trace_offset + end_trace])
+        trace_offset += len(cnv_plot_dict[sample_id].data)
+
+    update_cnv_scatter_sigma_toggle(cnv_subplots_fig, sigmas_val)
+
+    mut_scatters = gen_sample_mut_scatters(
+        participant_maf_df, 
+        sample_selection_corrected, 
+        sigmas_val, 
+        selected_mutation_rows, 
+        filtered_mutation_rows, 
+        maf_sample_id_col, 
+        maf_cluster_col, 
+        maf_hugo_col, 
+        maf_chromosome_col, 
+        maf_start_pos_col, 
+        maf_variant_class_col, 
+        maf_protein_change_col,
+        max_mutations=max_mutations
+    )
+    mut_traces = []
+    for i, mut_scatter in enumerate(mut_scatters):
+        mut_traces.append(len(cnv_subplots_fig.data))
+        cnv_subplots_fig.add_trace(mut_scatter, row=i+1, col=1)
+
+    cnv_plot_state = {
+        'participant': str(idx),
+        'samples': sample_selection_corrected,
+        'sigmas': sigmas_val,
+        'color': color,
+        'absolute': absolute_val,
+        'mutations': get_mutation_selection_key(selected_mutation_rows, filtered_mutation_rows),
+        'x_range': None,
+        'seg_traces': seg_traces,
+        'mut_traces': mut_traces,
+    }
+
+    return [
+        cnv_subplots_fig,
+        sample_list,
+        sample_selection_corrected,
+        cnv_plot_state
+    ]
+
+def update_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, cnv_plot_state, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col, max_segments=None, max_mutations=None, x_range=False):
+    """Update the displayed CNV Plot, sending only the trace properties that changed.
+
+    The figure is regenerated (gen_cnv_plot) if the participant or the selected samples changed. Otherwise, a
+    dash.Patch updates the sigma visibility, the segment CN values and colors, the y axis titles and
+    the mutation scatters that are affected by the new settings.
+
+    Parameters
+    ----------
+    cnv_plot_state
+        state of the displayed figure, from gen_cnv_plot or a previous update_cnv_plot call
+    x_range
+        [start, end] genomic range displayed after a zoom, None for the full range, False if unchanged. With
+        max_mutations, the mutation scatters are downsampled again for the new range.
+    others
+        see gen_cnv_plot
+
+    Returns
+    -------
+    Same as gen_cnv_plot, with a dash.Patch instead of the figure if the figure is patched
+    """
+    sample_list, (participant_maf_df, cnv_plot_dict, cnv_seg_dict, trace_dict) = load_participant_cnv_and_maf(
+        df, 
+        idx, 
+        samples_df, 
         maf_start_pos_col, 
         maf_sample_id_col, 
         maf_chromosome_col, 
-        maf_cluster_col
+        maf_cluster_col,
+        max_segments=max_segments
     )
+    sample_selection_corrected = [sample_list[0]] if sample_selection == [] else \
+        [s for s in sample_list if s in sample_selection]
 
-    fig_list = []
-    for sample_id in sample_selection_corrected:
-        cnv_plot = cnv_plot_dict[sample_id]
-        this_seg_df = cnv_seg_dict[sample_id]
-        update_cnv_color_absolute(cnv_plot, this_seg_df, absolute_val, color,
-                                  trace_dict[sample_id][0], trace_dict[sample_id][1])
-        if absolute_val:
-            cnv_plot.update_yaxes(title_text="Absolute Copy Number")
-        else:
-            cnv_plot.update_yaxes(title_text="Allelic Copy Ratio")
-        fig_list.append(cnv_plot)
+    if not cnv_plot_state or cnv_plot_state['participant'] != str(idx) or \
+            cnv_plot_state['samples'] != sample_selection_corrected:
+        return gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col, max_segments=max_segments, max_mutations=max_mutations)
 
-    cnv_subplots_fig = updated_plot_acr_subplots(fig_list, 'Copy Number Plots', sample_selection_corrected, csize)
-    
-    update_cnv_scatter_sigma_toggle(cnv_subplots_fig, sigmas_val)
-    
-    if selected_mutation_rows:
-        participant_maf_df = participant_maf_df.loc[selected_mutation_rows]
-    elif filtered_mutation_rows:
-        participant_maf_df = participant_maf_df.loc[filtered_mutation_rows]
-    # else (if all mutations in table are filtered out and none selected): use all mutations
+    sigmas_val = 'Show CNV Sigmas' in sigmas
+    absolute_val = 'Display Absolute CN' in absolute
+    mutations_key = get_mutation_selection_key(selected_mutation_rows, filtered_mutation_rows)
+    x_range = cnv_plot_state.get('x_range') if x_range is False else x_range
+    update_mutations = cnv_plot_state['mutations'] != mutations_key or \
+        (max_mutations and cnv_plot_state.get('x_range') != x_range)
 
+    cnv_plot_patch = Patch()
     for i, sample_id in enumerate(sample_selection_corrected):
-        sample_maf_df = participant_maf_df[participant_maf_df[maf_sample_id_col] == sample_id]
-        cnv_subplots_fig.add_trace(
-            gen_mut_scatter(
-                sample_maf_df, 
-                sigmas_val, 
-                sample_id, 
-                maf_cluster_col, 
-                maf_hugo_col, 
-                maf_chromosome_col, 
-                maf_start_pos_col, 
-                maf_variant_class_col, 
-                maf_protein_change_col
-            ), 
-            row=i+1, col=1
+        start_trace, end_trace = trace_dict[sample_id]
+        seg_start = cnv_plot_state['seg_traces'][i][0]
+        if cnv_plot_state['absolute'] != absolute_val or cnv_plot_state['color'] != color:
+            old_values = gen_cnv_trace_values(cnv_plot_dict[sample_id], cnv_seg_dict[sample_id],
+                                              cnv_plot_state['absolute'], cnv_plot_state['color'], start_trace, end_trace)
+            new_values = gen_cnv_trace_values(cnv_plot_dict[sample_id], cnv_seg_dict[sample_id],
+                                              absolute_val, color, start_trace, end_trace)
+            for k, (old, new) in enumerate(zip(old_values, new_values)):
+                if not np.array_equal(old['y'], new['y']):
+                    cnv_plot_patch['data'][seg_start + k]['y'] = new['y']
+                if old['fillcolor'] != new['fillcolor']:
+                    cnv_plot_patch['data'][seg_start + k]['fillcolor'] = new['fillcolor']
+
+        if cnv_plot_state['absolute'] != absolute_val:
+            yaxis = f'yaxis{i + 1}' if i else 'yaxis'
+            cnv_plot_patch['layout'][yaxis]['title']['text'] = get_cnv_yaxis_title(absolute_val)
+
+        if cnv_plot_state['sigmas'] != sigmas_val:
+            # sigma traces are the first two of the four traces of each segment (see make_cnv_scatter)
+            for k in range(0, end_trace - start_trace, 4):
+                cnv_plot_patch['data'][seg_start + k]['visible'] = sigmas_val
+                cnv_plot_patch['data'][seg_start + k + 1]['visible'] = sigmas_val
+            if not update_mutations:
+                cnv_plot_patch['data'][cnv_plot_state['mut_traces'][i]]['error_y']['visible'] = sigmas_val
+
+    if update_mutations:
+        mut_scatters = gen_sample_mut_scatters(
+            participant_maf_df, 
+            sample_selection_corrected, 
+            sigmas_val, 
+            selected_mutation_rows, 
+            filtered_mutation_rows, 
+            maf_sample_id_col, 
+            maf_cluster_col, 
+            maf_hugo_col, 
+            maf_chromosome_col, 
+            maf_start_pos_col, 
+            maf_variant_class_col, 
+            maf_protein_change_col,
+            max_mutations=max_mutations,
+            x_range=x_range
         )
+        for i, (mut_scatter, mut_trace) in enumerate(zip(mut_scatters, cnv_plot_state['mut_traces'])):
+            mut_scatter.update(xaxis=f'x{i + 1}' if i else 'x', yaxis=f'y{i + 1}' if i else 'y')
+            cnv_plot_patch['data'][mut_trace] = mut_scatter.to_plotly_json()
+
+    cnv_plot_state = dict(cnv_plot_state, sigmas=sigmas_val, color=color, absolute=absolute_val, mutations=mutations_key,
+                          x_range=x_range)
 
     return [
-        cnv_subplots_fig,
+        cnv_plot_patch,
         sample_list,
-        sample_selection_corrected
+        sample_selection_corrected,
+        cnv_plot_state
     ]
 
 def gen_absolute_components(
     data: PatientSampleData, 
-    idx, sample_selection, sigmas, color, absolute, button_clicks, cnv_plot, sample_list, selected_mutation_rows, filtered_mutation_rows, 
+    idx, sample_selection, sigmas, color, absolute, button_clicks, relayout_data, cnv_plot_state, selected_mutation_rows, filtered_mutation_rows, 
     maf_sample_id_col=None, maf_start_pos_col=None, maf_chromosome_col=None, maf_cluster_col=None, maf_hugo_col=None, maf_variant_class_col=None, 
-    maf_protein_change_col=None):
+    maf_protein_change_col=None, max_segments=None, max_mutations=None):
     """Generate CNV plot - new data callback.
     
     Parameters
@@ -492,8 +979,10 @@ def gen_absolute_components(
         Display Absolute CN checkbox value (checked or unchecked)
     button_clicks 
         Submit button response 
-    cnv_plot
-    sample_list 
+    relayout_data
+        CNV plot relayoutData (zoom and pan)
+    cnv_plot_state
+        State of the displayed CNV plot (see gen_cnv_plot)
     selected_mutation_rows 
         Rows selected in the mutation table 
     filtered_mutation_rows 
@@ -512,6 +1001,10 @@ def gen_absolute_components(
         kwarg - Name of the variant classification column in the maf file 
     maf_protein_change_col
         kwarg - Name of the protein change column in the maf file 
+    max_segments
+        Level of detail - maximum number of segments per sample (see gen_cnv_plot_app_component)
+    max_mutations
+        Level of detail - maximum number of mutations per sample (see gen_cnv_plot_app_component)
 
     Returns
     -------
@@ -526,17 +1019,45 @@ def gen_absolute_components(
     filtered_mutation_rows = None
     selected_mutation_rows = None
 
-    cnv_plot, sample_list, sample_selection = gen_cnv_plot(df, idx, [], sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col)
+    cnv_plot, sample_list, sample_selection, cnv_plot_state = gen_cnv_plot(df, idx, [], sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col, max_segments=max_segments, max_mutations=max_mutations)
     button_clicks = None
 
     return [
         cnv_plot,
         sample_list,
         sample_selection,
-        button_clicks
+        button_clicks,
+        cnv_plot_state
     ]
 
-def internal_gen_absolute_components(data: PatientSampleData, idx, sample_selection, sigmas, color, absolute, button_clicks, cnv_plot, sample_list, selected_mutation_rows, filtered_mutation_rows, maf_sample_id_col=None, maf_start_pos_col=None, maf_chromosome_col=None, maf_cluster_col=None, maf_hugo_col=None, maf_variant_class_col=None, maf_protein_change_col=None):
+def prefetch_absolute_components(
+    data: PatientSampleData, 
+    idx, 
+    maf_sample_id_col=None, maf_start_pos_col=None, maf_chromosome_col=None, maf_cluster_col=None, maf_hugo_col=None, maf_variant_class_col=None, 
+    maf_protein_change_col=None, max_segments=None):
+    """Load and cache the CNV figures and mutations of a participant - prefetch callback.
+
+    Parameters
+    ----------
+    data
+        PatientSampleData containing participant and sample dfs
+    idx
+        Index - participant to prefetch
+    maf_*_col, max_segments
+        kwargs - same as gen_absolute_components
+    """
+    load_participant_cnv_and_maf(
+        data.participant_df, 
+        idx, 
+        data.sample_df, 
+        maf_start_pos_col, 
+        maf_sample_id_col, 
+        maf_chromosome_col, 
+        maf_cluster_col,
+        max_segments=max_segments
+    )
+
+def internal_gen_absolute_components(data: PatientSampleData, idx, sample_selection, sigmas, color, absolute, button_clicks, relayout_data, cnv_plot_state, selected_mutation_rows, filtered_mutation_rows, maf_sample_id_col=None, maf_start_pos_col=None, maf_chromosome_col=None, maf_cluster_col=None, maf_hugo_col=None, maf_variant_class_col=None, maf_protein_change_col=None, max_segments=None, max_mutations=None):
     """Generate CNV plot - internal callback.
     
     Parameters
@@ -555,8 +1076,10 @@ def internal_gen_absolute_components(data: PatientSampleData, idx, sample_select
         Display Absolute CN checkbox value (checked or unchecked)
     button_clicks 
         Submit button response 
-    cnv_plot
-    sample_list 
+    relayout_data
+        CNV plot relayoutData (zoom and pan)
+    cnv_plot_state
+        State of the displayed CNV plot (see gen_cnv_plot)
     selected_mutation_rows 
         Rows selected in the mutation table 
     filtered_mutation_rows 
@@ -575,6 +1098,10 @@ def internal_gen_absolute_components(data: PatientSampleData, idx, sample_select
         kwarg - Name of the variant classification column in the maf file 
     maf_protein_change_col
         kwarg - Name of the protein change column in the maf file 
+    max_segments
+        Level of detail - maximum number of segments per sample (see gen_cnv_plot_app_component)
+    max_mutations
+        Level of detail - maximum number of mutations per sample (see gen_cnv_plot_app_component)
 
     Returns
     -------
@@ -584,13 +1111,32 @@ def internal_gen_absolute_components(data: PatientSampleData, idx, sample_select
     df = data.participant_df
     samples_df = data.sample_df
 
-    if button_clicks != None:
-        cnv_plot, sample_list, sample_selection = gen_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col)
-        button_clicks = None
+    if ctx.triggered_id == 'cnv_plot':
+        # zoom or pan: downsample the mutations again for the displayed range, with the displayed settings
+        x_range = get_relayout_x_range(relayout_data)
+        if not max_mutations or not cnv_plot_state or x_range is False:
+            return [dash.no_update] * 5
+        cnv_plot, sample_list, sample_selection, cnv_plot_state = update_cnv_plot(
+            df, idx, cnv_plot_state['samples'],
+            ['Show CNV Sigmas'] if cnv_plot_state['sigmas'] else [],
+            cnv_plot_state['color'],
+            ['Display Absolute CN'] if cnv_plot_state['absolute'] else [],
+            selected_mutation_rows, filtered_mutation_rows, samples_df, cnv_plot_state, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col,
+            max_segments=max_segments, max_mutations=max_mutations, x_range=x_range
+        )
+        return [cnv_plot, dash.no_update, dash.no_update, dash.no_update, cnv_plot_state]
+
+    if button_clicks == None:
+        return [dash.no_update] * 5
+
+    # the figure is patched when the samples did not change
+    cnv_plot, sample_list, sample_selection, cnv_plot_state = update_cnv_plot(df, idx, sample_selection, sigmas, color, absolute, selected_mutation_rows, filtered_mutation_rows, samples_df, cnv_plot_state, maf_sample_id_col, maf_start_pos_col, maf_chromosome_col, maf_cluster_col, maf_hugo_col, maf_variant_class_col, maf_protein_change_col, max_segments=max_segments, max_mutations=max_mutations)
+    button_clicks = None
 
     return [
         cnv_plot,
         sample_list,
         sample_selection,
-        button_clicks
+        button_clicks,
+        cnv_plot_state
     ]
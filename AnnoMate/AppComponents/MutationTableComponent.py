@@ -3,17 +3,17 @@
 Interactive Mutation Table with column selection, sorting, selecting, and filtering
 
 """
-import os.path
 
 import pandas as pd
 import numpy as np
 from dash import dcc, html, dash_table, ctx
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
-from functools import lru_cache
 
 from AnnoMate.ReviewDataApp import AppComponent
-from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier
+from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier, get_unique_identifiers, filter_df_by_query, \
+    operators, split_filter_part, get_maf, get_maf_ids, freezeargs
+from AnnoMate.AppComponents.cache import file_cache
 from AnnoMate.DataTypes.PatientSampleData import PatientSampleData
 
 
@@ -60,7 +60,8 @@ def gen_mutation_table_app_component():
             State('mutation-table', 'derived_viewport_row_ids')
         ],
         new_data_callback=update_mutation_tables,
-        internal_callback=update_mutation_tables
+        internal_callback=update_mutation_tables,
+        prefetch_callback=prefetch_mutation_tables
     )
 
 
@@ -260,28 +261,236 @@ def gen_style_data_conditional(maf_df, custom_colors, maf_cols_value):
     return style_data_conditional
 
 
-@lru_cache(maxsize=32)
+@file_cache(file_args=['filename'])
 def load_file(filename):
-    if os.path.splitext(filename)[1] == '.pkl':
-        maf_df = pd.read_pickle(filename)
-    else:
-        maf_df = pd.read_csv(filename, sep='\t') # prev had sep \t
-
-    start_pos_id = maf_df.columns[maf_df.columns.isin(['Start_position', 'Start_Position'])][0]
-    alt_allele_id = maf_df.columns[maf_df.columns.isin(['Tumor_Seq_Allele2', 'Tumor_Seq_Allele'])][0]
-    sample_id_col = \
-    maf_df.columns[maf_df.columns.isin(['Tumor_Sample_Barcode', 'Sample_ID', 'sample_id', 'Sample_id'])][0]
-    maf_df['Sample_ID'] = maf_df[sample_id_col]
-    maf_df['id'] = maf_df.apply(lambda x: get_unique_identifier(x, start_pos=start_pos_id, alt=alt_allele_id), axis=1)
+    """Load a maf indexed by mutation id, its displayable columns and the columns with the same value in all
+    samples. The maf shares its data with the shared maf store (see get_maf), which is also stored on disk if a
+    directory is set with set_disk_cache_dir."""
+    # shared maf store, with a 'Sample_ID' column
+    maf_df = get_maf(filename)
+    maf_df['id'] = get_maf_ids(filename)
     maf_df.set_index('id', inplace=True, drop=True)
 
+    maf_cols_options, columns_equivalent = load_column_summary(filename)
+    return maf_df, maf_cols_options, columns_equivalent
+
+
+@file_cache(file_args=['filename'], disk=True)
+def load_column_summary(filename):
+    """Displayable columns of a maf and the columns with the same value in all samples (see load_file).
+    Cached in memory and, if a directory is set with set_disk_cache_dir, on disk."""
+    maf_df = get_maf(filename)
     maf_cols_options = maf_df.dropna(axis=1, how='all').columns.tolist()
 
     # pull all columns that differ between samples
     # use <= so we don't accidentally catch columns that have all NaNs for certain mutations (nunique == 0)
-    columns_equivalent = maf_df.groupby('id', sort=False).nunique().le(1).all()
+    columns_equivalent = maf_df.groupby(get_maf_ids(filename).rename('id'), sort=False).nunique().le(1).all()
 
-    return maf_df, maf_cols_options, columns_equivalent
+    return maf_cols_options, columns_equivalent
+
+
+def get_participant_maf_fn(df, idx):
+    """The participant's maf file, from the 'maf_df_pickle' column if present, else from 'maf_fn'"""
+    if 'maf_df_pickle' in df:
+        return df.loc[idx, 'maf_df_pickle']
+    return df.loc[idx, 'maf_fn']
+
+
+def load_participant_maf(df, idx):
+    """Load the participant's maf (cached), see get_participant_maf_fn"""
+    return load_file(get_participant_maf_fn(df, idx))
+
+
+@file_cache(file_args=['filename'])
+def load_unique_values(filename, column=None):
+    """Unique values of a maf column, or unique mutation ids if column is None"""
+    maf_df = load_file(filename)[0]
+    return maf_df.index.unique() if column is None else maf_df[column].unique()
+
+
+@file_cache(file_args=['filename'])
+def load_column_codes(filename, column):
+    """Integer codes (-1 for NaN) and unique values of a maf column (see pandas.factorize), to filter with the
+    dropdown values without comparing the values again"""
+    maf_df = load_file(filename)[0]
+    return pd.factorize(maf_df[column])
+
+
+@file_cache(file_args=['filename'])
+def load_column_ranks(filename, column):
+    """Rank of the value of a maf column in each row (-1 for NaN), and the number of unique values, to sort the
+    mutation table without comparing the values again"""
+    codes, uniques = load_column_codes(filename, column)
+    try:
+        order = uniques.argsort()
+    except TypeError:  # values that can not be compared with each other
+        order = uniques.astype(str).argsort()
+    unique_ranks = np.empty(len(uniques), dtype=int)
+    unique_ranks[order] = np.arange(len(uniques))
+    return np.where(codes >= 0, unique_ranks[codes], -1), len(uniques)
+
+
+def sort_positions(filename, positions, sort_by):
+    """Sort maf row positions by the mutation table sort_by columns, with missing values last
+
+    Parameters
+    ----------
+    filename
+        maf file
+    positions: np.ndarray
+        row positions in the maf
+    sort_by: tuple
+        (column_id, direction) pairs, in order of priority
+
+    Returns
+    -------
+    np.ndarray
+        sorted positions. The sort is stable.
+    """
+    sort_keys = []
+    for column, direction in reversed(sort_by):  # np.lexsort sorts by the last key first
+        ranks, n_unique = load_column_ranks(filename, column)
+        ranks = ranks[positions]
+        if direction != 'asc':
+            ranks = np.where(ranks >= 0, n_unique - 1 - ranks, ranks)
+        sort_keys.append(np.where(ranks >= 0, ranks, n_unique))
+    return positions[np.lexsort(sort_keys)]
+
+
+@freezeargs
+@file_cache(maxsize=64, file_args=['filename'])
+def filter_mutation_table(filename, hugo, variant, cluster, filter_query,
+                          maf_hugo_col, maf_variant_class_col, maf_cluster_col, maf_sample_id_col, default_maf_sample_cols):
+    """Filter the participant's mutations and pivot the columns that differ between samples (cached by filters).
+
+    Parameters
+    ----------
+    filename
+        maf file, see get_participant_maf_fn
+    hugo, variant, cluster: tuple
+        values of the filtering dropdowns present in the maf, sorted. Empty for no filtering.
+    filter_query: str
+        mutation table filter_query
+    maf_*_col, default_maf_sample_cols
+        same kwargs as update_mutation_tables
+
+    Returns
+    -------
+    (positions, participant_maf_df, sample_maf, filtered_maf_cols): (np.ndarray, pd.DataFrame, pd.DataFrame, list)
+        maf row positions of the filtered mutations, the filtered rows with the columns shared by all samples,
+        the wide table of the columns that differ between samples (one row per mutation id, sorted by id) and
+        the columns that are not all NaN after filtering. The dataframes are cached and should not be modified.
+    """
+    maf_df, maf_cols_options, columns_equivalent = load_file(filename)
+
+    # apply the filter dropdown values to the maf
+    mask = np.ones(maf_df.shape[0], dtype=bool)
+    for column, values in [(maf_hugo_col, hugo), (maf_variant_class_col, variant), (maf_cluster_col, cluster)]:
+        if values:
+            codes, uniques = load_column_codes(filename, column)
+            mask &= np.isin(codes, uniques.get_indexer(list(values)))
+    positions = np.flatnonzero(mask)
+
+    # built in table filtering, on a view indexed by row position
+    positions = filter_df_by_query(maf_df.iloc[positions].set_axis(positions), filter_query).index.to_numpy()
+    filtered_maf_df = maf_df.iloc[positions]
+
+    # if filtered dataframe is not empty, remove columns with only NaNs or Nones
+    filtered_maf_empty = filtered_maf_df.shape[0] == 0
+    if not filtered_maf_empty:
+        filtered_maf_df = filtered_maf_df.replace(['None', None], np.nan)
+        filtered_maf_df = filtered_maf_df.dropna(axis=1, how='all')
+    filtered_maf_cols = filtered_maf_df.columns.tolist()
+
+    # generate sample-level dataframe (cols that differ between samples)
+    if filtered_maf_empty:
+        sample_cols = list(default_maf_sample_cols)
+        sample_cols.append(maf_sample_id_col)
+        sample_maf = pd.DataFrame(columns=sample_cols)
+        sample_maf.loc[:, maf_sample_id_col] = load_unique_values(filename, maf_sample_id_col)
+        sample_maf.index.name = 'id'
+    else:
+        sample_cols = columns_equivalent[~columns_equivalent].index.tolist()
+        sample_maf = filtered_maf_df[sample_cols]
+
+    # todo change to sort samples by timing
+    sample_maf = sample_maf.reset_index().sort_values(['id', maf_sample_id_col]).set_index(
+        ['id', maf_sample_id_col]).unstack(1)
+    sample_maf['id'] = sample_maf.index.tolist()
+
+    # participant-level columns (no difference between samples)
+    participant_maf_df = filtered_maf_df.drop(columns=sample_cols) if sample_cols else filtered_maf_df
+
+    return positions, participant_maf_df, sample_maf, filtered_maf_cols
+
+
+@freezeargs
+@file_cache(maxsize=64, file_args=['filename'])
+def query_mutation_table(filename, hugo, variant, cluster, filter_query, sort_by,
+                         maf_hugo_col, maf_variant_class_col, maf_cluster_col, maf_sample_id_col, default_maf_sample_cols):
+    """Filter and sort the participant's mutations (cached by query), split into the mutation table and mutation
+    sample table. Changing the sort reuses the filtered tables (see filter_mutation_table).
+
+    Parameters
+    ----------
+    sort_by: tuple
+        (column_id, direction) pairs from the mutation table sort_by
+    other parameters
+        see filter_mutation_table
+
+    Returns
+    -------
+    (participant_maf, sample_maf, filtered_maf_cols): (pd.DataFrame, pd.DataFrame, list)
+        participant_maf has one row per mutation and the columns shared by all samples, sample_maf the columns that
+        differ between samples for each sample, in the same order. filtered_maf_cols are the columns that are not
+        all NaN after filtering. The dataframes are cached and should not be modified.
+    """
+    positions, participant_maf_df, sample_maf, filtered_maf_cols = filter_mutation_table(
+        filename, hugo, variant, cluster, filter_query,
+        maf_hugo_col, maf_variant_class_col, maf_cluster_col, maf_sample_id_col, default_maf_sample_cols
+    )
+
+    # sort the filtered rows (positions are increasing), then keep the first row of each mutation
+    if len(sort_by):
+        participant_maf = participant_maf_df.iloc[np.searchsorted(positions, sort_positions(filename, positions, sort_by))]
+    else:
+        participant_maf = participant_maf_df
+    participant_maf = participant_maf[~participant_maf.index.duplicated(keep='first')]
+    participant_maf['id'] = participant_maf.index.tolist()
+
+    # same row order as participant_maf, to page both tables with the same positions
+    sample_maf = sample_maf.reindex(participant_maf.index)
+
+    return participant_maf, sample_maf, filtered_maf_cols
+
+
+def gen_table_records(df, column_names=None):
+    """DataTable records of a (page of a) dataframe, built from the column arrays
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+    column_names: list
+        names of the columns in the records. Default: df.columns
+    """
+    column_names = df.columns.tolist() if column_names is None else column_names
+    columns = [df.iloc[:, i].tolist() for i in range(df.shape[1])]
+    return [dict(zip(column_names, row)) for row in zip(*columns)] if columns else [{} for _ in range(df.shape[0])]
+
+
+def prefetch_mutation_tables(data: PatientSampleData, idx, **kwargs):
+    """Load and cache the participant's maf - prefetch callback.
+
+    Parameters
+    ----------
+    data
+        PatientSampleData containing participant and sample dfs
+    idx
+        Index - participant to prefetch
+    kwargs
+        same kwargs as update_mutation_tables (unused)
+    """
+    load_participant_maf(data.participant_df, idx)
 
 #def update_mutation_tables(data: PatientSampleData, idx, cols, hugo, table_size, variant, cluster, page_current, sort_by, filter_query, viewport_selected_row_ids, prev_selected_ids, viewport_ids, custom_colors=None, default_maf_participant_cols=None, default_maf_sample_cols=None, maf_hugo_col=None, maf_variant_class_col=None, maf_cluster_col=None, maf_sample_id_col=None):
 def update_mutation_tables(
@@ -359,10 +568,7 @@ def update_mutation_tables(
 
     #####
     # load maf from file
-    if 'maf_df_pickle' in df:
-        maf_df, maf_cols_options, columns_equivalent = load_file(df.loc[idx, 'maf_df_pickle'])
-    else:
-        maf_df, maf_cols_options, columns_equivalent = load_file(df.loc[idx, 'maf_fn'])
+    maf_cols_options = load_participant_maf(df, idx)[1]
 
     # get the columns displayed in the table, ensuring these columns are present in the maf 
     if not cols:  # Nothing selected for columns
@@ -372,92 +578,42 @@ def update_mutation_tables(
 
     # options and values for filtering dropdowns 
     # if none is input for the column name, the dropdown list will be empty 
-    hugo_symbols = maf_df[maf_hugo_col].unique() if maf_hugo_col else []
+    maf_fn = get_participant_maf_fn(df, idx)
+    hugo_symbols = load_unique_values(maf_fn, maf_hugo_col) if maf_hugo_col else []
     hugo_value_in_maf = list(set(hugo) & set(hugo_symbols)) if hugo else None
-    variant_classifications = maf_df[maf_variant_class_col].unique() if maf_variant_class_col else []
+    variant_classifications = load_unique_values(maf_fn, maf_variant_class_col) if maf_variant_class_col else []
     variant_in_maf = list(set(variant) & set(variant_classifications)) if variant else None
-    cluster_assignments = maf_df[maf_cluster_col].unique() if maf_cluster_col else []
+    cluster_assignments = load_unique_values(maf_fn, maf_cluster_col) if maf_cluster_col else []
     cluster_in_maf = list(set(cluster) & set(cluster_assignments)) if cluster else None
-    sample_options = maf_df[maf_sample_id_col].unique()
-
-    # apply the filter dropdown values to the maf
-    filtered_maf_df = maf_df.copy()
-    if hugo_value_in_maf:
-        filtered_maf_df = filtered_maf_df[filtered_maf_df[maf_hugo_col].isin(hugo_value_in_maf)]
-    if variant_in_maf:
-        filtered_maf_df = filtered_maf_df[filtered_maf_df[maf_variant_class_col].isin(variant_in_maf)]
-    if cluster_in_maf:
-        filtered_maf_df = filtered_maf_df[filtered_maf_df[maf_cluster_col].isin(cluster_in_maf)]
-
-    # built in table filtering 
-    filtering_expressions = filter_query.split(' && ')
-    for filter_part in filtering_expressions:
-        col_name, operator, filter_value = split_filter_part(filter_part)
-
-        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
-            # these operators match pandas series operator method names
-            filtered_maf_df = filtered_maf_df.loc[getattr(filtered_maf_df[col_name], operator)(filter_value)]
-        elif operator == 'contains':
-            filtered_maf_df = filtered_maf_df.dropna(axis=0, subset=[col_name])
-            filtered_maf_df = filtered_maf_df.loc[filtered_maf_df[col_name].str.contains(filter_value)]
-        elif operator == 'datestartswith':
-            # this is a simplification of the front-end filtering logic,
-            # only works with complete fields in standard format
-            filtered_maf_df = filtered_maf_df.loc[filtered_maf_df[col_name].str.startswith(filter_value)]
-
-    if len(sort_by):
-        filtered_maf_df = filtered_maf_df.sort_values(
-            [col['column_id'] for col in sort_by],
-            ascending=[
-                col['direction'] == 'asc'
-                for col in sort_by
-            ],
-            inplace=False
-        )
 
-    # if filtered dataframe is not empty, remove columns with only NaNs or Nones 
-    filtered_maf_empty = filtered_maf_df.shape[0] == 0
-    if not filtered_maf_empty:
-        filtered_maf_df.replace(['None', None], np.nan, inplace=True)
-        maf_cols_value = [c for c in maf_cols_value if c in list(filtered_maf_df.dropna(axis=1, how='all'))] 
-        filtered_maf_df = filtered_maf_df.dropna(axis=1, how='all')
-        
-
-    # generate sample-level dataframe (cols that differ between samples)
-    if filtered_maf_empty:
-        sample_cols = default_maf_sample_cols.copy()
-        sample_cols.append(maf_sample_id_col)
-        sample_maf = pd.DataFrame(columns=sample_cols)
-        sample_maf.loc[:, maf_sample_id_col] = sample_options
-        sample_maf.index.name = 'id'
-    else:
-        sample_cols = columns_equivalent[~columns_equivalent].index.tolist()
-        sample_maf = filtered_maf_df[sample_cols]
-
-    # todo change to sort samples by timing
-    sample_maf = sample_maf.reset_index().sort_values(['id', maf_sample_id_col]).set_index(
-        ['id', maf_sample_id_col]).unstack(1)
-    sample_maf['id'] = sample_maf.index.tolist()
-
-    # generate participant-level (cols w/ no difference between samples)
-    participant_maf = filtered_maf_df[~filtered_maf_df.index.duplicated(keep='first')]
-    if sample_cols:
-        participant_maf.drop(columns=sample_cols, inplace=True)
-    participant_maf['id'] = participant_maf.index.tolist()
+    # filtered, sorted and split into participant and sample tables (cached by query)
+    participant_maf, sample_maf, filtered_maf_cols = query_mutation_table(
+        maf_fn,
+        sorted(hugo_value_in_maf, key=str) if hugo_value_in_maf else [],
+        sorted(variant_in_maf, key=str) if variant_in_maf else [],
+        sorted(cluster_in_maf, key=str) if cluster_in_maf else [],
+        filter_query,
+        [(col['column_id'], col['direction']) for col in sort_by],
+        maf_hugo_col,
+        maf_variant_class_col,
+        maf_cluster_col,
+        maf_sample_id_col,
+        default_maf_sample_cols
+    )
+    maf_cols_value = [c for c in maf_cols_value if c in filtered_maf_cols]
 
     #####
 
     participant_table_data = participant_maf.iloc[page_current * table_size: (page_current + 1) * table_size]  #.to_dict('records')
     participant_columns = [{'name': i, 'id': i, 'selectable': True} for i in maf_cols_value if i in list(participant_maf)]
 
-    sample_table = sample_maf.loc[participant_table_data.index]
-    sample_table_data = [{
-        **{'': sample_table.index[n]},
-        **{f'{col}_{s_id}': y for (col, s_id), y in data},
-    }
-        for (n, data) in [
-            *enumerate([list(x.items()) for x in sample_table.T.to_dict().values()])
-        ]
+    sample_table = sample_maf.iloc[page_current * table_size: (page_current + 1) * table_size]
+    sample_table_data = [
+        {'': mutation_id, **row}
+        for mutation_id, row in zip(
+            sample_table.index,
+            gen_table_records(sample_table, [f'{col}_{s_id}' for col, s_id in sample_table.columns])
+        )
     ]
     sample_columns_s_id = [{'name': [col, s_id], 'id': f'{col}_{s_id}'} for col, s_id in sample_table.columns if col in maf_cols_value]
 
@@ -484,62 +640,26 @@ def update_mutation_tables(
         derived_viewport_selected_row_ids = []
         derived_viewport_selected_rows = []
 
+    style_data_conditional = gen_style_data_conditional(participant_maf, custom_colors, maf_cols_value)
+
     return [
         maf_cols_options,
         maf_cols_value,
         hugo_symbols,
         variant_classifications,
         sorted(cluster_assignments),
-        participant_table_data.to_dict('records'),  # participant_data
+        gen_table_records(participant_table_data),  # participant_data
         table_size,
         participant_columns,
-        gen_style_data_conditional(participant_maf, custom_colors, maf_cols_value),
+        style_data_conditional,
         derived_viewport_selected_row_ids,
         derived_viewport_selected_rows,
         sample_table_data,
         table_size,
         sample_columns_s_id,
-        gen_style_data_conditional(participant_maf, custom_colors, maf_cols_value),
+        style_data_conditional,
         updated_selected_ids,
-        maf_df.index.unique().tolist(),
+        load_unique_values(maf_fn).tolist(),
         participant_maf.index.tolist(),
-        maf_df.index.unique().tolist(),
+        load_unique_values(maf_fn).tolist(),
     ]
-
-
-operators = [['ge ', '>='],
-             ['le ', '<='],
-             ['lt ', '<'],
-             ['gt ', '>'],
-             ['ne ', '!='],
-             ['eq ', '='],
-             ['contains '],
-             ['datestartswith ']]
-
-
-def split_filter_part(filter_part):
-    """Split filter query into operator and value
-
-    Taken from dash documentation at https://dash.plotly.com/datatable/callbacks on the Python-Driven Filtering, Paging, Sorting Page.
-    """
-    for operator_type in operators:
-        for operator in operator_type:
-            if operator in filter_part:
-                name_part, value_part = filter_part.split(operator, 1)
-                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
-
-                value_part = value_part.strip()
-                v0 = value_part[0]
-                if v0 == value_part[-1] and v0 in ("'", '"', '`'):
-                    value = value_part[1: -1].replace('\\' + v0, v0)
-                else:
-                    try:
-                        value = float(value_part)
-                    except ValueError:
-                        value = value_part
-
-                # word operators need spaces after them in the filter string,
-                # but we don't want these later
-                return name, operator_type[0].strip(), value
-
-    return [None] * 3
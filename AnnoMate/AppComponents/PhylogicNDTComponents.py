@@ -22,7 +22,8 @@ import re
 import scipy.stats as ss
 
 from AnnoMate.ReviewDataApp import AppComponent
-from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier
+from AnnoMate.AppComponents.utils import cluster_color, get_unique_identifier, get_maf, get_maf_ids
+from AnnoMate.AppComponents.cache import file_cache
 from AnnoMate.DataTypes.PatientSampleData import PatientSampleData
 
 
@@ -47,7 +48,8 @@ def gen_phylogicNDT_app_component():
             Output('phylogicNDT-tree', 'generateImage')
         ],
         new_data_callback=gen_phylogicNDT_graphics,
-        internal_callback=internal_gen_phylogicNDT_graphics
+        internal_callback=internal_gen_phylogicNDT_graphics,
+        prefetch_callback=prefetch_phylogicNDT_graphics
     )
 
 def gen_phylogicNDT_components_layout():
@@ -87,14 +89,135 @@ def gen_phylogicNDT_components_layout():
         ])
     ])
 
-def gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col, maf_cluster_col):
+@file_cache(file_args=['cluster_ccfs_fn', 'build_tree_posterior_fn', 'maf_fn', 'treatments_fn', 'drivers_fn'], disk=True)
+def load_phylogic_bundle(cluster_ccfs_fn, build_tree_posterior_fn, maf_fn, treatments_fn=None, drivers_fn=None,
+                         maf_participant_id_col=None, maf_hugo_col=None, maf_chromosome_col=None, maf_start_pos_col=None,
+                         maf_cluster_col=None, tree_meta_col='n_iter'):
+    """Parse the PhylogicNDT results of a participant once, for the CCF plot and the trees.
+
+    Cached in memory and, if a directory is set with set_disk_cache_dir, on disk.
+
+    Parameters
+    ----------
+    cluster_ccfs_fn
+        PhylogicNDT cluster CCFs file
+    build_tree_posterior_fn
+        PhylogicNDT BuildTree posterior file, with an 'edges' column
+    maf_fn
+        PhylogicNDT mut_ccfs file
+    treatments_fn
+        treatments file (optional)
+    drivers_fn
+        drivers file, one hugo symbol per line (optional)
+    tree_meta_col
+        Which column from the tree file to display along with the tree name in the dropdown
+
+    Returns
+    -------
+    dict
+        - cluster_df: cluster CCFs (Cluster_ID, Sample_ID, postDP_ccf_mean, postDP_ccf_CI_low, postDP_ccf_CI_high)
+        - treatments_df: treatments, None if no treatments_fn
+        - mut_count_dict: number of mutations in each cluster (CCF plot line width)
+        - possible_trees: tree dropdown labels
+        - tree_edges: for each tree, list of (parent, child) cluster edges, without the edge from normal
+        - tree_clusters: for each tree, sorted cluster labels (str)
+        - cluster_hugo_dict: hugo symbols of the mutations in each cluster
+        - cluster_count: number of mutations in each cluster
+        - drivers: drivers DataFrame, None if no drivers_fn
+        - cluster_driver_hits: set of drivers hit by the mutations of each cluster (empty without drivers)
+        - cluster_edge_labels: label of the tree edge leading to each cluster (mutation count and drivers)
+
+        The values are cached and should not be modified.
+    """
+    cluster_df = pd.read_csv(cluster_ccfs_fn, sep='\t', usecols=['Cluster_ID', 'Sample_ID', 'postDP_ccf_mean',
+                                                                 'postDP_ccf_CI_low', 'postDP_ccf_CI_high'])
+    treatments_df = pd.read_csv(treatments_fn, sep='\t', comment='#') if treatments_fn is not None else None
+
+    # get mutation counts
+    mut_ccfs = get_maf(maf_fn)
+    mut_count_dict = mut_ccfs.drop_duplicates([
+        maf_participant_id_col,
+        maf_hugo_col,
+        maf_chromosome_col,
+        maf_start_pos_col,
+        maf_cluster_col
+    ]).groupby(maf_cluster_col).count()[maf_participant_id_col].to_dict()
+
+    # trees
+    tree_df = pd.read_csv(build_tree_posterior_fn, sep='\t')
+    possible_trees = []
+    tree_edges = []
+    tree_clusters = []
+    for i, tree in enumerate(tree_df.loc[:, 'edges']):
+        tree_label = f'Tree {i+1}'
+        if tree_meta_col:
+            tree_label = tree_label + f' ({tree_meta_col}={tree_df[tree_meta_col][i]})'
+        possible_trees.append(tree_label)
+
+        edges = [edge.split('-') for edge in tree.split(',')]
+        tree_edges.append([(int(parent), int(child)) for parent, child in edges if parent != 'None'])
+        tree_clusters.append(sorted(set(node for edge in edges for node in edge if node != 'None')))
+
+    # cluster membership
+    maf_df = mut_ccfs.drop_duplicates(subset=maf_start_pos_col)
+    cluster_hugo_dict = maf_df.groupby(maf_cluster_col, sort=False)[maf_hugo_col].agg(list).to_dict()
+    cluster_count = {clust: len(hugos) for clust, hugos in cluster_hugo_dict.items()}
+
+    # driver hits of each cluster
+    cluster_driver_hits = {}
+    if drivers_fn:
+        drivers = pd.read_csv(drivers_fn, header=None, names=['drivers'])
+        driver_muts_df = maf_df.loc[maf_df[maf_hugo_col].isin(drivers.drivers)]
+        cluster_driver_hits = driver_muts_df.groupby(maf_cluster_col)[maf_hugo_col].agg(set).to_dict()
+        cluster_edge_labels = {
+            clust: f'{count}\n{gen_driver_edge_labels(drivers, cluster_driver_hits.get(clust, set()))}'
+            for clust, count in cluster_count.items()
+        }
+    else:
+        drivers = None
+        cluster_edge_labels = {clust: str(count) for clust, count in cluster_count.items()}
+
+    return {
+        'cluster_df': cluster_df,
+        'treatments_df': treatments_df,
+        'mut_count_dict': mut_count_dict,
+        'possible_trees': possible_trees,
+        'tree_edges': tree_edges,
+        'tree_clusters': tree_clusters,
+        'cluster_hugo_dict': cluster_hugo_dict,
+        'cluster_count': cluster_count,
+        'drivers': drivers,
+        'cluster_driver_hits': cluster_driver_hits,
+        'cluster_edge_labels': cluster_edge_labels,
+    }
+
+
+def load_participant_phylogic_bundle(df, idx, drivers_fn=None, maf_participant_id_col=None, maf_hugo_col=None,
+                                     maf_chromosome_col=None, maf_start_pos_col=None, maf_cluster_col=None,
+                                     tree_meta_col='n_iter'):
+    """load_phylogic_bundle with the participant's files from the participant level DataFrame"""
+    return load_phylogic_bundle(
+        df.loc[idx, 'cluster_ccfs_fn'],
+        df.loc[idx, 'build_tree_posterior_fn'],
+        df.loc[idx, 'maf_fn'],
+        treatments_fn=df.loc[idx, 'treatments_fn'] if 'treatments_fn' in df else None,
+        drivers_fn=drivers_fn,
+        maf_participant_id_col=maf_participant_id_col,
+        maf_hugo_col=maf_hugo_col,
+        maf_chromosome_col=maf_chromosome_col,
+        maf_start_pos_col=maf_start_pos_col,
+        maf_cluster_col=maf_cluster_col,
+        tree_meta_col=tree_meta_col
+    )
+
+
+def gen_ccf_plot(bundle, time_scaled, samples_df):
     """Generate CCF plot including treatment bars.
 
     Parameters
     ----------
-    df
-        participant level DataFrame
-    idx
+    bundle
+        participant's PhylogicNDT results, see load_phylogic_bundle
     time_scaled
         time scaled checkbox value
     samples_df
@@ -113,9 +236,7 @@ def gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_h
         'Immunotherapy': 'Orange'
     }
 
-    cluster_df = pd.read_csv(df.loc[idx, 'cluster_ccfs_fn'], sep='\t', usecols=['Cluster_ID', 'Sample_ID',
-                                                                                'postDP_ccf_mean', 'postDP_ccf_CI_low',
-                                                                                'postDP_ccf_CI_high'])
+    cluster_df = bundle['cluster_df'].copy()
     samples_list = cluster_df['Sample_ID'].unique()
 
     # todo replace this with using sif file - to ensure all collection dates are present and correct
@@ -135,23 +256,12 @@ def gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_h
         scatter_x = 'order'
         rect_x = 6
 
-    if 'treatments_fn' in df:
-        treatments_df = pd.read_csv(df.loc[idx, 'treatments_fn'], sep='\t', comment='#')
+    treatments_df = bundle['treatments_df']
+    if treatments_df is not None:
         treatments_in_frame_df = treatments_df[(treatments_df['stop_date_dfd'] >= int(timing_data[samples_in_order[0]])) &
                                            (treatments_df['start_date_dfd'] <= int(timing_data[samples_in_order[-1]]))]
 
-    # get mutation counts
-    mut_ccfs = pd.read_csv(df.loc[idx, 'maf_fn'], sep='\t')
-    # participant_id = mut_ccfs.columns[mut_ccfs.columns.isin(['Patient_ID', 'Participant_ID', 'participant_id'])][0]
-    # start_pos_id = mut_ccfs.columns[mut_ccfs.columns.isin(['Start_position', 'Start_Position'])][0]
-    # cluster = mut_ccfs.columns[mut_ccfs.columns.isin(['Cluster_Assignment', 'cluster'])][0]
-    mut_count_dict = mut_ccfs.drop_duplicates([
-        maf_participant_id_col,
-        maf_hugo_col,
-        maf_chromosome_col,
-        maf_start_pos_col,
-        maf_cluster_col
-    ]).groupby(maf_cluster_col).count()[maf_participant_id_col].to_dict()
+    mut_count_dict = bundle['mut_count_dict']
 
     cluster_colors = [cluster_color(i) for i in cluster_df['Cluster_ID'].unique()]
     cluster_df['Cluster_ID'] = cluster_df['Cluster_ID'].astype(str)
@@ -237,7 +347,7 @@ def gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_h
         row=2, col=1
     )
 
-    if 'Time Scaled' in time_scaled and 'treatments_fn' in df:
+    if 'Time Scaled' in time_scaled and treatments_df is not None:
         for start, stop, drug, drug_combo, category, stop_reason, post_status in zip(treatments_in_frame_df.start_date_dfd,
                                                                                      treatments_in_frame_df.stop_date_dfd,
                                                                                      treatments_in_frame_df.drugs,
@@ -343,8 +453,8 @@ def gen_driver_edge_labels(drivers, cluster_hugo_list):
     ----------
     drivers: pd.DataFrame()
         DataFrame from the drivers kwarg file
-    cluster_hugo_list: list of str
-        list of hugo symbols associated with a particular cluster
+    cluster_hugo_list: list or set of str
+        hugo symbols associated with a particular cluster
 
     Returns
     -------
@@ -358,20 +468,15 @@ def gen_driver_edge_labels(drivers, cluster_hugo_list):
 
     return label
 
-def gen_phylogicNDT_tree(df, idx, tree_num, drivers_fn, maf_start_pos_col, maf_cluster_col, maf_hugo_col, tree_meta_col='n_iter'):
+def gen_phylogicNDT_tree(bundle, tree_num):
     """Generate PhlogicNDT tree and dropdown to choose from all possible trees.
 
     Parameters
     ----------
-    df
-        participant level DataFrame
-    idx
+    bundle
+        participant's PhylogicNDT results, see load_phylogic_bundle
     tree_num
         number assigned to the chosen tree that is to be displayed
-    drivers_fn
-        name of the drivers file passed into to gen_review_app as kwarg
-    tree_meta_col
-        Which column from the tree file to display along with the tree name in the dropdown. See data in 'build_tree_posterior_fn'
 
     Returns
     -------
@@ -381,42 +486,10 @@ def gen_phylogicNDT_tree(df, idx, tree_num, drivers_fn, maf_start_pos_col, maf_c
         possible tree options for dropdown
 
     """
-    tree_df = pd.read_csv(df.loc[idx, 'build_tree_posterior_fn'], sep='\t')
-    maf_df = pd.read_csv(df.loc[idx, 'maf_fn'], sep='\t')
-    maf_df.drop_duplicates(subset=maf_start_pos_col, inplace=True)
-    if drivers_fn:
-        drivers = pd.read_csv(drivers_fn, header=None, names=['drivers'])
-
-    # cluster_assignment_col = maf_df.columns[maf_df.columns.isin(['Cluster_Assignment', 'cluster'])][0]
-    cluster_assignments = maf_df[maf_cluster_col].unique().tolist()
-    possible_trees = []
-    possible_trees_edges = []
-    clusters = {}
-    cluster_count = {}
-    cluster_list = []
-
-    trees = tree_df.loc[:, 'edges']
-    for i, tree in enumerate(trees):
-        possible_trees_edges.append(tree.split(','))
-        tree_label = f'Tree {i+1}'
-        if tree_meta_col:
-            tree_label = tree_label + f' ({tree_meta_col}={tree_df[tree_meta_col][i]})'
-        possible_trees.append(tree_label)
-
-    for i in range(len(cluster_assignments)):
-        clusters[cluster_assignments[i]] = [hugo for clust, hugo in zip(maf_df[maf_cluster_col], maf_df[maf_hugo_col]) if clust == cluster_assignments[i]]
-
-    for clust in clusters:
-        cluster_count[clust] = len(clusters[clust])
-
-    edges = possible_trees_edges[tree_num]
-
-    for i in edges:
-        new_list = i.split('-')
-        for j in new_list:
-            if (j !='None') & (j not in cluster_list):
-                cluster_list.append(j)
-    cluster_list = sorted(cluster_list)
+    possible_trees = bundle['possible_trees']
+    edge_labels = bundle['cluster_edge_labels']
+    cluster_list = bundle['tree_clusters'][tree_num]
+    edges_list = bundle['tree_edges'][tree_num]
 
     nodes = [{'data': {'id': 'normal', 'label': 'normal'}, 'position': {'x': 0, 'y': 0}}]
 
@@ -428,30 +501,15 @@ def gen_phylogicNDT_tree(df, idx, tree_num, drivers_fn, maf_start_pos_col, maf_c
         for cluster in cluster_list
     ])
 
-    edges_list = []
-    nodes_copy = nodes.copy()
-    for edge in edges:
-        nodes_copy = edge.split('-')
-        if nodes_copy[0]!='None':
-            nodes_copy = list(map(int,edge.split('-')))
-            edges_list.append(nodes_copy)
-
-    if drivers_fn:
-        edges = [{'data': {'source': 'normal', 'target': 'cluster_1', 'label': f'{cluster_count[1]}\n{gen_driver_edge_labels(drivers, clusters[1])}'}}]
-        edges.extend([
-            {'data': {'source': f'cluster_{edge[0]}', 'target': f'cluster_{edge[1]}', 'label': f'{cluster_count[edge[1]]}\n{gen_driver_edge_labels(drivers, clusters[edge[1]])}'}}
-            for edge in edges_list
-        ])
-    else:
-        edges = [{'data': {'source': 'normal', 'target': 'cluster_1', 'label': str(cluster_count[1])}}]
-        edges.extend([
-            {'data': {'source': f'cluster_{edge[0]}', 'target': f'cluster_{edge[1]}', 'label': str(cluster_count[edge[1]])}}
-            for edge in edges_list
-        ])
+    edges = [{'data': {'source': 'normal', 'target': 'cluster_1', 'label': edge_labels[1]}}]
+    edges.extend([
+        {'data': {'source': f'cluster_{edge[0]}', 'target': f'cluster_{edge[1]}', 'label': edge_labels[edge[1]]}}
+        for edge in edges_list
+    ])
 
     elements = nodes + edges
 
-    stylesheet = gen_stylesheet(cluster_list)
+    stylesheet = gen_stylesheet(list(cluster_list))
 
     return [
         cyto.Cytoscape(
@@ -465,7 +523,7 @@ def gen_phylogicNDT_tree(df, idx, tree_num, drivers_fn, maf_start_pos_col, maf_c
             stylesheet=stylesheet,
             userZoomingEnabled=False
         ),
-        possible_trees
+        list(possible_trees)
     ]
 
 def gen_phylogicNDT_graphics(
@@ -510,8 +568,10 @@ def gen_phylogicNDT_graphics(
     samples_df = data.sample_df
 
     if df.loc[idx, 'cluster_ccfs_fn']:
-        ccf_plot = gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col, maf_cluster_col)
-        tree, possible_trees = gen_phylogicNDT_tree(df, idx, 0, drivers_fn, maf_start_pos_col, maf_cluster_col, maf_hugo_col, tree_meta_col=tree_meta_col)
+        bundle = load_participant_phylogic_bundle(df, idx, drivers_fn, maf_participant_id_col, maf_hugo_col,
+                                                  maf_chromosome_col, maf_start_pos_col, maf_cluster_col, tree_meta_col)
+        ccf_plot = gen_ccf_plot(bundle, time_scaled, samples_df)
+        tree, possible_trees = gen_phylogicNDT_tree(bundle, 0)
 
         return [ccf_plot, possible_trees, possible_trees[0], tree, dash.no_update]
     else:
@@ -565,8 +625,11 @@ def internal_gen_phylogicNDT_graphics(
                     if n.isdigit():
                         tree_num = int(n)
 
-                ccf_plot = gen_ccf_plot(df, idx, time_scaled, samples_df, maf_participant_id_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col, maf_cluster_col)
-                tree, possible_trees = gen_phylogicNDT_tree(df, idx, tree_num-1, drivers_fn, maf_start_pos_col, maf_cluster_col, maf_hugo_col, tree_meta_col)
+                bundle = load_participant_phylogic_bundle(df, idx, drivers_fn, maf_participant_id_col, maf_hugo_col,
+                                                          maf_chromosome_col, maf_start_pos_col, maf_cluster_col,
+                                                          tree_meta_col)
+                ccf_plot = gen_ccf_plot(bundle, time_scaled, samples_df)
+                tree, possible_trees = gen_phylogicNDT_tree(bundle, tree_num-1)
 
                 return [ccf_plot, possible_trees, chosen_tree, tree, dash.no_update]
             else:
@@ -575,6 +638,18 @@ def internal_gen_phylogicNDT_graphics(
             return [dash.no_update, dash.no_update, dash.no_update, dash.no_update, {'type': 'jpg', 'action': 'download'}]
 
 
+def prefetch_phylogicNDT_graphics(
+        data: PatientSampleData, idx,
+        drivers_fn=None, maf_participant_id_col=None, maf_hugo_col=None, maf_chromosome_col=None, maf_start_pos_col=None, maf_cluster_col=None,
+        tree_meta_col='n_iter'
+    ):
+    """Load the participant's PhylogicNDT results into the cache - prefetch callback."""
+    df = data.participant_df
+    if df.loc[idx, 'cluster_ccfs_fn']:
+        load_participant_phylogic_bundle(df, idx, drivers_fn, maf_participant_id_col, maf_hugo_col,
+                                         maf_chromosome_col, maf_start_pos_col, maf_cluster_col, tree_meta_col)
+
+
 # -------------------------- PhylogicNDT PMF Plot ----------------------------
 def gen_ccf_pmf_component():
     return AppComponent(name='CCF pmf Mutation Plot',
@@ -614,20 +689,104 @@ def gen_ccf_pmf_component():
                             State('mutation-filtered-ids', 'value')  # all rows in table after filtering
                         ],
                         new_data_callback=gen_pmf_component,
-                        internal_callback=update_pmf_component
+                        internal_callback=update_pmf_component,
+                        prefetch_callback=prefetch_pmf_component
                         )
 
 
+@file_cache(file_args=['maf_fn'])
+def load_mut_ccfs(maf_fn, maf_start_pos_col=None):
+    """Load a PhylogicNDT mut_ccfs file indexed by unique mutation id, with its CCF histogram columns (cached).
+
+    Parameters
+    ----------
+    maf_fn
+        mut_ccfs file
+    maf_start_pos_col
+        Name of the start position column used in the mutation ids (see get_maf_ids)
+
+    Returns
+    -------
+    mut_ccfs_df : pd.DataFrame
+        mut_ccfs indexed by unique mutation id (also in 'unique_mut_id' column); should not be modified
+    ccfs_headers : list of str
+        CCF histogram bin columns (e.g. '0.00' or 'preDP_ccf_0.00')
+    ccfs_header_dict : dict
+        CCF histogram bin column to the CCF bin label ('0.00')
+    """
+    mut_ccfs_df = get_maf(maf_fn)
+    mut_ccfs_df['unique_mut_id'] = get_maf_ids(maf_fn, start_pos=maf_start_pos_col)
+    mut_ccfs_df.set_index('unique_mut_id', inplace=True, drop=False)
+
+    ccfs_headers = [re.search('.*[01].[0-9]+', i) for i in mut_ccfs_df.columns]
+    ccfs_headers = [x.group() for x in ccfs_headers if x]
+    ccfs_header_dict = {i: re.search('[01].[0-9]+', i).group() for i in ccfs_headers}
+
+    return mut_ccfs_df, ccfs_headers, ccfs_header_dict
+
+
+@file_cache(file_args=['maf_fn'], disk=True)
+def load_ccf_pmf_tensor(maf_fn, maf_sample_id_col, maf_cluster_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col):
+    """Reshape the CCF histograms of a mut_ccfs file into a mutations x samples x CCF bins array.
+
+    Cached in memory and, if a directory is set with set_disk_cache_dir, on disk.
+
+    Parameters
+    ----------
+    maf_fn
+        mut_ccfs file
+    maf_sample_id_col, maf_cluster_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col
+        Names of the sample id, cluster assignment, hugo symbol, chromosome and start position columns
+
+    Returns
+    -------
+    dict
+        - mut_ids: pd.Index of unique mutation ids, in mut_ccfs order
+        - samples: np.ndarray of sample ids, in mut_ccfs order
+        - ccfs: CCF bin labels ('0.00' to '1.00')
+        - ccf_tensor: np.ndarray (mutations x samples x bins) of CCF probabilities, NaN where a mutation
+          is missing in a sample (mean of the rows if a mutation is given more than once for a sample)
+        - mut_clusters: np.ndarray of the cluster of each mutation
+        - mut_labels: np.ndarray of the legend label of each mutation ('hugo - chrom:start')
+
+        The values are cached and should not be modified.
+    """
+    mut_ccfs_df, ccfs_headers, ccfs_header_dict = load_mut_ccfs(maf_fn, maf_start_pos_col)
+    mut_codes, mut_ids = pd.factorize(mut_ccfs_df['unique_mut_id'])
+    sample_codes, samples = pd.factorize(mut_ccfs_df[maf_sample_id_col])
+
+    ccf_sum = np.zeros((len(mut_ids), len(samples), len(ccfs_headers)))
+    np.add.at(ccf_sum, (mut_codes, sample_codes), mut_ccfs_df[ccfs_headers].to_numpy(dtype=float))
+    ccf_count = np.zeros((len(mut_ids), len(samples)))
+    np.add.at(ccf_count, (mut_codes, sample_codes), 1)
+    with np.errstate(invalid='ignore'):
+        ccf_tensor = ccf_sum / ccf_count[:, :, np.newaxis]
+
+    first_muts_df = mut_ccfs_df.drop_duplicates('unique_mut_id')
+    mut_labels = (first_muts_df[maf_hugo_col].astype(str) + ' - ' + first_muts_df[maf_chromosome_col].astype(str) +
+                  ':' + first_muts_df[maf_start_pos_col].astype(str))
+
+    return {
+        'mut_ids': pd.Index(mut_ids),
+        'samples': np.asarray(samples),
+        'ccfs': [ccfs_header_dict[header] for header in ccfs_headers],
+        'ccf_tensor': ccf_tensor,
+        'mut_clusters': first_muts_df[maf_cluster_col].to_numpy(),
+        'mut_labels': mut_labels.to_numpy(dtype=object),
+    }
+
+
 def ccf_pmf_plot(data_df, idx, sample_selection, group_clusters, selected_mut_ids, filtered_mut_ids, maf_sample_id_col, maf_cluster_col, maf_hugo_col, maf_chromosome_col, maf_start_pos_col):
 
     """Plots the CCF pmf distribution for the chosen mutation(s).
 
     Notes
     -----
-    - Displays the pmf distribution as a normalized histogram
+    - Displays the pmf distribution as bars, one bar per CCF bin
     - Samples are shown in separate rows
-    - Clusters displayed with different colors, with adjacent bars
+    - Clusters displayed with different colors (mean pmf of the cluster's mutations), with adjacent bars
     - Given maf file in column 'maf_fn' in the df must be mut_ccfs file
+    - The bars are computed from the cached CCF tensor (see load_ccf_pmf_tensor)
 
     TODO
     ----
@@ -635,44 +794,74 @@ def ccf_pmf_plot(data_df, idx, sample_selection, group_clusters, selected_mut_id
     - Add an indication of mean?
 
     """
-    mut_ccfs_df = pd.read_csv(data_df.loc[idx, 'maf_fn'], sep='\t')
-    mut_ccfs_df['unique_mut_id'] = mut_ccfs_df.apply(get_unique_identifier, axis=1)  # must be mut_ccfs file with default columns
-    mut_ccfs_df.set_index('unique_mut_id', inplace=True, drop=False)
+    pmf = load_ccf_pmf_tensor(data_df.loc[idx, 'maf_fn'], maf_sample_id_col, maf_cluster_col, maf_hugo_col,
+                              maf_chromosome_col, maf_start_pos_col)  # must be mut_ccfs file
 
     # Use only the selected mutations unless no mutations selected, then use filtered list
-    if selected_mut_ids:
-        mut_ccfs_df = mut_ccfs_df.loc[selected_mut_ids].copy()
-    elif filtered_mut_ids:
-        mut_ccfs_df = mut_ccfs_df.loc[filtered_mut_ids].copy()
-    # else (if all mutations in table are filtered out and none selected): use all mutations
+    if selected_mut_ids or filtered_mut_ids:
+        mut_positions = pmf['mut_ids'].get_indexer(pd.unique(pd.Series(selected_mut_ids or filtered_mut_ids)))
+        mut_positions = mut_positions[mut_positions >= 0]
+    else:
+        # if all mutations in table are filtered out and none selected: use all mutations
+        mut_positions = np.arange(len(pmf['mut_ids']))
 
-    sample_list = mut_ccfs_df[maf_sample_id_col].unique()  # todo ensure sorted by collection date
+    sample_present = ~np.isnan(pmf['ccf_tensor'][mut_positions, :, 0])
+    sample_list = pmf['samples'][sample_present.any(axis=0)]  # todo ensure sorted by collection date
     sample_selection = sample_list if not sample_selection else sample_selection
-    mut_ccfs_df = mut_ccfs_df[mut_ccfs_df[maf_sample_id_col].isin(sample_selection)].copy()
-
-    ccfs_headers = [re.search('.*[01].[0-9]+', i) for i in mut_ccfs_df.columns]
-    ccfs_headers = [x.group() for x in ccfs_headers if x]
-    ccfs_header_dict = {i: re.search('[01].[0-9]+', i).group() for i in ccfs_headers}
+    sample_positions = np.flatnonzero(sample_present.any(axis=0) & np.isin(pmf['samples'], sample_selection))
 
-    stacked_muts = mut_ccfs_df.set_index([maf_sample_id_col, 'unique_mut_id', maf_cluster_col])[
-        ccfs_headers].stack().reset_index().rename(columns={'level_3': 'CCF', 0: 'Probability'}).replace(
-        ccfs_header_dict)
+    ccf_tensor = pmf['ccf_tensor'][np.ix_(mut_positions, sample_positions)]
+    present = ~np.isnan(ccf_tensor[:, :, 0])
     if group_clusters:
-        stacked_muts[maf_cluster_col] = stacked_muts[maf_cluster_col].astype(str)
-        fig = px.histogram(stacked_muts, x='CCF', y='Probability', facet_row=maf_sample_id_col, barmode='group',
-                           height=300 * len(sample_selection), color=maf_cluster_col, histfunc='avg',
-                           color_discrete_map=cluster_color(),
-                           category_orders={maf_cluster_col: np.arange(1, 100)})
+        cluster_codes, clusters = pd.factorize(pmf['mut_clusters'][mut_positions], sort=True)
+        in_cluster = cluster_codes >= 0
+        bar_sum = np.zeros((len(clusters), len(sample_positions), len(pmf['ccfs'])))
+        np.add.at(bar_sum, cluster_codes[in_cluster], np.nan_to_num(ccf_tensor[in_cluster]))
+        bar_count = np.zeros((len(clusters), len(sample_positions)))
+        np.add.at(bar_count, cluster_codes[in_cluster], present[in_cluster])
+        with np.errstate(invalid='ignore'):
+            bars = bar_sum / bar_count[:, :, np.newaxis]
+        bar_present = bar_count > 0
+        bar_names = [str(cluster) for cluster in clusters]
+        colors = cluster_color()
+        bar_colors = [colors.get(name) for name in bar_names]
+        legend_title = maf_cluster_col
+        y_title = 'avg of Probability'
     else:
-        fig = px.histogram(stacked_muts, x='CCF', y='Probability', facet_row=maf_sample_id_col, barmode='group',
-                           height=300 * len(sample_selection), color='unique_mut_id',
-                           labels={'unique_mut_id': 'Mutation'})
-        mut_label_dict = {x['unique_mut_id']: f"{x[maf_hugo_col]} - {x[maf_chromosome_col]}:{x[maf_start_pos_col]}" for idx, x
-                          in mut_ccfs_df.drop_duplicates('unique_mut_id').iterrows()}
-        fig.for_each_trace(lambda t: t.update(name=mut_label_dict[t.name]))
-
-    fig.update_layout(xaxis_tickangle=0, xaxis_ticklabelstep=5)
-    fig.update_yaxes(matches=None)
+        bars = ccf_tensor
+        bar_present = present
+        bar_names = pmf['mut_labels'][mut_positions]
+        bar_colors = [px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)] for i in range(len(bars))]
+        legend_title = 'Mutation'
+        y_title = 'Probability'
+
+    fig = make_subplots(rows=max(len(sample_positions), 1), cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        row_titles=[f'{maf_sample_id_col}={sample}' for sample in pmf['samples'][sample_positions]])
+    traces = []
+    rows = []
+    for i, (name, color) in enumerate(zip(bar_names, bar_colors)):
+        showlegend = True
+        for j in np.flatnonzero(bar_present[i]):
+            traces.append(go.Bar(
+                x=pmf['ccfs'],
+                y=bars[i, j],
+                name=name,
+                legendgroup=name,
+                offsetgroup=str(i),
+                marker_color=color,
+                showlegend=showlegend,
+                hovertemplate=f'{legend_title}={name}<br>CCF=%{{x}}<br>{y_title}=%{{y}}<extra></extra>'
+            ))
+            rows.append(j + 1)
+            showlegend = False
+    if traces:
+        fig.add_traces(traces, rows=rows, cols=[1] * len(rows))
+
+    fig.update_layout(barmode='group', height=300 * len(sample_selection), legend_title_text=legend_title,
+                      legend_tracegroupgap=0, margin_t=60)
+    fig.update_xaxes(tickangle=0, ticklabelstep=5)
+    fig.update_xaxes(title_text='CCF', row=max(len(sample_positions), 1), col=1)
+    fig.update_yaxes(title_text=y_title, matches=None)
 
     return fig, sample_list
 
@@ -700,6 +889,14 @@ def update_pmf_component(data: PatientSampleData, idx, button_clicks, sample_sel
 
     return [fig, sample_list, sample_selection]
 
+
+def prefetch_pmf_component(data: PatientSampleData, idx,
+                           maf_sample_id_col=None, maf_cluster_col=None, maf_hugo_col=None,
+                           maf_chromosome_col=None, maf_start_pos_col=None):
+    """Load the participant's CCF tensor into the cache - prefetch callback."""
+    load_ccf_pmf_tensor(data.participant_df.loc[idx, 'maf_fn'], maf_sample_id_col, maf_cluster_col, maf_hugo_col,
+                        maf_chromosome_col, maf_start_pos_col)
+
 # ----------------------------- PhylogicNDT Cluster Metrics -------------------------------
 
 def gen_cluster_metrics_component():
@@ -712,16 +909,29 @@ def gen_cluster_metrics_component():
                             Output('metric-plot', 'figure'),
                         ],
                         new_data_callback=gen_cluster_metric_fig,
-                        internal_callback=gen_cluster_metric_fig
+                        internal_callback=gen_cluster_metric_fig,
+                        prefetch_callback=prefetch_cluster_metric_fig
                         )
 
 
 def gen_cluster_metric_fig(data: PatientSampleData, idx, maf_variant_type_col=None, maf_variant_class_col=None, maf_cluster_col=None):
     """Generate a figure showing mutation type comparisons across clusters with indication of differences."""
-    data_df = data.participant_df
+    maf_fn = data.participant_df.loc[idx, 'maf_fn']
+    return [gen_cluster_metric_figure(maf_fn, maf_variant_type_col, maf_variant_class_col, maf_cluster_col)]
+
+
+def prefetch_cluster_metric_fig(data: PatientSampleData, idx, maf_variant_type_col=None, maf_variant_class_col=None, maf_cluster_col=None):
+    """Compute the cluster metrics figure into the cache - prefetch callback."""
+    gen_cluster_metric_fig(data, idx, maf_variant_type_col, maf_variant_class_col, maf_cluster_col)
+
+
+@file_cache(file_args=['maf_fn'], disk=True)
+def gen_cluster_metric_figure(maf_fn, maf_variant_type_col=None, maf_variant_class_col=None, maf_cluster_col=None):
+    """Cluster metrics figure of a mut_ccfs file, see gen_cluster_metric_fig. The figure should not be modified.
 
-    mut_ccfs_df = pd.read_csv(data_df.loc[idx, 'maf_fn'], sep='\t')
-    mut_ccfs_df['unique_mut_id'] = mut_ccfs_df.apply(get_unique_identifier, axis=1)  # mut_ccfs file has default columns
+    Cached in memory and, if a directory is set with set_disk_cache_dir, on disk."""
+    mut_ccfs_df = get_maf(maf_fn)  # mut_ccfs file
+    mut_ccfs_df['unique_mut_id'] = get_maf_ids(maf_fn)
     mut_ccfs_df.drop_duplicates('unique_mut_id', inplace=True)
 
     # apply functions to specify coding vs. non-coding; silent vs. nonsyn
@@ -783,7 +993,7 @@ def gen_cluster_metric_fig(data: PatientSampleData, idx, maf_variant_type_col=No
                                 selector={'text': str(idx)})
     # todo add indication of which category is significantly different
 
-    return [fig]
+    return fig
 
 
 def classify_mut(variant_class):
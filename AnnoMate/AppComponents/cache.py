@@ -0,0 +1,407 @@
+"""cache.py module
+
+In-memory caches for the data loaded by AppComponents.
+
+file_cache works like functools.lru_cache, but checks the modification time and size of the files the
+function reads, so a file rewritten by a pipeline is reloaded instead of served from the cache.
+All caches are kept in a registry to clear them or invalidate a file without scanning the garbage collector.
+
+The caches share a memory budget (see set_cache_memory_budget). The size of each entry is estimated when it
+is added (see estimate_size) and the least recently used entries of all caches are evicted once the budget is
+exceeded.
+
+Caches created with disk=True also store their values as pickle files in the directory given to
+set_disk_cache_dir, keyed on the content of the input files and the other arguments, so they are reused after a
+restart and by other processes.
+
+"""
+
+import os
+import sys
+import hashlib
+import pickle
+import tempfile
+import warnings
+import inspect
+import functools
+import itertools
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+_cache_registry = []
+
+# shared by all FileCache objects, for the memory budget
+_cache_lock = threading.RLock()
+_access_counter = itertools.count()
+_memory_budget = {'maxbytes': 2 * 1024 ** 3}
+
+_disk_cache = {'dir': None}
+# bump when the format of the values stored on disk changes
+_disk_cache_version = 1
+_content_hashes = {}
+# returned by FileCache._load_from_disk when there is no usable value, as None can be a cached value
+_not_found = object()
+
+
+def set_cache_memory_budget(maxbytes):
+    """Set the memory budget shared by all FileCache caches and evict entries if needed.
+
+    Values larger than the budget are not cached; each cache warns the first time it returns one.
+
+    :param maxbytes: maximum estimated size of all cached values, in bytes. None for no limit. Default: 2 GiB
+    """
+    with _cache_lock:
+        _memory_budget['maxbytes'] = maxbytes
+        _enforce_memory_budget()
+
+
+def set_disk_cache_dir(path):
+    """Set the directory where caches created with disk=True store their values.
+
+    :param path: directory, created if needed. None to disable the disk cache (default).
+        Delete the directory to recompute the stored values.
+    """
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+    _disk_cache['dir'] = path
+
+
+def get_disk_cache_dir():
+    """Directory where caches created with disk=True store their values, or None if the disk cache is disabled"""
+    return _disk_cache['dir']
+
+
+def get_cache_memory_usage():
+    """Estimated size in bytes of all values cached by FileCache caches"""
+    return sum(cache.nbytes for cache in _cache_registry if isinstance(cache, FileCache))
+
+
+def get_cache_info():
+    """Statistics of the registered FileCache caches
+
+    :return: pandas.DataFrame indexed by cached function, with columns
+        hits, misses, disk_hits (misses loaded from the disk cache), reloads (entries recomputed because a file
+        changed), evictions, entries, nbytes, too_large (values not cached because they exceed the memory budget).
+        The memory budget is in attrs['maxbytes'].
+    """
+    cache_info = pd.DataFrame(
+        [cache.cache_info() for cache in _cache_registry if isinstance(cache, FileCache)],
+        index=pd.Index(
+            [f'{cache.__module__}.{cache.__qualname__}' for cache in _cache_registry if isinstance(cache, FileCache)],
+            name='function'
+        ),
+        columns=['hits', 'misses', 'disk_hits', 'reloads', 'evictions', 'entries', 'nbytes', 'too_large'],
+    )
+    cache_info.attrs['maxbytes'] = _memory_budget['maxbytes']
+    return cache_info
+
+
+def estimate_size(value):
+    """Estimate the memory used by a cached value, in bytes.
+
+    DataFrames and Series use memory_usage(deep=True), numpy arrays nbytes and plotly figures the size of their
+    data and layout. Lists, tuples and dicts are summed recursively. Other objects use sys.getsizeof.
+
+    :param value: object to measure
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'to_plotly_json'):  # plotly figures and traces
+        return estimate_size(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def register_cache(cache):
+    """Add a cache to the registry used by clear_caches and invalidate_file.
+
+    :param cache: object with a cache_clear method (FileCache, functools.lru_cache wrapper)
+    :return: the cache, so this can be used as a decorator on top of functools.lru_cache
+    """
+    if cache not in _cache_registry:
+        _cache_registry.append(cache)
+    return cache
+
+
+def clear_caches():
+    """Clear every registered cache"""
+    for cache in _cache_registry:
+        cache.cache_clear()
+
+
+def invalidate_file(fn):
+    """Remove the entries computed from a file from every registered FileCache
+
+    :param fn: filename/path
+    """
+    for cache in _cache_registry:
+        if isinstance(cache, FileCache):
+            cache.invalidate_file(fn)
+
+
+def get_file_signature(fn):
+    """(absolute path, modification time in ns, size in bytes) of a file, or (absolute path, None, None) if missing"""
+    path = os.path.abspath(fn)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def get_file_content_hash(fn):
+    """sha256 hex digest of the content of a file, or None if missing. Hashes are reused until the file changes."""
+    file_signature = get_file_signature(fn)
+    if file_signature[1] is None:
+        return None
+    content_hash = _content_hashes.get(file_signature)
+    if content_hash is None:
+        sha256 = hashlib.sha256()
+        with open(file_signature[0], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+        content_hash = sha256.hexdigest()
+        _content_hashes[file_signature] = content_hash
+    return content_hash
+
+
+def _canonical_arg(value):
+    # nested tuples with a stable repr, independent of dictionary order
+    if isinstance(value, Mapping):
+        return tuple(sorted(((repr(k), _canonical_arg(v)) for k, v in value.items()), key=lambda kv: kv[0]))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical_arg(v) for v in value)
+    return value
+
+
+def file_cache(maxsize=None, file_args=(), disk=False):
+    """Decorator: least recently used cache that reloads entries when their input files change.
+
+    Use instead of functools.lru_cache for functions reading files. Arguments must be hashable (see freezeargs).
+    Entries are evicted when the shared memory budget is exceeded (see set_cache_memory_budget).
+
+    :param maxsize: maximum number of entries kept. None to only bound the cache by the memory budget.
+    :param file_args: names of the function parameters holding a filename, or a list/tuple of filenames
+    :param disk: also store the values in the disk cache directory (see set_disk_cache_dir). Values must be picklable.
+    """
+    def decorator(func):
+        return register_cache(FileCache(func, maxsize=maxsize, file_args=file_args, disk=disk))
+    return decorator
+
+
+def _enforce_memory_budget():
+    maxbytes = _memory_budget['maxbytes']
+    if maxbytes is None:
+        return
+    caches = [cache for cache in _cache_registry if isinstance(cache, FileCache)]
+    total_nbytes = sum(cache.nbytes for cache in caches)
+    while total_nbytes > maxbytes:
+        # least recently used entry across caches: the oldest entry of each cache is first
+        cache = min(
+            [cache for cache in caches if len(cache._entries) > 0],
+            key=lambda c: next(iter(c._entries.values())).last_access
+        )
+        total_nbytes -= cache._evict_oldest()
+
+
+class _CacheEntry:
+    __slots__ = ['files_signature', 'value', 'nbytes', 'last_access']
+
+    def __init__(self, files_signature, value, nbytes):
+        self.files_signature = files_signature
+        self.value = value
+        self.nbytes = nbytes
+        self.last_access = next(_access_counter)
+
+
+class FileCache:
+
+    def __init__(self, func, maxsize=None, file_args=(), disk=False):
+        """Least recently used cache of a function's outputs, keyed on its arguments and validated with the
+        signature (path, mtime, size) of its input files. See file_cache.
+
+        :param func: function to cache
+        :param maxsize: maximum number of entries kept. None to only bound the cache by the memory budget.
+        :param file_args: names of the function parameters holding a filename, or a list/tuple of filenames
+        :param disk: also store the values in the disk cache directory (see set_disk_cache_dir)
+        """
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.maxsize = maxsize
+        self.file_args = list(file_args)
+        self.disk = disk
+        self._func_signature = inspect.signature(func)
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.too_large = 0
+
+    def __call__(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        files_signature = self.get_files_signature(args, kwargs)
+        with _cache_lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.files_signature == files_signature:
+                    self.hits += 1
+                    entry.last_access = next(_access_counter)
+                    self._entries.move_to_end(key)
+                    return entry.value
+                self.reloads += 1
+                self._remove(key)
+            self.misses += 1
+
+        disk_cache_fn = self.get_disk_cache_fn(args, kwargs)
+        value = self._load_from_disk(disk_cache_fn) if disk_cache_fn is not None else _not_found
+        if value is _not_found:
+            value = self.func(*args, **kwargs)
+            if disk_cache_fn is not None:
+                self._save_to_disk(disk_cache_fn, value)
+        else:
+            self.disk_hits += 1
+        nbytes = estimate_size(value)
+
+        with _cache_lock:
+            if key in self._entries:  # computed concurrently
+                self._remove(key)
+            maxbytes = _memory_budget['maxbytes']
+            if maxbytes is None or nbytes <= maxbytes:
+                self._entries[key] = _CacheEntry(files_signature, value, nbytes)
+                self.nbytes += nbytes
+                while self.maxsize is not None and len(self._entries) > self.maxsize:
+                    self._evict_oldest()
+                _enforce_memory_budget()
+            else:
+                self.too_large += 1
+                if self.too_large == 1:
+                    warnings.warn(
+                        f'{self.__qualname__} returned a value of {nbytes} bytes, larger than the cache memory budget '
+                        f'({maxbytes} bytes). Values larger than the budget are not cached, '
+                        f'see set_cache_memory_budget.'
+                    )
+        return value
+
+    def __get__(self, instance, owner):
+        # support decorating methods
+        if instance is None:
+            return self
+        return functools.partial(self, instance)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+        return entry.nbytes
+
+    def _evict_oldest(self):
+        self.evictions += 1
+        return self._remove(next(iter(self._entries)))
+
+    def get_files_signature(self, args, kwargs):
+        """Signatures of the input files of a call (see get_file_signature)"""
+        if not self.file_args:
+            return ()
+        bound_args = self._func_signature.bind(*args, **kwargs).arguments
+        files_signature = []
+        for arg_name in self.file_args:
+            fns = bound_args.get(arg_name)
+            if fns is None:
+                continue
+            if isinstance(fns, (str, os.PathLike)):
+                fns = [fns]
+            files_signature.extend(get_file_signature(fn) for fn in fns)
+        return tuple(files_signature)
+
+    def get_disk_cache_fn(self, args, kwargs):
+        """Path of the disk cache file for a call, or None if the disk cache is not used.
+
+        The name is a hash of the function name, the content of the input files and the other arguments.
+        """
+        if not self.disk or _disk_cache['dir'] is None:
+            return None
+        bound_args = self._func_signature.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        key = []
+        for arg_name, value in bound_args.arguments.items():
+            if arg_name in self.file_args and value is not None:
+                fns = [value] if isinstance(value, (str, os.PathLike)) else value
+                value = tuple(get_file_content_hash(fn) for fn in fns)
+            key.append((arg_name, _canonical_arg(value)))
+        key_hash = hashlib.sha256(
+            repr((_disk_cache_version, self.__module__, self.__qualname__, tuple(key))).encode()
+        ).hexdigest()
+        return os.path.join(_disk_cache['dir'], f'{self.__qualname__}-{key_hash}.pkl')
+
+    @staticmethod
+    def _load_from_disk(disk_cache_fn):
+        if not os.path.exists(disk_cache_fn):
+            return _not_found
+        try:
+            with open(disk_cache_fn, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            warnings.warn(f'Could not read disk cache file {disk_cache_fn}, recomputing: {e}')
+            return _not_found
+
+    @staticmethod
+    def _save_to_disk(disk_cache_fn, value):
+        # write to a temporary file first so other processes never read a partial file
+        try:
+            fd, tmp_fn = tempfile.mkstemp(dir=os.path.dirname(disk_cache_fn), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_fn, disk_cache_fn)
+            except BaseException:
+                os.remove(tmp_fn)
+                raise
+        except (OSError, pickle.PicklingError) as e:
+            warnings.warn(f'Could not write disk cache file {disk_cache_fn}: {e}')
+
+    def invalidate_file(self, fn):
+        """Remove the entries computed from a file
+
+        :param fn: filename/path
+        """
+        path = os.path.abspath(fn)
+        with _cache_lock:
+            for key in [
+                key for key, entry in self._entries.items()
+                if path in [file_signature[0] for file_signature in entry.files_signature]
+            ]:
+                self._remove(key)
+
+    def cache_info(self):
+        """Dictionary with the hits, misses, disk_hits, reloads, evictions, entries, nbytes and too_large of the cache"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'reloads': self.reloads,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'nbytes': self.nbytes,
+            'too_large': self.too_large,
+        }
+
+    def cache_clear(self):
+        """Remove all entries"""
+        with _cache_lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,6 +1,9 @@
 import pandas as pd
 from frozendict import frozendict as fdict
 import functools
+import os
+
+from AnnoMate.AppComponents.cache import file_cache
 
 
 def get_hex_string(c):
@@ -89,11 +92,40 @@ def get_unique_identifier(row, chrom='Chromosome', start_pos='Start_position',
     return f"{row[chrom]}:{row[start_pos]}{row[ref]}>{row[alt]}"
 
 
-@functools.lru_cache(maxsize=32)
+def get_unique_identifiers(maf_df, chrom='Chromosome', start_pos='Start_position',
+                           ref='Reference_Allele', alt='Tumor_Seq_Allele'):
+    """Vectorized get_unique_identifier: generates the unique string of every mutation in a maf.
+
+    Gives the same strings as maf_df.apply(get_unique_identifier, axis=1) by concatenating string columns.
+
+    :param maf_df: pd.DataFrame maf or maf-like dataframe
+    :param chrom: the name of the contig/chromosome column/field; default: Chromosome
+    :param start_pos: the name of the start position column/field; default: Start_position
+    :param ref: the name of the reference allele column/field; default: Reference_Allele
+    :param alt: the name of the alternate allele column/field; default: Tumor_Seq_Allele
+    :return: pd.Series of identifiers with the same index as maf_df
+    """
+    return (
+        _column_to_str(maf_df[chrom]) + ':' + _column_to_str(maf_df[start_pos]) +
+        _column_to_str(maf_df[ref]) + '>' + _column_to_str(maf_df[alt])
+    ).astype(object)
+
+
+def _column_to_str(column):
+    """str() of every value in a column, including missing values ('nan', 'None') like in an f-string"""
+    strings = column.astype(str).astype(object)
+    missing = strings.isna()
+    if missing.any():
+        strings[missing] = column[missing].astype(object).map(str)
+    return strings
+
+
+@file_cache(file_args=['fn'])
 def cached_read_csv(fn, **kwargs):
     """Convenience method: Pandas read_csv with a cache already implemented.
 
-    Maxsize is set to 32 by default. At most, 32 function calls will be stored in memory.
+    Entries are kept until they are evicted to stay within the memory budget shared by all file caches
+    (see cache.set_cache_memory_budget). The file is read again if its modification time or size changed.
 
     :param fn: filename/path
     :param kwargs: additional arguments to be passed to pandas.read_csv
@@ -102,6 +134,71 @@ def cached_read_csv(fn, **kwargs):
     return pd.read_csv(fn, **kwargs)
 
 
+maf_start_pos_cols = ['Start_position', 'Start_Position']
+maf_alt_allele_cols = ['Tumor_Seq_Allele2', 'Tumor_Seq_Allele']
+maf_sample_id_cols = ['Tumor_Sample_Barcode', 'Sample_ID', 'sample_id', 'Sample_id']
+
+
+def get_maf(fn):
+    """Shared maf store: read a maf (or mut_ccfs) file once per process and return a view of it.
+
+    The file is parsed once (see _read_maf) and, if a directory is set with set_disk_cache_dir, stored on disk.
+    If one of maf_sample_id_cols is found, it is copied to an added 'Sample_ID' column. Mutation ids are not
+    added, since the columns they are built from depend on the caller: use get_maf_ids.
+
+    The returned dataframe is a shallow copy of the cached dataframe: adding, replacing or dropping columns
+    and rows is fine, but values must not be modified in place (e.g. with .loc assignment or .values).
+
+    :param fn: filename/path of a tab separated maf, or a pickled maf dataframe (.pkl)
+    :return: pandas.DataFrame
+    """
+    return _read_maf(fn).copy(deep=False)
+
+
+@file_cache(file_args=['fn'], disk=True)
+def _read_maf(fn):
+    if os.path.splitext(fn)[1] == '.pkl':
+        maf_df = pd.read_pickle(fn)
+    else:
+        maf_df = pd.read_csv(fn, sep='\t')
+
+    sample_id_col = maf_df.columns[maf_df.columns.isin(maf_sample_id_cols)]
+    if len(sample_id_col) > 0:
+        maf_df['Sample_ID'] = maf_df[sample_id_col[0]]
+
+    return maf_df
+
+
+@file_cache(file_args=['fn'])
+def get_maf_ids(fn, chrom='Chromosome', start_pos=None, ref='Reference_Allele', alt=None):
+    """Unique mutation identifiers (see get_unique_identifiers) of a maf in the shared store (see get_maf).
+
+    Cached per file and column names, so components building ids from the same columns share them.
+
+    :param fn: filename/path of a tab separated maf, or a pickled maf dataframe (.pkl)
+    :param chrom: the name of the contig/chromosome column/field; default: Chromosome
+    :param start_pos: the name of the start position column/field; default: first found of maf_start_pos_cols
+    :param ref: the name of the reference allele column/field; default: Reference_Allele
+    :param alt: the name of the alternate allele column/field; default: first found of maf_alt_allele_cols
+    :return: pd.Series of identifiers with the same index as get_maf(fn); should not be modified
+    """
+    maf_df = _read_maf(fn)
+    if start_pos is None:
+        start_pos = _find_column(maf_df, maf_start_pos_cols, fn)
+    if alt is None:
+        alt = _find_column(maf_df, maf_alt_allele_cols, fn)
+
+    return get_unique_identifiers(maf_df, chrom=chrom, start_pos=start_pos, ref=ref, alt=alt)
+
+
+def _find_column(maf_df, col_options, fn):
+    """First column of maf_df found in col_options"""
+    found_cols = maf_df.columns[maf_df.columns.isin(col_options)]
+    if len(found_cols) == 0:
+        raise ValueError(f'Maf {fn} has none of the columns {col_options}')
+    return found_cols[0]
+
+
 def freezeargs(func):
     """Transform mutable dictionary into immutable and lists into tuples
 
@@ -115,4 +212,85 @@ def freezeargs(func):
         args = tuple([fdict(arg) if isinstance(arg, dict) else (tuple(arg) if isinstance(arg, list) else arg) for arg in args])
         kwargs = {k: fdict(v) if isinstance(v, dict) else (tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items()}
         return func(*args, **kwargs)
-    return wrapped
\ No newline at end of file
+    return wrapped
+
+
+operators = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+
+def split_filter_part(filter_part):
+    """Split filter query into operator and value
+
+    Taken from dash documentation at https://dash.plotly.com/datatable/callbacks on the Python-Driven Filtering, Paging, Sorting Page.
+    """
+    return _split_filter_part(filter_part)[:3]
+
+
+def _split_filter_part(filter_part):
+    """split_filter_part, also returning the value as typed (without quotes), to compare with text columns"""
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0]
+                if v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                    value_str = value
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                    value_str = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value, value_str
+
+    return [None] * 4
+
+
+def filter_df_by_query(df, filter_query):
+    """Filter a dataframe with a dash DataTable filter_query string
+
+    Used for tables with filter_action='custom'. Taken from dash documentation at https://dash.plotly.com/datatable/callbacks.
+    Like the native DataTable filtering, numbers typed in the filter are compared as text with non-numeric columns,
+    and 'contains' and 'datestartswith' match the text of the values in any column.
+
+    :param df: pandas.DataFrame to filter
+    :param filter_query: DataTable filter_query, with expressions separated by ' && '
+    :return: filtered pandas.DataFrame
+    """
+    if not filter_query:
+        return df
+
+    filtering_expressions = filter_query.split(' && ')
+    for filter_part in filtering_expressions:
+        col_name, operator, filter_value, filter_value_str = _split_filter_part(filter_part)
+
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            # these operators match pandas series operator method names
+            if pd.api.types.is_numeric_dtype(df[col_name]) and not isinstance(filter_value, str):
+                df = df.loc[getattr(df[col_name], operator)(filter_value)]
+            else:
+                df = df.loc[getattr(df[col_name].astype(str), operator)(filter_value_str)]
+        elif operator == 'contains':
+            df = df.dropna(axis=0, subset=[col_name])
+            df = df.loc[df[col_name].astype(str).str.contains(filter_value_str, regex=False)]
+        elif operator == 'datestartswith':
+            # this is a simplification of the front-end filtering logic,
+            # only works with complete fields in standard format
+            df = df.dropna(axis=0, subset=[col_name])
+            df = df.loc[df[col_name].astype(str).str.startswith(filter_value_str)]
+
+    return df
@@ -2,10 +2,15 @@ from typing import List, Dict
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
+from AnnoMate.HistoryTable import HistoryTable
 
 
 class Data(ABC):
 
+    # attributes persisted on every save when input attributes are stored separately
+    # (see ReviewDataInterface storage_layout='split')
+    state_attributes = ['index', 'description', 'annot_col_config_dict', 'annot_df', 'history_df']
+
     @abstractmethod
     def __init__(self,
                  index: List,
@@ -55,6 +60,63 @@ class Data(ABC):
         self.history_df = history_df.loc[history_df['index'].isin(index)] if history_df is not None else pd.DataFrame(
             columns=['index', 'timestamp', 'source_data_fn'])
 
+    @property
+    def history(self) -> HistoryTable:
+        """
+        Append-only store backing history_df
+        """
+        history = self.__dict__.get('history_df')
+        if history is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute 'history_df'")
+        if isinstance(history, pd.DataFrame):
+            # history_df pickled as a dataframe (older data objects, or the annotation state pickle)
+            history = HistoryTable(history)
+            self.__dict__['history_df'] = history
+        return history
+
+    @property
+    def history_df(self) -> pd.DataFrame:
+        """
+        Dataframe view of the annotation history. Do not modify it in place; use self.history instead.
+        """
+        return self.history.to_frame()
+
+    @history_df.setter
+    def history_df(self, history_df: pd.DataFrame):
+        # stored under the same name so history_df keeps its place among the data attributes
+        self.__dict__['history_df'] = HistoryTable(history_df)
+
+    def __getattr__(self, name):
+        # Only called if the attribute is not found. Input attributes stored separately from
+        # the annotation state are read from their pickle file on first access.
+        lazy_attribute_fns = self.__dict__.get('_lazy_attribute_fns', {})
+        if name in lazy_attribute_fns:
+            value = pd.read_pickle(lazy_attribute_fns[name])
+            setattr(self, name, value)
+            del lazy_attribute_fns[name]
+            return value
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def list_attributes(self) -> List:
+        """
+        Names of the data attributes, including input attributes that have not been loaded yet
+        """
+        names = list(vars(self).keys()) + list(self.__dict__.get('_lazy_attribute_fns', {}).keys())
+        return [name for name in names if not name.startswith('_')]
+
+    def list_input_attributes(self) -> List:
+        """
+        Names of the data attributes that are not part of the annotation state
+        """
+        return [name for name in self.list_attributes() if name not in self.state_attributes]
+
+    def load_lazy_attributes(self):
+        """
+        Reads all input attributes that have not been accessed yet
+        """
+        for name in list(self.__dict__.get('_lazy_attribute_fns', {}).keys()):
+            getattr(self, name)
+
 
 valid_annotation_types = ["multi", "float", "int", "string"]
 
@@ -0,0 +1,153 @@
+import pandas as pd
+import numpy as np
+from typing import List, Dict
+
+
+class HistoryTable:
+
+    def __init__(self, history_df: pd.DataFrame = None, timestamp_col: str = 'timestamp'):
+        """
+        Append-only history of annotation updates stored in growable column buffers.
+
+        Appending a record is amortized O(1). A DataFrame view is only built when requested
+        (see to_frame) and is cached until the next append.
+
+        Parameters
+        ----------
+        history_df: pd.DataFrame
+            Existing history to start from
+        timestamp_col: str
+            Name of the column stored with a datetime64 dtype
+        """
+        self.timestamp_col = timestamp_col
+        self.columns = []
+        self._buffers = {}
+        self._size = 0
+        self._capacity = 0
+        self._frame = None
+
+        if history_df is not None:
+            self.extend(history_df)
+
+    def __len__(self):
+        return self._size
+
+    def _new_buffer(self, column, capacity):
+        if column == self.timestamp_col:
+            return np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        return np.full(capacity, np.nan, dtype=object)
+
+    def _reserve(self, n_rows):
+        if self._size + n_rows <= self._capacity:
+            return
+
+        new_capacity = max(2 * self._capacity, self._size + n_rows, 16)
+        for column, buffer in self._buffers.items():
+            new_buffer = self._new_buffer(column, new_capacity)
+            new_buffer[:self._size] = buffer[:self._size]
+            self._buffers[column] = new_buffer
+        self._capacity = new_capacity
+
+    def add_columns(self, columns: List):
+        """
+        Adds empty columns to the history
+
+        Parameters
+        ----------
+        columns: List
+            column names. Columns that already exist are ignored.
+        """
+        for column in columns:
+            if column not in self._buffers:
+                self.columns.append(column)
+                self._buffers[column] = self._new_buffer(column, self._capacity)
+        self._frame = None
+
+    def append(self, record: Dict):
+        """
+        Appends one row to the history
+
+        Parameters
+        ----------
+        record: Dict
+            Dictionary of column names and values. New columns are added, missing columns are left empty.
+        """
+        self.add_columns([column for column in record.keys() if column not in self._buffers])
+        self._reserve(1)
+        for column, value in record.items():
+            if column == self.timestamp_col:
+                value = pd.Timestamp(value).to_datetime64() if not _is_missing(value) else np.datetime64('NaT')
+            self._buffers[column][self._size] = value
+        self._size += 1
+        self._frame = None
+
+    def extend(self, history_df: pd.DataFrame):
+        """
+        Appends all rows of a history dataframe
+
+        Parameters
+        ----------
+        history_df: pd.DataFrame
+            history table with the same format as the output of to_frame
+        """
+        self.add_columns([column for column in history_df.columns if column not in self._buffers])
+        n_rows = history_df.shape[0]
+        self._reserve(n_rows)
+        for column in history_df.columns:
+            if column == self.timestamp_col:
+                values = pd.to_datetime(history_df[column], errors='coerce').to_numpy(dtype='datetime64[ns]')
+            else:
+                values = history_df[column].to_numpy(dtype=object)
+            self._buffers[column][self._size:self._size + n_rows] = values
+        self._size += n_rows
+        self._frame = None
+
+    def get_column(self, column) -> np.ndarray:
+        """
+        Read-only array with the values of a column
+
+        Parameters
+        ----------
+        column: str
+            column name
+        """
+        values = self._buffers[column][:self._size]
+        values.flags.writeable = False
+        return values
+
+    def take(self, positions) -> pd.DataFrame:
+        """
+        Dataframe with the rows at the given positions, in the given order
+
+        Parameters
+        ----------
+        positions: array-like of int
+            row positions in the history
+        """
+        positions = np.asarray(positions, dtype=int)
+        return self._gen_frame(lambda buffer: buffer[positions], pd.RangeIndex(len(positions)))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Dataframe view of the full history. The returned dataframe is cached and should not be modified.
+        """
+        if self._frame is None:
+            self._frame = self._gen_frame(lambda buffer: buffer[:self._size], pd.RangeIndex(self._size))
+        return self._frame
+
+    def _gen_frame(self, select, index):
+        return pd.DataFrame(
+            {column: select(self._buffers[column]).copy() for column in self.columns},
+            index=index,
+            columns=self.columns
+        ).infer_objects()
+
+    def __getstate__(self):
+        return {'timestamp_col': self.timestamp_col, 'history_df': self.to_frame()}
+
+    def __setstate__(self, state):
+        self.__init__(state['history_df'], timestamp_col=state['timestamp_col'])
+
+
+def _is_missing(value):
+    return value is None or (np.ndim(value) == 0 and pd.isna(value))
@@ -3,7 +3,7 @@ import pandas as pd
 import numpy as np
 # from jupyter_dash import JupyterDash
 from dash import jupyter_dash
-from dash import dcc, ctx
+from dash import dcc, ctx, Patch
 from dash import html, Dash
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
@@ -15,13 +15,17 @@ from typing import Dict
 import copy
 import warnings
 from typing import Union, List, Tuple
-from math import floor
+from math import floor, ceil
 from pathlib import Path
 import os
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from .ReviewDataInterface import ReviewDataInterface
 from .Data import DataAnnotation, validate_annot_data
 from .AnnotationDisplayComponent import AnnotationDisplayComponent
+from .AppComponents.utils import filter_df_by_query
 
 valid_annotation_app_display_types = ['text',
                                       'textarea',
@@ -30,6 +34,12 @@ valid_annotation_app_display_types = ['text',
                                       'radioitem',
                                       'select']
 
+valid_review_data_table_modes = ['native', 'server']
+
+valid_dropdown_modes = ['full', 'search']
+
+valid_component_callback_modes = ['single', 'per_component']
+
 class AppComponent:
     
     def __init__(self, 
@@ -41,7 +51,8 @@ class AppComponent:
                  callback_state_external: [State] = [],
                  new_data_callback=None,
                  internal_callback=None,
-                 use_name_as_title=True):
+                 use_name_as_title=True,
+                 prefetch_callback=None):
         
         """
         Component in the plotly dashboard app. Each component is made up of a layout and callback functions
@@ -106,6 +117,16 @@ class AppComponent:
 
         use_name_as_title: bool
             use the `name` parameter as a title for the component.
+
+        prefetch_callback: func
+            a function (defined separately or a lambda) that loads and caches the data new_data_callback needs
+            for a row, so it is fast when that row is selected. Used by ReviewDataApp.run(prefetch_next=...)
+            to warm caches for the next rows in the background. Requirements are:
+            - The first two parameters will be the ReviewData.data object and the index of the row to prefetch
+            - Any remaining parameters have keywords and are at the end (same keywords as new_data_callback)
+            - The return value is ignored
+                Example:
+                    def myprefetch(data: Data, idx, **kwargs):...
         """
         
         all_ids = np.array(get_component_ids(layout))
@@ -163,6 +184,7 @@ class AppComponent:
         
         self.new_data_callback = new_data_callback
         self.internal_callback = internal_callback
+        self.prefetch_callback = prefetch_callback
 
     
 class ReviewDataApp:
@@ -173,6 +195,9 @@ class ReviewDataApp:
 
         """
         self.more_components = OrderedDict()
+        self.component_executor = None
+        self.prefetch_executor = None
+        self.prefetch_futures = {}
         
     def columns_to_string(self, df, columns):
         new_df = df.copy()
@@ -180,6 +205,139 @@ class ReviewDataApp:
             new_df[c] = new_df[c].astype(str)
 
         return new_df
+
+    def gen_review_data_table_view(self, filter_query: str = '', sort_by: List = []):
+        """
+        Filter and sort the review data table server side (review_data_table_mode='server')
+
+        Parameters
+        ----------
+        filter_query: str
+            DataTable filter_query
+        sort_by: List
+            DataTable sort_by, list of {'column_id': ..., 'direction': ...}
+        """
+        view_df = filter_df_by_query(self.review_data_table_data_df.reset_index(), filter_query)
+        if sort_by:
+            view_df = view_df.sort_values(
+                [col['column_id'] for col in sort_by],
+                ascending=[col['direction'] == 'asc' for col in sort_by],
+            )
+        return view_df.set_index('index')
+
+    def gen_review_data_table_page(
+        self,
+        page_current: int,
+        page_size: int,
+        filter_query: str = '',
+        sort_by: List = [],
+    ):
+        """
+        Records and page count of the current page of the review data table (review_data_table_mode='server')
+        """
+        view_df = self.gen_review_data_table_view(filter_query, sort_by)
+        page_df = view_df.iloc[page_current * page_size: (page_current + 1) * page_size]
+        page_count = max(ceil(view_df.shape[0] / page_size), 1)
+        return page_df.reset_index().to_dict('records'), page_count
+
+    def set_dropdown_search_index(self, index: pd.Index):
+        """
+        Precompute the lowercased subject names used by gen_dropdown_search_options
+
+        Parameters
+        ----------
+        index: pd.Index
+            subjects in dropdown order
+        """
+        self.dropdown_search_index = index.astype(str).str.lower()
+        # sorted copy to find prefix matches with a binary search
+        self.dropdown_search_order = np.argsort(self.dropdown_search_index.to_numpy(dtype=str), kind='stable')
+        self.dropdown_search_sorted_index = self.dropdown_search_index.to_numpy(dtype=str)[self.dropdown_search_order]
+
+    def gen_dropdown_search_options(
+        self,
+        reviewed_data_df: pd.DataFrame,
+        search_value: str = None,
+        value=None,
+        max_options: int = 100,
+    ):
+        """
+        Dropdown options matching the search value (dropdown_mode='search')
+
+        Subjects whose index starts with the search value are listed first, followed by subjects containing it,
+        each in dropdown order. Matching is case insensitive against the index set with set_dropdown_search_index.
+        Prefix matches are found by binary search; subjects are only scanned for substring matches if there are
+        fewer than max_options prefix matches.
+
+        Parameters
+        ----------
+        reviewed_data_df: pd.DataFrame
+            dropdown options dataframe, indexed by subject with a 'label' column
+        search_value: str
+            text typed in the dropdown
+        value:
+            currently selected subject. Always included in the options so its label is displayed.
+        max_options: int
+            maximum number of matching options to return
+        """
+        if search_value:
+            search_value = str(search_value).lower()
+            start = np.searchsorted(self.dropdown_search_sorted_index, search_value, side='left')
+            end = np.searchsorted(self.dropdown_search_sorted_index, search_value + chr(0x10FFFF), side='right')
+            positions = self.dropdown_search_order[start:end]
+            if len(positions) > max_options:
+                positions = np.partition(positions, max_options - 1)[:max_options]
+            positions = np.sort(positions)
+
+            if len(positions) < max_options:
+                is_substring = np.array(self.dropdown_search_index.str.contains(search_value, regex=False), dtype=bool)
+                is_substring[positions] = False
+                positions = np.concatenate(
+                    [positions, np.flatnonzero(is_substring)[:max_options - len(positions)]]
+                )
+        else:
+            positions = np.arange(min(max_options, reviewed_data_df.shape[0]))
+
+        options_df = reviewed_data_df.iloc[positions]
+        if (value is not None) and (value in reviewed_data_df.index) and (value not in options_df.index):
+            options_df = pd.concat([reviewed_data_df.loc[[value]], options_df])
+        return options_df.reset_index().to_dict('records')
+
+    def prefetch_subjects(self, data, subjects: List):
+        """
+        Run the components' prefetch_callback for the given subjects on the prefetch thread pool
+
+        Subjects already queued are skipped. Queued subjects that are not in `subjects` anymore are dropped,
+        so jumping around the data does not build up a backlog. Finished prefetches are forgotten (failures
+        are reported as warnings), so a subject is prefetched again the next time it comes up, in case its
+        cache entries were evicted in the meantime.
+
+        Parameters
+        ----------
+        data: Data
+            ReviewDataInterface.data object
+        subjects: List
+            index values of the subjects to prefetch, in order of priority
+        """
+        prefetch_components = [
+            c for c_name, c in self.ordered_more_components.items() if c.prefetch_callback is not None
+        ]
+        if self.prefetch_executor is None or len(prefetch_components) == 0:
+            return
+
+        for subject, future in list(self.prefetch_futures.items()):
+            if future.done():
+                del self.prefetch_futures[subject]
+                if not future.cancelled() and future.exception() is not None:
+                    warnings.warn(f'Prefetching subject {subject} failed: {future.exception()}')
+            elif subject not in subjects and future.cancel():
+                del self.prefetch_futures[subject]
+
+        for subject in subjects:
+            if subject not in self.prefetch_futures:
+                self.prefetch_futures[subject] = self.prefetch_executor.submit(
+                    run_prefetch_callbacks, prefetch_components, data, subject
+                )
         
     def run(
         self,
@@ -188,6 +346,13 @@ class ReviewDataApp:
         autofill_dict: Dict = None,
         review_data_table_df: pd.DataFrame = None,
         review_data_table_page_size: int = 10,
+        review_data_table_mode: str = 'native',
+        dropdown_mode: str = 'full',
+        dropdown_max_options: int = 100,
+        component_executor_workers: int = None,
+        component_callback_mode: str = 'single',
+        prefetch_next: int = 0,
+        prefetch_workers: int = 1,
         collapsable=True,
         auto_export: bool = True,
         auto_export_path: Union[Path, str] = None, 
@@ -238,6 +403,46 @@ class ReviewDataApp:
                                    annot_col_config_dict
                 - autofill values: State()'s referring to objects in the component named component name, or a 
                                    valid literal value according to the DataAnnotation object's validation method.
+
+        review_data_table_df: pd.DataFrame
+            Table of subject level data to display and select subjects from. Index must match review_data.data.index
+
+        review_data_table_page_size: int
+            Number of rows per page in the review data table
+
+        review_data_table_mode: {'native', 'server'}
+            'native': the whole review data table is sent to the browser, which pages, sorts and filters it.
+            'server': only the current page is sent to the browser. Paging, sorting and filtering run on the
+                      server. Use for large numbers of subjects.
+
+        dropdown_mode: {'full', 'search'}
+            'full': the subject dropdown lists every subject.
+            'search': the subject dropdown only lists subjects matching the typed text (prefix matches first,
+                      then substring matches), up to dropdown_max_options. Use for large numbers of subjects.
+
+        dropdown_max_options: int
+            Maximum number of subjects listed in the dropdown when dropdown_mode='search'
+
+        component_executor_workers: int
+            Number of threads used to run the components' new_data_callback concurrently when switching subjects.
+            If None, the callbacks run one after the other. When running concurrently, a component whose
+            callback raises an error is not updated and the error is reported as a warning, so the other
+            components still render.
+
+        component_callback_mode: {'single', 'per_component'}
+            'single': all components are updated by the same callback when switching subjects, so the page
+                      updates once every component is done.
+            'per_component': each component's new_data_callback is registered as its own callback on the selected
+                             subject, so the annotation panel, history table and fast components render without
+                             waiting for slower components. component_executor_workers is not used in this mode.
+
+        prefetch_next: int
+            After a subject is selected, run the components' prefetch_callback for the next `prefetch_next`
+            subjects in the background. Subjects are ordered as in the review data table (after sorting and
+            filtering) if it is used, otherwise as in the dropdown. 0 disables prefetching.
+
+        prefetch_workers: int
+            Number of threads used for prefetching
                                    
         auto_export: bool, default=False
             Whether to auto export on save to path set by argument auto_export_path
@@ -257,9 +462,27 @@ class ReviewDataApp:
 
             > reviewer.app.more_components
         """
+        if review_data_table_mode not in valid_review_data_table_modes:
+            raise ValueError(
+                f'review_data_table_mode "{review_data_table_mode}" is not valid. '
+                f'Options are {valid_review_data_table_modes}'
+            )
+        server_review_data_table = (review_data_table_df is not None) and (review_data_table_mode == 'server')
+
+        if dropdown_mode not in valid_dropdown_modes:
+            raise ValueError(f'dropdown_mode "{dropdown_mode}" is not valid. Options are {valid_dropdown_modes}')
+        search_dropdown = dropdown_mode == 'search'
+
+        if component_callback_mode not in valid_component_callback_modes:
+            raise ValueError(
+                f'component_callback_mode "{component_callback_mode}" is not valid. '
+                f'Options are {valid_component_callback_modes}'
+            )
+        per_component_callbacks = component_callback_mode == 'per_component'
+
         multi_type_columns = [c for c in annot_app_display_types_dict.keys() if review_data.data.annot_col_config_dict[c].annot_value_type == 'multi']
 
-        self.history_display_cols = review_data.data.history_df.columns
+        self.history_display_cols = review_data.data.history.columns
         self.history_display_cols = [c for c in self.history_display_cols if c not in hide_history_df_cols]
 
         if len(components_name_order) > 0:
@@ -268,8 +491,7 @@ class ReviewDataApp:
             self.ordered_more_components = self.more_components
 
         def get_history_display_table(subject_index_value):
-            filtered_history_df = review_data.data.history_df.loc[
-                review_data.data.history_df['index'] == subject_index_value,
+            filtered_history_df = review_data.get_subject_history(subject_index_value)[
                 self.history_display_cols
             ].loc[::-1]
             
@@ -283,6 +505,7 @@ class ReviewDataApp:
         reviewed_data_df['label'] = reviewed_data_df.apply(lambda r: self.gen_dropdown_labels(review_data, r), 
                                                            axis=1)
         reviewed_data_df.index.name = 'value'
+        self.set_dropdown_search_index(reviewed_data_df.index)
         
         app.layout, annotation_panel_component, autofill_buttons, gen_autofill_states, autofill_literals = \
             self.gen_layout(
@@ -292,6 +515,9 @@ class ReviewDataApp:
                 autofill_dict,
                 review_data_table_df=review_data_table_df,
                 review_data_table_page_size=review_data_table_page_size,
+                review_data_table_mode=review_data_table_mode,
+                dropdown_mode=dropdown_mode,
+                dropdown_max_options=dropdown_max_options,
                 collapsable=collapsable,
                 multi_type_columns=multi_type_columns
             )
@@ -337,21 +563,78 @@ class ReviewDataApp:
         }
 
         more_component_outputs = {c.name: c.callback_output for c_name, c in self.ordered_more_components.items()}
+        # outputs of the components updated by the subject switching callbacks
+        subject_switch_outputs = dict(more_component_outputs=more_component_outputs) if not per_component_callbacks else {}
+
+        if self.component_executor is not None:
+            self.component_executor.shutdown(wait=False)
+            self.component_executor = None
+        if component_executor_workers is not None and component_executor_workers > 1:
+            self.component_executor = ThreadPoolExecutor(
+                max_workers=component_executor_workers, 
+                thread_name_prefix='AnnoMate-component'
+            )
+
+        if self.prefetch_executor is not None:
+            for future in self.prefetch_futures.values():
+                future.cancel()
+            self.prefetch_executor.shutdown(wait=False)
+            self.prefetch_executor = None
+        self.prefetch_futures = {}
+        if prefetch_next > 0:
+            self.prefetch_executor = ThreadPoolExecutor(
+                max_workers=prefetch_workers,
+                thread_name_prefix='AnnoMate-prefetch'
+            )
+
+        def prefetch_next_subjects(subject_index_value, subject_order):
+            if prefetch_next <= 0:
+                return
+            if subject_index_value not in subject_order:
+                subject_order = reviewed_data_df.index
+            position = subject_order.get_loc(subject_index_value)
+            self.prefetch_subjects(
+                review_data.data,
+                subject_order[position + 1: position + 1 + prefetch_next].tolist()
+            )
+
+        def run_new_data_callback(component, subject_index_value, component_states):
+            component_output = component.new_data_callback(
+                review_data.data,
+                subject_index_value,
+                *component_states
+            )
+            validate_callback_outputs(component_output, component, which_callback='new_data_callback')
+            return component_output
                
         def update_components(output_dict, subject_index_value, more_component_inputs_as_states):
-            output_dict['more_component_outputs'] = {
-                c.name: list(np.full(len(c.callback_output), dash.no_update)) for c_name, c in self.ordered_more_components.items()
-            }
-            
-            for c_name, component in self.ordered_more_components.items():
-                if component.new_data_callback is not None:
-                    component_output = component.new_data_callback(
-                        review_data.data,
-                        subject_index_value,
-                        *more_component_inputs_as_states[component.name]
+            components_to_update = []
+            if not per_component_callbacks:
+                output_dict['more_component_outputs'] = {
+                    c.name: list(np.full(len(c.callback_output), dash.no_update)) for c_name, c in self.ordered_more_components.items()
+                }
+                components_to_update = [
+                    component for c_name, component in self.ordered_more_components.items()
+                    if component.new_data_callback is not None
+                ]
+            if self.component_executor is None:
+                for component in components_to_update:
+                    output_dict['more_component_outputs'][component.name] = run_new_data_callback(
+                        component, 
+                        subject_index_value, 
+                        more_component_inputs_as_states[component.name]
                     )
-                    validate_callback_outputs(component_output, component, which_callback='new_data_callback')
-                    output_dict['more_component_outputs'][component.name] = component_output
+            else:
+                # copy the context so the dash callback context is available in the worker threads
+                component_futures = {
+                    component.name: self.component_executor.submit(
+                        contextvars.copy_context().run,
+                        run_new_data_callback,
+                        component,
+                        subject_index_value,
+                        more_component_inputs_as_states[component.name]
+                    ) for component in components_to_update
+                }
             
             history_df = get_history_display_table(subject_index_value)
             output_dict['history_table'] = history_df.to_dict('records')
@@ -376,6 +659,16 @@ class ReviewDataApp:
                         current_annotations[annot_name] = annot_app_display_types_dict[annot_name].default_display_value
                     
                 output_dict['annot_panel'] = current_annotations
+
+            if self.component_executor is not None:
+                for component_name, future in component_futures.items():
+                    try:
+                        output_dict['more_component_outputs'][component_name] = future.result()
+                    except Exception:
+                        warnings.warn(
+                            f'Component ({component_name}) new_data_callback failed for {subject_index_value}. '
+                            f'The component will not be updated.\n{traceback.format_exc()}'
+                        )
             return output_dict
 
         ###### Callbacks
@@ -429,7 +722,13 @@ class ReviewDataApp:
                     # removed displayed data
                     history_display_table = pd.DataFrame().to_dict('records')
                     reviewed_data_df['label'] = reviewed_data_df.index
-                    dropdown_options = reviewed_data_df.reset_index().to_dict('records')
+                    if search_dropdown:
+                        dropdown_options = self.gen_dropdown_search_options(
+                            reviewed_data_df, 
+                            max_options=dropdown_max_options
+                        )
+                    else:
+                        dropdown_options = reviewed_data_df.reset_index().to_dict('records')
                     annot_panel = {annot_name: '' for annot_name in annot_app_display_types_dict.keys()}
                     
                 review_data.mh.set_attribute('freeze_data', True)
@@ -451,7 +750,7 @@ class ReviewDataApp:
 
         @app.callback(
             output=dict(
-                more_component_outputs=more_component_outputs,
+                **subject_switch_outputs,
                 history_table=Output('APP-history-table', 'data', allow_duplicate=True),
                 history_table_selected_row_state=Output('APP-history-table', 'selected_rows', allow_duplicate=True),
                 annot_panel=annotation_panel_component.callback_output,
@@ -462,7 +761,9 @@ class ReviewDataApp:
                 dropdown_value=Input('APP-dropdown-data-state', 'value'),
                 review_data_table_state=State('APP-review-data-table', 'data'),
                 more_component_inputs_as_states=more_component_inputs_as_states,
-                review_data_table_derived_virtual_data_state=State('APP-review-data-table', 'derived_virtual_data')
+                review_data_table_derived_virtual_data_state=State('APP-review-data-table', 'derived_virtual_data'),
+                review_data_table_filter_query=State('APP-review-data-table', 'filter_query'),
+                review_data_table_sort_by=State('APP-review-data-table', 'sort_by'),
             ),
             prevent_initial_call=True,
         )
@@ -470,7 +771,9 @@ class ReviewDataApp:
             dropdown_value,
             review_data_table_state,
             more_component_inputs_as_states,
-            review_data_table_derived_virtual_data_state
+            review_data_table_derived_virtual_data_state,
+            review_data_table_filter_query,
+            review_data_table_sort_by,
         ):
             """
             Update the whole dashboard with the corresponding data of 
@@ -481,10 +784,23 @@ class ReviewDataApp:
                 'review_data_selected_value': dash.no_update,
             }
             
-            tmp_review_data_table_df = pd.DataFrame.from_records(review_data_table_state)
             subject_index_value = dropdown_value
+            subject_order = reviewed_data_df.index
 
-            if review_data_table_df is not None: # if the table is being used
+            if server_review_data_table:
+                # find the subject's page in the filtered and sorted table
+                review_data_table_view_df = self.gen_review_data_table_view(
+                    review_data_table_filter_query, 
+                    review_data_table_sort_by
+                )
+                output_dict['review_data_selected_value'] = []
+                subject_order = review_data_table_view_df.index
+                if subject_index_value in review_data_table_view_df.index:
+                    position = review_data_table_view_df.index.get_loc(subject_index_value)
+                    output_dict['review_data_page_current'] = floor(position / review_data_table_page_size)
+                    output_dict['review_data_selected_value'] = [position % review_data_table_page_size]
+            elif review_data_table_df is not None: # if the table is being used
+                tmp_review_data_table_df = pd.DataFrame.from_records(review_data_table_state)
                 index_tmp_review_data_table_df = tmp_review_data_table_df.loc[
                     tmp_review_data_table_df['index'] == subject_index_value
                 ]
@@ -492,6 +808,8 @@ class ReviewDataApp:
 
                 review_data_table_derived_virtual_df = pd.DataFrame.from_records(
                     review_data_table_derived_virtual_data_state)
+                if not review_data_table_derived_virtual_df.empty:
+                    subject_order = pd.Index(review_data_table_derived_virtual_df['index'])
                 index_relative_review_data_table_df = review_data_table_derived_virtual_df.loc[
                     review_data_table_derived_virtual_df['index'] == subject_index_value,
                 ]
@@ -500,13 +818,14 @@ class ReviewDataApp:
 
 
             output_dict = update_components(output_dict, subject_index_value, more_component_inputs_as_states)
+            prefetch_next_subjects(subject_index_value, subject_order)
             return output_dict
             
 
         @app.callback(
             output=dict(
                 dropdown_value=Output('APP-dropdown-data-state', 'value', allow_duplicate=True),
-                more_component_outputs=more_component_outputs,
+                **subject_switch_outputs,
                 history_table=Output('APP-history-table', 'data', allow_duplicate=True),
                 history_table_selected_row_state=Output('APP-history-table', 'selected_rows', allow_duplicate=True),
                 annot_panel=annotation_panel_component.callback_output,
@@ -515,21 +834,49 @@ class ReviewDataApp:
                 review_data_selected_value=Input('APP-review-data-table', 'selected_rows'),
                 review_data_table_state=State('APP-review-data-table', 'data'),
                 more_component_inputs_as_states=more_component_inputs_as_states,
+                dropdown_value=State('APP-dropdown-data-state', 'value'),
+                review_data_table_page_current=State('APP-review-data-table', 'page_current'),
+                review_data_table_filter_query=State('APP-review-data-table', 'filter_query'),
+                review_data_table_sort_by=State('APP-review-data-table', 'sort_by'),
             ),
             prevent_initial_call=True,
         )
         def update_sample_via_review_table(
             review_data_selected_value,
             review_data_table_state,
-            more_component_inputs_as_states
+            more_component_inputs_as_states,
+            dropdown_value,
+            review_data_table_page_current,
+            review_data_table_filter_query,
+            review_data_table_sort_by,
         ):
             """
             Update the whole dashboard with the corresponding data of the selected subject in the dash table
             """
+            if not review_data_selected_value:
+                raise PreventUpdate
+
             output_dict = {}
-            
-            tmp_review_data_table_df = pd.DataFrame.from_records(review_data_table_state)
-            subject_index_value = tmp_review_data_table_df.loc[review_data_selected_value[0], 'index'] 
+
+            if server_review_data_table:
+                # the data state may still hold the previous page when the dropdown moved the table to another
+                # page, so the row is resolved from the server side view
+                review_data_table_view_df = self.gen_review_data_table_view(
+                    review_data_table_filter_query,
+                    review_data_table_sort_by
+                )
+                position = (review_data_table_page_current or 0) * review_data_table_page_size + \
+                    review_data_selected_value[0]
+                if position >= review_data_table_view_df.shape[0]:
+                    raise PreventUpdate
+                subject_index_value = review_data_table_view_df.index[position]
+            else:
+                tmp_review_data_table_df = pd.DataFrame.from_records(review_data_table_state)
+                subject_index_value = tmp_review_data_table_df.loc[review_data_selected_value[0], 'index']
+
+            if subject_index_value == dropdown_value:
+                # row selected by update_sample_via_dropdown, the subject is already loaded
+                raise PreventUpdate
             output_dict['dropdown_value'] = subject_index_value
 
             output_dict = update_components(output_dict, subject_index_value, more_component_inputs_as_states)
@@ -547,7 +894,10 @@ class ReviewDataApp:
                 submit_annot_button=Input('APP-submit-button-state', 'n_clicks'),
                 annot_input_state=annotation_panel_component.callback_state,
                 dropdown_value=State('APP-dropdown-data-state', 'value'),
-                review_data_table_state=State('APP-review-data-table', 'data'),
+                dropdown_search_value=State('APP-dropdown-data-state', 'search_value'),
+                review_data_table_page_current=State('APP-review-data-table', 'page_current'),
+                review_data_table_filter_query=State('APP-review-data-table', 'filter_query'),
+                review_data_table_sort_by=State('APP-review-data-table', 'sort_by'),
             ),
             prevent_initial_call=True,
         )
@@ -555,10 +905,15 @@ class ReviewDataApp:
             submit_annot_button,
             annot_input_state,
             dropdown_value,
-            review_data_table_state
+            dropdown_search_value,
+            review_data_table_page_current,
+            review_data_table_filter_query,
+            review_data_table_sort_by,
         ):
             """
             Save current annotations to the annot_df field, and update the dropdown menu timestamp and history table
+
+            Only the changed dropdown option and review data table row are sent back to the browser (dash.Patch)
             """
             output_dict = {'review_data_table_data': dash.no_update, 'test_mode_alert': False}
             if not review_data.mh.metadata['freeze_data']:
@@ -573,32 +928,56 @@ class ReviewDataApp:
                 
                 validate_annot_data(annot_type, annot_input_state[annot_name])
                     
-                new_annot_input_state = dict(annot_input_state)
-                review_data._update(dropdown_value, new_annot_input_state)
-                
-                if auto_export:
-                    review_data.export_data(auto_export_path, attributes_to_export=attributes_to_export, verbose=False)
+            new_annot_input_state = dict(annot_input_state)
+            review_data._update(dropdown_value, new_annot_input_state)
 
-                output_dict['history_table'] = get_history_display_table(dropdown_value).to_dict('records')
-                
-                reviewed_data_df.loc[dropdown_value, 'label'] = self.gen_dropdown_labels(
-                    review_data,
-                    reviewed_data_df.loc[dropdown_value]
-                )
-                output_dict['dropdown_list_options'] = reviewed_data_df.reset_index().to_dict('records')
+            if auto_export:
+                review_data.export_data(auto_export_path, attributes_to_export=attributes_to_export, verbose=False)
 
-                if review_data_table_df is not None:
-                    tmp_review_data_table_df = pd.DataFrame.from_records(review_data_table_state).set_index('index')
-                    tmp_review_data_table_df.loc[
-                        dropdown_value,
-                        review_data.data.annot_df.columns
-                    ] = review_data.data.annot_df.loc[dropdown_value].values
-                    output_dict['review_data_table_data'] = self.columns_to_string(
-                        tmp_review_data_table_df, 
-                        multi_type_columns
-                    ).reset_index().to_dict('records')
+            output_dict['history_table'] = get_history_display_table(dropdown_value).to_dict('records')
 
-                return output_dict
+            reviewed_data_df.loc[dropdown_value, 'label'] = self.gen_dropdown_labels(
+                review_data,
+                reviewed_data_df.loc[dropdown_value]
+            )
+            if search_dropdown:
+                output_dict['dropdown_list_options'] = self.gen_dropdown_search_options(
+                    reviewed_data_df,
+                    dropdown_search_value,
+                    dropdown_value,
+                    max_options=dropdown_max_options
+                )
+            else:
+                dropdown_list_options = Patch()
+                dropdown_list_options[reviewed_data_df.index.get_loc(dropdown_value)] = {
+                    'value': dropdown_value, 'label': reviewed_data_df.loc[dropdown_value, 'label']
+                }
+                output_dict['dropdown_list_options'] = dropdown_list_options
+
+            if review_data_table_df is not None:
+                self.review_data_table_data_df.loc[
+                    dropdown_value,
+                    review_data.data.annot_df.columns
+                ] = self.columns_to_string(
+                    review_data.data.annot_df.loc[[dropdown_value]], 
+                    multi_type_columns
+                ).values[0]
+
+            if server_review_data_table:
+                # the annotated row may have moved in or out of the current page
+                output_dict['review_data_table_data'], _ = self.gen_review_data_table_page(
+                    review_data_table_page_current or 0,
+                    review_data_table_page_size,
+                    review_data_table_filter_query,
+                    review_data_table_sort_by,
+                )
+            elif review_data_table_df is not None:
+                review_data_table_data = Patch()
+                review_data_table_data[self.review_data_table_data_df.index.get_loc(dropdown_value)] = \
+                    self.review_data_table_data_df.loc[[dropdown_value]].reset_index().to_dict('records')[0]
+                output_dict['review_data_table_data'] = review_data_table_data
+
+            return output_dict
 
                
         @app.callback(
@@ -663,7 +1042,7 @@ class ReviewDataApp:
                 }
             }
             if len(history_table_selected_row_state) > 0:
-                history_df = review_data.data.history_df.loc[review_data.data.history_df['index'] == dropdown_value].loc[::-1].reset_index()
+                history_df = review_data.get_subject_history(dropdown_value).loc[::-1].reset_index()
                 output_dict['annot_panel'] = history_df.iloc[
                     history_table_selected_row_state[0]
                 ][review_data.data.annot_df.columns].fillna('').to_dict()
@@ -734,6 +1113,80 @@ class ReviewDataApp:
                         output_dict['more_component_outputs'][component.name] = component_output
             return output_dict
         
+        def register_component_new_data_callback(component):
+            @app.callback(
+                output=component.callback_output,
+                inputs=dict(
+                    dropdown_value=Input('APP-dropdown-data-state', 'value'),
+                    component_states=more_component_inputs_as_states[component.name],
+                ),
+                prevent_initial_call=True,
+            )
+            def update_component_via_dropdown(dropdown_value, component_states):
+                """
+                Update one component with the data of the selected subject
+                """
+                if dropdown_value is None:
+                    raise PreventUpdate
+                return run_new_data_callback(component, dropdown_value, component_states)
+
+        if per_component_callbacks:
+            for c_name, component in self.ordered_more_components.items():
+                if component.new_data_callback is not None:
+                    register_component_new_data_callback(component)
+
+        if search_dropdown:
+            @app.callback(
+                output=dict(
+                    dropdown_list_options=Output('APP-dropdown-data-state', 'options', allow_duplicate=True),
+                ),
+                inputs=dict(
+                    dropdown_search_value=Input('APP-dropdown-data-state', 'search_value'),
+                    dropdown_value=Input('APP-dropdown-data-state', 'value'),
+                ),
+                prevent_initial_call=True,
+            )
+            def update_dropdown_search_options(dropdown_search_value, dropdown_value):
+                """
+                Load the dropdown options matching the typed text
+                """
+                return {
+                    'dropdown_list_options': self.gen_dropdown_search_options(
+                        reviewed_data_df,
+                        dropdown_search_value,
+                        dropdown_value,
+                        max_options=dropdown_max_options
+                    )
+                }
+
+        if server_review_data_table:
+            @app.callback(
+                output=dict(
+                    review_data_table_data=Output('APP-review-data-table', 'data', allow_duplicate=True),
+                    review_data_table_page_count=Output('APP-review-data-table', 'page_count'),
+                ),
+                inputs=dict(
+                    page_current=Input('APP-review-data-table', 'page_current'),
+                    filter_query=Input('APP-review-data-table', 'filter_query'),
+                    sort_by=Input('APP-review-data-table', 'sort_by'),
+                ),
+                prevent_initial_call=True,
+            )
+            def update_review_data_table_page(page_current, filter_query, sort_by):
+                """
+                Send the current page of the filtered and sorted review data table
+                """
+                review_data_table_data, review_data_table_page_count = self.gen_review_data_table_page(
+                    page_current or 0,
+                    review_data_table_page_size,
+                    filter_query,
+                    sort_by,
+                )
+                return {
+                    'review_data_table_data': review_data_table_data,
+                    'review_data_table_page_count': review_data_table_page_count,
+                }
+
         if not review_data.mh.metadata['freeze_data']:
             warnings.warn(
                 'You are in test mode. Your data will not be saved.'
@@ -750,6 +1203,9 @@ class ReviewDataApp:
         autofill_dict: Dict,
         review_data_table_df: pd.DataFrame=None,
         review_data_table_page_size: int = 10,
+        review_data_table_mode: str = 'native',
+        dropdown_mode: str = 'full',
+        dropdown_max_options: int = 100,
         collapsable=True,
         multi_type_columns=[]
     ):
@@ -774,7 +1230,11 @@ class ReviewDataApp:
         ])
         review_data_path = html.Div([html.P(f'Path: {review_data.data_pkl_fn}')])
         review_data_description = html.Div([html.P(f'Description: {review_data.data.description}')])
-        dropdown = html.Div(dcc.Dropdown(options=reviewed_data_df.reset_index().to_dict('records'),
+        if dropdown_mode == 'search':
+            dropdown_options = self.gen_dropdown_search_options(reviewed_data_df, max_options=dropdown_max_options)
+        else:
+            dropdown_options = reviewed_data_df.reset_index().to_dict('records')
+        dropdown = html.Div(dcc.Dropdown(options=dropdown_options,
                                          value=None, 
                                          id='APP-dropdown-data-state'))
         
@@ -797,16 +1257,28 @@ class ReviewDataApp:
                 ], 
                 axis=1
             )
-            review_data_table_data = new_review_data_table_df.reset_index().to_dict('records')
+            # kept server side to update single rows after annotating (see submit_button_annotation)
+            self.review_data_table_data_df = new_review_data_table_df
             review_data_table_columns = new_review_data_table_df.reset_index().columns.tolist()
+            if review_data_table_mode == 'server':
+                review_data_table_data, review_data_table_page_count = self.gen_review_data_table_page(
+                    0, review_data_table_page_size
+                )
+            else:
+                review_data_table_data = new_review_data_table_df.reset_index().to_dict('records')
             style = {'display': 'block'}
 
         else:
             review_data_table_layout = html.Div(html.H1('None'), style={'display': 'none'})
             review_data_table_data = []
             review_data_table_columns = []
+            review_data_table_mode = 'native'
             style = {'display': 'none'}
 
+        review_data_table_action = 'custom' if review_data_table_mode == 'server' else 'native'
+        review_data_table_page_kwargs = dict(
+            page_count=review_data_table_page_count, filter_query=''
+        ) if review_data_table_mode == 'server' else {}
         review_data_table_layout = html.Div(
             dash.dash_table.DataTable(
                 id='APP-review-data-table',
@@ -815,16 +1287,18 @@ class ReviewDataApp:
                     {"name": i, "id": i, "deletable": False, "selectable": False} for i in review_data_table_columns
                 ],
                 editable=False,
-                filter_action="native",
-                sort_action="native",
+                filter_action=review_data_table_action,
+                sort_action=review_data_table_action,
                 sort_mode="multi",
                 column_selectable="single",
                 row_selectable="single",
                 selected_columns=[],
                 selected_rows=[],
-                page_action="native",
+                page_action=review_data_table_action,
                 page_current=0,
                 page_size=review_data_table_page_size,
+                sort_by=[],
+                **review_data_table_page_kwargs,
                 style_data={
                         'whiteSpace': 'normal',
                         'height': 'auto',
@@ -923,9 +1397,9 @@ class ReviewDataApp:
         return layout, annotation_panel_component, autofill_buttons, autofill_states, autofill_literals
 
     def gen_dropdown_labels(self, review_data: ReviewDataInterface, r: pd.Series):
-        data_history_df = review_data.data.history_df[review_data.data.history_df["index"] == r.name]
-        if not data_history_df.empty:
-            return str(r.name) + f' (Last update: {data_history_df["timestamp"].tolist()[-1]})'
+        last_update = review_data.get_last_update(r.name)
+        if last_update is not None:
+            return str(r.name) + f' (Last update: {last_update})'
         else:
             return r.name
        
@@ -1084,6 +1558,11 @@ class ReviewDataApp:
                              f'{component.all_component_ids[np.argwhere(ids_with_reserved_prefix_list).flatten()]}')
         
         new_component = copy.deepcopy(component)
+        if component.prefetch_callback is not None:
+            new_component.prefetch_callback = lambda *args: component.prefetch_callback(*args, **kwargs)
+        else:
+            new_component.prefetch_callback = None
+
         if component.new_data_callback is not None:
             new_component.new_data_callback = lambda *args: component.new_data_callback(*args, **kwargs)
         else:
@@ -1172,3 +1651,18 @@ def check_duplicates(a_list, list_type: str):
 
 def check_duplicate_objects(a_list, list_type: str):
     check_duplicates([c.__str__() for c in a_list], list_type=list_type)
+
+
+def run_prefetch_callbacks(components: List[AppComponent], data, subject):
+    """
+    Run the prefetch_callback of each component for one subject. A failing component does not stop the
+    others; the errors are raised together once all components ran.
+    """
+    errors = []
+    for component in components:
+        try:
+            component.prefetch_callback(data, subject)
+        except Exception as e:
+            errors.append(f'{component.name}: {e!r}')
+    if errors:
+        raise RuntimeError('; '.join(errors))
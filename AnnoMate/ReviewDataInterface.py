@@ -9,13 +9,125 @@ from typing import List, Dict, Union
 from AnnoMate.Data import Data, DataAnnotation, validate_annot_data
 from AnnoMate.MetadataHandler import MetadataHandler
 
+# moved to np.exceptions in numpy 2.0
+VisibleDeprecationWarning = getattr(np, 'VisibleDeprecationWarning', None) or np.exceptions.VisibleDeprecationWarning
+
+def get_journal_fn(data_pkl_fn: Union[str, Path]):
+    """
+    Path to the annotation journal that accompanies a data pickle file
+    """
+    return f"{str(data_pkl_fn).rsplit('.', 1)[0]}.journal"
+
+
+def get_data_inputs_dir(data_pkl_fn: Union[str, Path]):
+    """
+    Path to the directory with the input attributes of a data object saved with storage_layout='split'
+    """
+    return f"{str(data_pkl_fn).rsplit('.', 1)[0]}.inputs"
+
+
+valid_storage_layouts = ['pickle', 'split']
+
+
+def load_data_pkl(data_pkl_fn: Union[str, Path]) -> Data:
+    """
+    Loads a Data object from a pickle file and replays any annotation updates
+    recorded in its journal (see ReviewDataInterface journal mode)
+
+    If the pickle file only contains the annotation state (see ReviewDataInterface storage_layout='split'),
+    the input attributes are read from the data inputs directory the first time they are accessed.
+
+    Parameters
+    ----------
+    data_pkl_fn: Union[str, Path]
+        pickle file to load the data object from
+
+    Returns
+    -------
+    Data
+        Data object including all journaled annotation updates
+    """
+    f = open(data_pkl_fn, 'rb')
+    data = pickle.load(f)
+    f.close()
+
+    if isinstance(data, dict) and 'data_class' in data:
+        data_state = data
+        data = data_state['data_class'].__new__(data_state['data_class'])
+        data.__dict__.update(data_state['attributes'])
+        data._lazy_attribute_fns = {
+            name: f'{get_data_inputs_dir(data_pkl_fn)}/{name}.pkl' for name in data_state['input_attributes']
+        }
+        data._journal_seq = data_state.get('journal_seq', 0)
+
+    # records up to the sequence number saved with the pickle are already included in it
+    # (ie the process died after compacting the journal but before removing it)
+    journal_seq = get_journal_seq(data)
+    for seq, record in read_journal(get_journal_fn(data_pkl_fn)):
+        if seq > journal_seq:
+            apply_annotation_update(data, record)
+            data._journal_seq = seq
+
+    return data
+
+
+def read_journal(journal_fn: Union[str, Path]):
+    """
+    Yields the (sequence number, record) pairs appended to an annotation journal, in order.
+
+    A truncated record at the end of the file (ie the process died mid-write) is ignored.
+    """
+    if not os.path.exists(journal_fn):
+        return
+
+    with open(journal_fn, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+            except (pickle.UnpicklingError, AttributeError, ValueError):
+                warnings.warn(f'Ignoring truncated record at the end of journal {journal_fn}')
+                return
+
+
+def get_journal_seq(data: Data) -> int:
+    """
+    Sequence number of the last journal record included in a Data object
+    """
+    return data.__dict__.get('_journal_seq', 0)
+
+
+def apply_annotation_update(data: Data, record: Dict):
+    """
+    Applies one annotation update to the annotation and history tables of a Data object
+
+    Parameters
+    ----------
+    data: Data
+        Data object to update
+    record: Dict
+        History record with 'index', 'timestamp', 'source_data_fn' and the new annotation values
+    """
+    annot_values = {k: v for k, v in record.items() if k not in ['index', 'timestamp', 'source_data_fn']}
+    with warnings.catch_warnings():
+
+        # Catching warning where the annotation value is "multi" (a list type)
+        warnings.filterwarnings("ignore", category=VisibleDeprecationWarning)
+
+        data.annot_df.loc[record['index'], list(annot_values.keys())] = list(annot_values.values())
+    data.history.append(record)
+
 
 class ReviewDataInterface:
     
     def __init__(self,
                  data_pkl_fn: Union[str, Path],
                  data: Data,
-                 mh: MetadataHandler,):
+                 mh: MetadataHandler,
+                 journal: bool = False,
+                 journal_compact_every: int = 100,
+                 storage_layout: str = 'pickle'):
         """
         Object that saves, loads, and edits Data objects
 
@@ -25,6 +137,18 @@ class ReviewDataInterface:
             pickle file to save/load data object from
         data: Data
             data object with the data to review
+        journal: bool
+            If True, each annotation update is appended (and fsync'ed) to a journal file next to data_pkl_fn
+            instead of re-pickling the whole Data object. The pickle is rewritten (compacted) every
+            journal_compact_every updates, on any other call to save_data(), and when the data is loaded again.
+        journal_compact_every: int
+            Number of journaled updates after which the full pickle file is rewritten
+        storage_layout: {'pickle', 'split'}
+            - 'pickle': the whole Data object is pickled to data_pkl_fn on every save
+            - 'split': input attributes (every attribute not in Data.state_attributes) are written once
+              to one pickle file each in the data inputs directory, and only the annotation state
+              (annot_df, history_df, annot_col_config_dict, index and description) is saved to data_pkl_fn.
+              Input attributes are loaded lazily when the data is loaded again.
 
         Notes
         -----
@@ -32,25 +156,104 @@ class ReviewDataInterface:
         If data_pkl_fn already exists, it will only load that file and ignore whatever the parameter data is.
         This is to prevent accidentally overwriting annotations and the data being currently reviewed.
         """
+        if storage_layout not in valid_storage_layouts:
+            raise ValueError(f'Invalid storage_layout {storage_layout}. Valid options are {valid_storage_layouts}')
+
         self.data_pkl_fn = data_pkl_fn
         self.mh = mh
+        self.storage_layout = storage_layout
+        self.data_inputs_dir = get_data_inputs_dir(data_pkl_fn)
+        self.journal = journal
+        self.journal_fn = get_journal_fn(data_pkl_fn)
+        self.journal_compact_every = journal_compact_every
+        self.n_journal_records = 0
+
+        # subject -> row positions in the history, see get_subject_history
+        self.history_index = {}
+        self._history_index_store = None
+        self._history_index_size = 0
+
         if os.path.exists(data_pkl_fn) and mh.metadata['freeze_data']:
-            f = open(data_pkl_fn, 'rb')
-            self.data = pickle.load(f)
-            f.close()
+            self.data = load_data_pkl(data_pkl_fn)
             warnings.warn(f"Loading existing data pkl file")
+            loaded_existing_data = True
         else:
             self.data = data
+            loaded_existing_data = False
 
+        if self.storage_layout == 'split':
+            self.save_data_inputs(overwrite=not loaded_existing_data)
         self.save_data()
 
+    def save_data_inputs(self, overwrite: bool = False):
+        """
+        Saves each input attribute of the Data object to its own pickle file in the data inputs directory.
+
+        Parameters
+        ----------
+        overwrite: bool
+            Whether to overwrite existing input files. If False, only missing input files are written.
+        """
+        if not os.path.exists(self.data_inputs_dir):
+            os.makedirs(self.data_inputs_dir)
+
+        for attribute_name in self.data.list_input_attributes():
+            fn = f'{self.data_inputs_dir}/{attribute_name}.pkl'
+            if overwrite or not os.path.exists(fn):
+                pd.to_pickle(getattr(self.data, attribute_name), fn)
+
     def save_data(self):
         """
-        Saves Data object to pickle file
+        Saves Data object to pickle file. With storage_layout='split', only the annotation state is saved.
+
+        Any annotation journal is compacted into the pickle file and removed. The sequence number of the last
+        journaled update is saved with the data, so the journal is not replayed twice if the process dies before
+        it is removed.
         """
-        f = open(self.data_pkl_fn, 'wb')
-        pickle.dump(self.data, f, 2)
+        if self.storage_layout == 'split':
+            data_to_save = {
+                'data_class': type(self.data),
+                'attributes': {name: getattr(self.data, name) for name in self.data.state_attributes},
+                'input_attributes': self.data.list_input_attributes(),
+                'journal_seq': get_journal_seq(self.data),
+            }
+        else:
+            self.data.load_lazy_attributes()
+            data_to_save = self.data
+
+        tmp_data_pkl_fn = f'{self.data_pkl_fn}.tmp'
+        f = open(tmp_data_pkl_fn, 'wb')
+        pickle.dump(data_to_save, f, 2)
+        f.flush()
+        os.fsync(f.fileno())
         f.close()
+        os.replace(tmp_data_pkl_fn, self.data_pkl_fn)
+
+        # journaled updates are now included in the pickle file
+        if os.path.exists(self.journal_fn):
+            os.remove(self.journal_fn)
+        self.n_journal_records = 0
+
+    def append_journal(self, record: Dict):
+        """
+        Appends an annotation update record to the journal file and syncs it to disk.
+        Compacts the journal into the pickle file every journal_compact_every records.
+
+        Parameters
+        ----------
+        record: Dict
+            History record with 'index', 'timestamp', 'source_data_fn' and the new annotation values
+        """
+        seq = get_journal_seq(self.data) + 1
+        with open(self.journal_fn, 'ab') as f:
+            pickle.dump((seq, record), f, 2)
+            f.flush()
+            os.fsync(f.fileno())
+        self.data._journal_seq = seq
+        self.n_journal_records += 1
+
+        if self.n_journal_records >= self.journal_compact_every:
+            self.save_data()
         
     def add_annotation(self,
                        annot_name: str,
@@ -113,7 +316,7 @@ class ReviewDataInterface:
             
             
         self.data.annot_df[list(new_data_annot.keys())] = np.nan
-        self.data.history_df[list(new_data_annot.keys())] = np.nan
+        self.data.history.add_columns(list(new_data_annot.keys()))
         
         # Set types
         for name, data_annot in annot_col_config_dict.items():
@@ -148,20 +351,68 @@ class ReviewDataInterface:
         """
         if list(self.data.annot_df.loc[data_idx, list(dictionary.keys())].values) != list(dictionary.values()):
             
-            with warnings.catch_warnings():
-                
-                # Catching warning where the annotation value is "multi" (a list type)
-                warnings.filterwarnings("ignore", category=np.VisibleDeprecationWarning) 
-                
-                self.data.annot_df.loc[data_idx, list(dictionary.keys())] = list(dictionary.values())
-                dictionary['timestamp'] = datetime.today()
-                dictionary['index'] = data_idx
-                dictionary['source_data_fn'] = self.data_pkl_fn
-                self.data.history_df = pd.concat([self.data.history_df, pd.Series(dictionary).to_frame().T])
+            dictionary['timestamp'] = datetime.today()
+            dictionary['index'] = data_idx
+            dictionary['source_data_fn'] = self.data_pkl_fn
+            apply_annotation_update(self.data, dictionary)
+            self.update_history_index()
+
+            if self.journal:
+                self.append_journal(dictionary)
+            else:
                 self.save_data()
         else:
             pass
             
+    def update_history_index(self):
+        """
+        Brings the subject to history row positions index up to date.
+
+        Rows appended since the last call are added incrementally. The index is rebuilt if
+        the history table was replaced.
+        """
+        history = self.data.history
+        if (self._history_index_store is not history) or (self._history_index_size > len(history)):
+            self.history_index = {}
+            self._history_index_store = history
+            self._history_index_size = 0
+
+        if self._history_index_size < len(history):
+            new_subjects = history.get_column('index')[self._history_index_size:]
+            new_positions = pd.Series(new_subjects).groupby(new_subjects, sort=False).indices
+            for subject, positions in new_positions.items():
+                self.history_index.setdefault(subject, []).extend(
+                    (positions + self._history_index_size).tolist()
+                )
+            self._history_index_size = len(history)
+
+    def get_subject_history(self, data_idx) -> pd.DataFrame:
+        """
+        History rows of one subject, in the order they were added
+
+        Parameters
+        ----------
+        data_idx:
+            Index in self.data.annot_df
+        """
+        self.update_history_index()
+        return self.data.history.take(self.history_index.get(data_idx, []))
+
+    def get_last_update(self, data_idx):
+        """
+        Timestamp of the most recent history row of one subject, or None if it was never annotated
+
+        Parameters
+        ----------
+        data_idx:
+            Index in self.data.annot_df
+        """
+        self.update_history_index()
+        positions = self.history_index.get(data_idx)
+        if not positions:
+            return None
+        return pd.Timestamp(self.data.history.get_column('timestamp')[positions[-1]])
+
     def export_data(self, path: Union[str, Path], attributes_to_export: List = None, verbose=True):
         """
         Export tables in self.data to tsv files in specified directory
@@ -173,7 +424,7 @@ class ReviewDataInterface:
         attributes_to_export: List
             Specify which attributes to export
         """
-        attributes_to_export = self.data.__dict__.keys() if attributes_to_export is None else attributes_to_export 
+        attributes_to_export = self.data.list_attributes() if attributes_to_export is None else attributes_to_export
 
         for attribute_name in attributes_to_export:
             x = getattr(self.data, attribute_name)
@@ -1,6 +1,8 @@
-from .ReviewDataInterface import ReviewDataInterface, DataAnnotation, Data
+from .ReviewDataInterface import ReviewDataInterface, DataAnnotation, Data, load_data_pkl
 from .Data import validate_annot_data
 from .ReviewDataApp import ReviewDataApp, valid_annotation_app_display_types, AnnotationDisplayComponent
+from .AppComponents.cache import clear_caches, invalidate_file, set_disk_cache_dir, get_disk_cache_dir, \
+    get_file_signature
 from AnnoMate.AnnotationDisplayComponent import *
 from AnnoMate.MetadataHandler import MetadataHandler
 import pandas as pd
@@ -14,9 +16,12 @@ import pickle
 import inspect
 import traceback
 import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date
 import functools
 import gc # garbage collection
+import hashlib
 
 
 def make_docstring(object_type_name, func1_doc, func2):
@@ -138,6 +143,9 @@ class ReviewerTemplate(ABC):
                         history_df: pd.DataFrame = None,
                         load_existing_data_pkl_fn: Union[str, pathlib.Path] = None,
                         load_existing_exported_data_dir: Union[str, pathlib.Path] = None,
+                        journal: bool = False,
+                        journal_compact_every: int = 100,
+                        storage_layout: str = 'pickle',
                         **kwargs):
         """Sets the review session ReviewData Object.
 
@@ -166,6 +174,17 @@ class ReviewerTemplate(ABC):
             path to a directory with exported annotation and history
             tables from a previous review session's data object
 
+        journal : bool, default=False
+            Append each annotation update to a journal file (data.journal) instead of rewriting
+            the full data pickle file on every submit. The journal is replayed when the data is loaded.
+
+        journal_compact_every : int, default=100
+            Number of journaled annotation updates after which the data pickle file is rewritten
+
+        storage_layout : {'pickle', 'split'}, default='pickle'
+            'split' writes the input tables of the data object once to a data.inputs directory and
+            only saves the annotation state to data.pkl on updates. See ReviewDataInterface.
+
         **kwargs: dict
                   See additional parameters from self.gen_data() below
 
@@ -184,17 +203,14 @@ class ReviewerTemplate(ABC):
             mh = MetadataHandler(metadata_config_fn)
 
         if os.path.exists(data_pkl_fn) and mh.metadata['freeze_data']:
-            f = open(data_pkl_fn, 'rb')
-            data = pickle.load(f)
+            data = load_data_pkl(data_pkl_fn)
         else:
             if description is None:
                 raise ValueError(f'description is None. Provide a description if you are setting a new data object.')
             if (load_existing_data_pkl_fn is not None) and \
                     os.path.exists(load_existing_data_pkl_fn):
                 print("Loading data from previous review with pickle file")
-                f = open(load_existing_data_pkl_fn, 'rb')
-                existing_data = pickle.load(f)
-                f.close()
+                existing_data = load_data_pkl(load_existing_data_pkl_fn)
 
                 annot_df = existing_data.annot_df
                 annot_col_config_dict = existing_data.annot_col_config_dict
@@ -234,7 +250,10 @@ class ReviewerTemplate(ABC):
         self.review_data_interface = ReviewDataInterface(
             data_pkl_fn=data_pkl_fn,
             data=data,
-            mh=mh
+            mh=mh,
+            journal=journal,
+            journal_compact_every=journal_compact_every,
+            storage_layout=storage_layout
         )
 
     def set_default_review_data_annotations_configuration(self):
@@ -434,6 +453,11 @@ class ReviewerTemplate(ABC):
     def run(self,
             review_data_table_df: pd.DataFrame = None,
             review_data_table_page_size: int = 5,
+            review_data_table_mode: str = 'native',
+            dropdown_mode: str = 'full',
+            component_executor_workers: int = None,
+            component_callback_mode: str = 'single',
+            disk_cache_dir: str = None,
             collapsable=True,
             mode='external', 
             host='0.0.0.0', 
@@ -447,6 +471,17 @@ class ReviewerTemplate(ABC):
         ----------
         review_data_table_df: dataframe with index that matches the index of the reviewer data object's index
         review_data_table_page_size: number of subjects to view
+        review_data_table_mode: {'native', 'server'}, default='native'
+            'server' pages, sorts and filters the review data table on the server. Use for large cohorts.
+        dropdown_mode: {'full', 'search'}, default='full'
+            'search' only loads the subjects matching the text typed in the dropdown. Use for large cohorts.
+        component_executor_workers: int, default=None
+            Number of threads used to update the components concurrently when switching subjects
+        component_callback_mode: {'single', 'per_component'}, default='single'
+            'per_component' updates each component with its own callback so fast components render first
+        disk_cache_dir: str, default=None
+            Directory where preprocessed component data (ex. CNV plots) is stored and reused across restarts and
+            processes
         mode: {'inline', 'external'}, default='external'
         host: str, default='0.0.0.0'
             Host address
@@ -454,11 +489,17 @@ class ReviewerTemplate(ABC):
             Port number
 
         """
+        if disk_cache_dir is not None:
+            set_disk_cache_dir(disk_cache_dir)
         self.app.run(review_data=self.review_data_interface,
                      autofill_dict=self.autofill_dict,
                      annot_app_display_types_dict=self.annot_app_display_types_dict,
                      review_data_table_df=review_data_table_df,
                      review_data_table_page_size=review_data_table_page_size,
+                     review_data_table_mode=review_data_table_mode,
+                     dropdown_mode=dropdown_mode,
+                     component_executor_workers=component_executor_workers,
+                     component_callback_mode=component_callback_mode,
                      collapsable=collapsable,
                      mode=mode,
                      host=host,
@@ -466,11 +507,106 @@ class ReviewerTemplate(ABC):
                      **kwargs
                     )
 
+    def precompute(self,
+                   disk_cache_dir: Union[str, Path],
+                   subjects: List = None,
+                   n_workers: int = None,
+                   resume: bool = True) -> Dict:
+        """
+        Runs the components' data loading (prefetch_callback) for the subjects before a review session, so the
+        results cached on disk are reused by the app instead of computed on the first view of each subject.
+
+        Subjects are processed in separate processes, so only the loaders cached with disk=True (see
+        AppComponents.cache.file_cache) are kept: the loaders of the CNV plot, mutation table and PhylogicNDT
+        components are. Custom components only benefit if their prefetch_callback fills a disk cache.
+
+        Parameters
+        ----------
+        disk_cache_dir: Union[str, Path]
+            Directory of the disk cache. Pass the same directory to run(disk_cache_dir=...)
+        subjects: List
+            Index values of the subjects to precompute. If None, all subjects in the data index.
+        n_workers: int
+            Number of processes. If None, the number of CPUs. Subjects are processed in the current process if 1
+            or if the platform cannot fork.
+        resume: bool
+            Skip the subjects completed by a previous call, listed in {disk_cache_dir}/precompute_done.txt with the
+            modification time and size of their input files: the existing files named in the subject's rows of the
+            data tables (see _get_subjects_files). Subjects whose input files changed are processed again.
+            Set to False to process all subjects again.
+
+        Returns
+        -------
+        Dict
+            Subjects that failed, with the errors of the failing components
+        """
+        if self.review_data_interface is None or self.app is None:
+            raise ValueError('Review data and review app must be set before precomputing. '
+                             'Call set_review_data and set_review_app first.')
+
+        previous_disk_cache_dir = get_disk_cache_dir()
+        set_disk_cache_dir(disk_cache_dir)
+        try:
+            components = [c for c in self.app.more_components.values() if c.prefetch_callback is not None]
+            data = self.review_data_interface.data
+            subjects = list(data.index) if subjects is None else list(subjects)
+            subjects_files_signature = {
+                subject: _get_files_signature_hash(fns) for subject, fns in _get_subjects_files(data, subjects).items()
+            }
+
+            done_fn = os.path.join(disk_cache_dir, 'precompute_done.txt')
+            done = {}
+            if os.path.exists(done_fn):
+                if resume:
+                    with open(done_fn) as f:
+                        # later lines replace the earlier ones of subjects processed again
+                        done = dict(line.rsplit('\t', 1) for line in f.read().splitlines() if '\t' in line)
+                else:
+                    os.remove(done_fn)
+            todo = [subject for subject in subjects if done.get(str(subject)) != subjects_files_signature[subject]]
+            print(f'Precomputing {len(todo)} subjects ({len(subjects) - len(todo)} already done)')
+            if len(components) == 0 or len(todo) == 0:
+                return {}
+
+            n_workers = os.cpu_count() if n_workers is None else n_workers
+            failed = {}
+            with open(done_fn, 'a') as done_file:
+                def record(i, subject, errors):
+                    if errors:
+                        failed[subject] = errors
+                        print(f'[{i}/{len(todo)}] {subject} failed: ' + '; '.join(errors))
+                    else:
+                        done_file.write(f'{subject}\t{subjects_files_signature[subject]}\n')
+                        done_file.flush()
+                        print(f'[{i}/{len(todo)}] {subject} done')
+
+                if n_workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+                    # forked workers inherit the components' callbacks, which can not be pickled
+                    with ProcessPoolExecutor(max_workers=n_workers,
+                                             mp_context=multiprocessing.get_context('fork'),
+                                             initializer=_init_precompute_worker,
+                                             initargs=(components, data, disk_cache_dir)) as executor:
+                        futures = [executor.submit(_precompute_subject, subject) for subject in todo]
+                        for i, future in enumerate(as_completed(futures)):
+                            record(i + 1, *future.result())
+                else:
+                    _init_precompute_worker(components, data, disk_cache_dir)
+                    try:
+                        for i, subject in enumerate(todo):
+                            record(i + 1, *_precompute_subject(subject))
+                    finally:
+                        _precompute_worker_state.clear()
+
+            print(f'Precomputed {len(todo) - len(failed)} subjects, {len(failed)} failed')
+            return failed
+        finally:
+            set_disk_cache_dir(previous_disk_cache_dir)
+
     def get_data_attribute(self, attribute: str):
         return getattr(self.review_data_interface.data, attribute)
 
     def list_data_attributes(self):
-        return vars(self.review_data_interface.data).keys()
+        return self.review_data_interface.data.list_attributes()
 
     def get_annot(self):
         if not self.review_data_interface.mh.metadata['freeze_data']:
@@ -518,13 +654,72 @@ class ReviewerTemplate(ABC):
         else:
             print(f"Export directory will be {export_dir}. Nothing exported yet.")
 
-    def clear_cache(self):
-        # All objects collected
-        objects = [i for i in gc.get_objects() if isinstance(i, functools._lru_cache_wrapper)]
-          
-        # All objects cleared
-        for object in objects:
-            object.cache_clear()
+    def clear_cache(self, fn: Union[str, Path] = None):
+        """
+        Clear the caches of the app components (see AnnoMate.AppComponents.cache)
+
+        Cached files are already reloaded when their modification time or size changes. Custom caches can be
+        added with AnnoMate.AppComponents.cache.register_cache.
+
+        Parameters
+        ----------
+        fn: Union[str, Path]
+            Only remove the cached data computed from this file. If None, clear all caches, including the
+            functools.lru_cache functions that are not registered.
+        """
+        if fn is None:
+            clear_caches()
+            for cache in gc.get_objects():
+                if isinstance(cache, functools._lru_cache_wrapper):
+                    cache.cache_clear()
+        else:
+            invalidate_file(fn)
+
+
+_precompute_worker_state = {}
+
+
+def _init_precompute_worker(components, data, disk_cache_dir):
+    _precompute_worker_state['components'] = components
+    _precompute_worker_state['data'] = data
+    set_disk_cache_dir(disk_cache_dir)
+
+
+def _precompute_subject(subject):
+    errors = []
+    for component in _precompute_worker_state['components']:
+        try:
+            component.prefetch_callback(_precompute_worker_state['data'], subject)
+        except Exception as e:
+            errors.append(f'{component.name}: {type(e).__name__}: {e}')
+    return subject, errors
+
+
+def _get_subjects_files(data, subjects: List) -> Dict:
+    """
+    Existing files named in the input tables of the data (e.g. participant_df, sample_df) for each subject: in the
+    rows indexed by the subject and in the rows referring to it in another column (e.g. the samples of a participant)
+    """
+    subject_names = {str(subject): subject for subject in subjects}
+    subjects_files = {subject: set() for subject in subjects}
+    for attribute_name in data.list_input_attributes():
+        df = getattr(data, attribute_name)
+        if not isinstance(df, pd.DataFrame):
+            continue
+        for index_value, row in zip(df.index, df.itertuples(index=False)):
+            row_values = [index_value] + [v for v in row if isinstance(v, str)]
+            row_subjects = {subject_names[str(v)] for v in row_values if str(v) in subject_names}
+            if not row_subjects:
+                continue
+            row_fns = {os.path.abspath(v) for v in row_values if isinstance(v, str) and os.path.isfile(v)}
+            for subject in row_subjects:
+                subjects_files[subject] |= row_fns
+    return subjects_files
+
+
+def _get_files_signature_hash(fns) -> str:
+    """Hash of the path, modification time and size of files (see AppComponents.cache.get_file_signature)"""
+    return hashlib.sha256(repr(sorted(get_file_signature(fn) for fn in fns)).encode()).hexdigest()[:16]
 
 
 def parse_lists(x):
@@ -0,0 +1,116 @@
+import os
+import warnings
+import pandas as pd
+import pytest
+from AnnoMate.AppComponents.cache import file_cache, clear_caches, invalidate_file, set_cache_memory_budget, \
+    estimate_size, set_disk_cache_dir, get_cache_info
+
+
+def test_file_cache(tmp_path):
+    fn = str(tmp_path / 'table.tsv')
+    pd.DataFrame({'a': [1, 2]}).to_csv(fn, sep='\t', index=False)
+
+    n_reads = []
+
+    @file_cache(maxsize=2, file_args=['fn'])
+    def read_table(fn):
+        n_reads.append(fn)
+        return pd.read_csv(fn, sep='\t')
+
+    assert read_table(fn)['a'].tolist() == [1, 2]
+    assert read_table(fn) is read_table(fn)
+    assert len(n_reads) == 1
+
+    # rewritten file is reloaded
+    pd.DataFrame({'a': [1, 2, 3]}).to_csv(fn, sep='\t', index=False)
+    assert read_table(fn)['a'].tolist() == [1, 2, 3]
+    assert len(n_reads) == 2
+
+    # same size and content, new modification time
+    stat = os.stat(fn)
+    os.utime(fn, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    read_table(fn)
+    assert len(n_reads) == 3
+
+    invalidate_file(fn)
+    read_table(fn)
+    assert len(n_reads) == 4
+
+    clear_caches()
+    assert len(read_table) == 0
+
+
+def test_file_cache_memory_budget():
+    @file_cache()
+    def gen_table(n_rows):
+        return pd.DataFrame({'a': ['value'] * n_rows})
+
+    size = estimate_size(gen_table(1000))
+    try:
+        set_cache_memory_budget(int(size * 2.5))
+        gen_table(1000)
+        gen_table(1001)
+        gen_table(1000)  # most recently used
+        gen_table(1002)
+        assert gen_table.cache_info()['evictions'] == 1
+        assert gen_table.cache_info()['hits'] == 2
+        assert [key[0][0] for key in gen_table._entries] == [1000, 1002]
+        assert gen_table.nbytes <= size * 2.5
+
+        assert get_cache_info().attrs['maxbytes'] == int(size * 2.5)
+
+        # larger than the budget: not cached, with a warning the first time
+        with pytest.warns(UserWarning, match='larger than the cache memory budget'):
+            gen_table(10000)
+        assert len(gen_table) == 2
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            gen_table(10001)
+        assert gen_table.cache_info()['too_large'] == 2
+    finally:
+        set_cache_memory_budget(2 * 1024 ** 3)
+        clear_caches()
+
+
+def test_file_cache_disk(tmp_path):
+    fn = str(tmp_path / 'table.tsv')
+    pd.DataFrame({'a': [1, 2]}).to_csv(fn, sep='\t', index=False)
+
+    n_reads = []
+
+    @file_cache(file_args=['fn'], disk=True)
+    def read_table(fn, scale=1):
+        n_reads.append(fn)
+        return pd.read_csv(fn, sep='\t') * scale
+
+    try:
+        set_disk_cache_dir(str(tmp_path / 'disk_cache'))
+        read_table(fn, scale=2)
+        read_table.cache_clear()  # as after a restart
+        assert read_table(fn, scale=2)['a'].tolist() == [2, 4]
+        assert len(n_reads) == 1
+        assert read_table.cache_info()['disk_hits'] == 1
+
+        read_table(fn, scale=3)
+        assert len(n_reads) == 2
+
+        # same file, new content
+        pd.DataFrame({'a': [5, 6]}).to_csv(fn, sep='\t', index=False)
+        read_table.cache_clear()
+        assert read_table(fn, scale=2)['a'].tolist() == [10, 12]
+        assert len(n_reads) == 3
+
+        # None is a value like any other
+        @file_cache(file_args=['fn'], disk=True)
+        def read_optional_table(fn):
+            n_reads.append(fn)
+            return None
+
+        assert read_optional_table(fn) is None
+        read_optional_table.cache_clear()
+        assert read_optional_table(fn) is None
+        assert len(n_reads) == 4
+        assert read_optional_table.cache_info()['disk_hits'] == 1
+    finally:
+        set_disk_cache_dir(None)
+        clear_caches()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from AnnoMate.AppComponents.utils import get_unique_identifier, get_unique_identifiers, get_maf, get_maf_ids
+
+
+def test_get_unique_identifiers():
+    maf_df = pd.DataFrame({
+        'Chromosome': ['1', 'X', '12', '3'],
+        'Start_position': [12345, 678, 9101112, 42],
+        'Reference_Allele': ['A', 'C', '-', 'GT'],
+        'Tumor_Seq_Allele': ['T', 'G', 'AC', np.nan],
+        'Hugo_Symbol': ['TP53', 'AR', None, 'KRAS'],
+    }, index=[10, 11, 12, 13])
+
+    expected = maf_df.apply(get_unique_identifier, axis=1)
+    ids = get_unique_identifiers(maf_df)
+    assert ids.tolist() == expected.tolist()
+    assert ids.index.equals(maf_df.index)
+
+    # integer contigs and alternative column names
+    maf_df['Chromosome'] = [1, 23, 12, 3]
+    maf_df['Tumor_Seq_Allele2'] = ['T', 'G', 'AC', 'G']
+    expected = maf_df.apply(lambda x: get_unique_identifier(x, alt='Tumor_Seq_Allele2'), axis=1)
+    assert get_unique_identifiers(maf_df, alt='Tumor_Seq_Allele2').tolist() == expected.tolist()
+
+
+def test_get_maf(tmp_path):
+    maf_fn = str(tmp_path / 'test.maf')
+    pd.DataFrame({
+        'Chromosome': ['1', 'X'],
+        'Start_position': [12345, 678],
+        'Reference_Allele': ['A', 'C'],
+        'Tumor_Seq_Allele2': ['T', 'G'],
+        'Tumor_Sample_Barcode': ['sample_1', 'sample_2'],
+    }).to_csv(maf_fn, sep='\t', index=False)
+
+    maf_df = get_maf(maf_fn)
+    assert get_maf_ids(maf_fn).tolist() == ['1:12345A>T', 'X:678C>G']
+    assert maf_df['Sample_ID'].tolist() == ['sample_1', 'sample_2']
+
+    # changes to a view are not seen by other components
+    maf_df['Chromosome'] = maf_df['Chromosome'].replace({'X': '23'})
+    maf_df.drop_duplicates(subset='Start_position', inplace=True)
+    assert get_maf(maf_fn)['Chromosome'].tolist() == ['1', 'X']
+
+
+def test_get_maf_custom_start_position_column(tmp_path):
+    maf_fn = str(tmp_path / 'custom.maf')
+    pd.DataFrame({
+        'Chromosome': ['1', 'X'],
+        'POS': [12345, 678],
+        'Reference_Allele': ['A', 'C'],
+        'Tumor_Seq_Allele': ['T', 'G'],
+    }).to_csv(maf_fn, sep='\t', index=False)
+
+    # the file is parsed without ids, so components not using them do not need the default columns
+    maf_df = get_maf(maf_fn)
+    assert 'id' not in maf_df
+    assert 'Sample_ID' not in maf_df
+
+    assert get_maf_ids(maf_fn, start_pos='POS').tolist() == ['1:12345A>T', 'X:678C>G']
+    with pytest.raises(ValueError):
+        get_maf_ids(maf_fn)
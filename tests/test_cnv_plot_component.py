@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from cnv_suite.utils import get_segment_interval_trees, apply_segment_data_to_df as apply_segment_tree_data_to_df
+from cnv_suite.visualize import update_cnv_color_absolute
+from AnnoMate.AppComponents.CNVPlotComponent import apply_segment_data_to_df, gen_seg_figure, gen_cnv_trace_values, csize, \
+    merge_similar_segments, downsample_mutations, get_relayout_x_range, gen_maf, calculate_error
+
+
+def test_apply_segment_data_to_df():
+    seg_df = pd.DataFrame({
+        'Sample_ID': ['s1', 's1', 's1', 's2', 's2'],
+        'Chromosome': [1, 1, 2, 1, 2],
+        'Start.bp': [1, 1001, 1, 500, 1],
+        'End.bp': [1000, 5000, 3000, 4000, 2000],
+        'length': [999, 3999, 2999, 3500, 1999],
+        'mu.major': [1.1, 1.2, 1.3, 1.4, 1.5],
+        'mu.minor': [0.1, 0.2, 0.3, 0.4, 0.5],
+    })
+    maf_df = pd.DataFrame({
+        'Sample_ID': ['s1', 's1', 's1', 's2', 's2', 's2', 's1'],
+        'Chromosome': ['1', '1', '2', '1', '1', '2', '1'],
+        'Start_position': [1000, 1001, 2999, 499, 3999, 2500, 5000],
+    }, index=[10, 11, 12, 13, 14, 15, 16])
+
+    expected = apply_segment_tree_data_to_df(maf_df, get_segment_interval_trees(seg_df))
+    pd.testing.assert_frame_equal(apply_segment_data_to_df(maf_df, seg_df), expected, check_dtype=False)
+
+
+def test_gen_cnv_trace_values(tmp_path):
+    cnv_seg_fn = str(tmp_path / 'sample.seg')
+    pd.DataFrame({
+        'Chromosome': [1, 1, 2],
+        'Start.bp': [1, 1001, 1],
+        'End.bp': [1000, 5000, 3000],
+        'length': [999, 3999, 2999],
+        'mu.major': [1.1, 1.2, 1.3],
+        'mu.minor': [0.1, 0.2, 0.9],
+        'sigma.major': [0.05, 0.1, 0.05],
+        'sigma.minor': [0.05, 0.1, 0.05],
+        'tau': [1.2, 1.4, 2.2],
+    }).to_csv(cnv_seg_fn, sep='\t', index=False)
+    cnv_plot, seg_df, start_trace, end_trace = gen_seg_figure(cnv_seg_fn, csize, purity=0.7, ploidy=2.1)
+    cnv_plot_json = cnv_plot.to_json()
+
+    trace_values = gen_cnv_trace_values(cnv_plot, seg_df, True, 'Black', start_trace, end_trace)
+    assert cnv_plot.to_json() == cnv_plot_json
+
+    expected_fig = go.Figure(cnv_plot)
+    update_cnv_color_absolute(expected_fig, seg_df, True, 'Black', start_trace, end_trace)
+    assert [list(values['y']) for values in trace_values] == [list(trace.y) for trace in expected_fig.data[start_trace:end_trace]]
+    assert [values['fillcolor'] for values in trace_values] == [trace.fillcolor for trace in expected_fig.data[start_trace:end_trace]]
+
+
+def test_merge_similar_segments():
+    seg_df = pd.DataFrame({
+        'Chromosome': [1, 1, 1, 1, 2, 2],
+        'Start.bp': [1, 11, 21, 31, 1, 11],
+        'End.bp': [10, 20, 30, 40, 10, 20],
+        'length': [10, 10, 10, 30, 10, 10],
+        'mu.major': [1.0, 1.02, 1.5, 1.7, 1.0, 1.0],
+        'mu.minor': [0.5, 0.5, 0.2, 0.2, np.nan, 0.5],
+    })
+    assert merge_similar_segments(seg_df, 6) is seg_df
+
+    merged_df = merge_similar_segments(seg_df, 4)
+    assert merged_df['Start.bp'].tolist() == [1, 21, 1, 11]
+    assert merged_df['End.bp'].tolist() == [20, 40, 10, 20]
+    assert merged_df['length'].tolist() == [20, 40, 10, 10]
+    assert np.allclose(merged_df['mu.major'], [1.01, 1.65, 1.0, 1.0])
+
+    # segments of different contigs or with missing copy number are not merged
+    assert len(merge_similar_segments(seg_df, 1)) == 3
+
+
+def test_downsample_mutations():
+    maf_df = pd.DataFrame({'x_loc': np.arange(1000) * 1000, 'multiplicity_ccf': np.tile([0.5, 1.0], 500)})
+    assert downsample_mutations(maf_df, 1000) is maf_df
+    assert len(downsample_mutations(maf_df, 100)) <= 100
+    assert downsample_mutations(maf_df, 1000, x_range=[0, 9000])['x_loc'].tolist() == list(range(0, 10000, 1000))
+
+    assert get_relayout_x_range({'autosize': True}) is False
+    assert get_relayout_x_range({'xaxis2.range[0]': 10, 'xaxis2.range[1]': 20}) == [10, 20]
+    assert get_relayout_x_range({'xaxis.autorange': True}) is None
+
+
+def test_gen_maf_matches_row_wise(tmp_path):
+    maf_fn = str(tmp_path / 'test.maf')
+    pd.DataFrame({
+        'Sample_ID': ['s1', 's1', 's1', 's1', 's2', 's2'],
+        'Chromosome': ['1', '2', 'X', '1', '1', '2'],
+        'Start_position': [500, 1500, 2500, 4000, 600, 1700],
+        'Reference_Allele': 'A',
+        'Tumor_Seq_Allele': 'T',
+        't_alt_count': [10, 0, 0, 7, 12, 3],
+        't_ref_count': [30, 25, 0, 0, 20, 40],
+    }).to_csv(maf_fn, sep='\t', index=False)
+    seg_df = pd.DataFrame({
+        'Sample_ID': ['s1', 's1', 's1', 's2', 's2'],
+        'Chromosome': [1, 2, 23, 1, 2],
+        'Start.bp': [1, 1, 1, 1, 1],
+        'End.bp': [5000, 5000, 5000, 5000, 5000],
+        'length': [4999, 4999, 4999, 4999, 4999],
+        'mu.major': [1.2, 1.0, 1.1, 1.3, 0.9],
+        'mu.minor': [0.8, 1.0, 0.0, 0.7, 0.9],
+    })
+    purity_dict = {'s1': 0.7, 's2': np.nan}
+    ploidy_dict = {'s1': 2.1, 's2': 2.0}
+
+    maf_df = gen_maf(maf_fn, purity_dict, ploidy_dict, seg_df, 'Start_position', 'Sample_ID', 'Chromosome', None)
+
+    # row-wise computation replaced by the vectorized one
+    c_size_cumsum = np.cumsum([0] + list(csize.values()))
+    expected = pd.DataFrame({
+        'x_loc': maf_df.apply(lambda x: c_size_cumsum[x['Chromosome'] - 1] + x['Start_position'], axis=1),
+        'multiplicity_ccf': maf_df.apply(
+            lambda x: x.VAF * (x['purity'] * (x.mu_major_adj + x.mu_minor_adj) + 2 * (1 - x['purity'])) / x['purity'],
+            axis=1),
+        'error_top': maf_df.apply(lambda x: calculate_error(x.t_alt_count, x.t_ref_count, x['purity'], 0.975), axis=1),
+        'error_bottom': maf_df.apply(
+            lambda x: -1 * calculate_error(x.t_alt_count, x.t_ref_count, x['purity'], 0.025), axis=1),
+    })
+    pd.testing.assert_frame_equal(maf_df[expected.columns], expected, check_dtype=False)
+    assert maf_df['error_top'].iloc[[1, 2]].tolist() == [0, 0]
+    assert maf_df.loc[maf_df['Sample_ID'] == 's2', 'error_top'].isna().all()
@@ -1,4 +1,9 @@
+import os
 import pandas as pd
+from dash import html
+from dash.dependencies import Output
+from AnnoMate.ReviewDataApp import AppComponent
+from AnnoMate.AppComponents.cache import set_disk_cache_dir, get_disk_cache_dir
 from AnnoMate.Reviewers.ExampleReviewer import ExampleReviewer
 
 def test_reviewer():
@@ -20,3 +25,47 @@ def test_reviewer():
     assert my_reviewer.get_data_attribute('df').equals(df)
     
     
+
+
+def test_precompute(tmp_path):
+    fn = 'tutorial_notebooks/example_data/AnnoMate_Tutorial/data_to_review_example.tsv'
+    df = pd.read_csv(fn, sep='\t').set_index('sample_id')
+
+    my_reviewer = ExampleReviewer()
+    my_reviewer.set_review_data(data_path=str(tmp_path / 'review_data'),
+                                description='Precompute test',
+                                sample_df=df,
+                                preprocessing_str='Testing preprocessing')
+    my_reviewer.set_review_app(mut_file_col='mutations_file', sample_cols=list(df.columns[:2]))
+
+    prefetched_dir = tmp_path / 'prefetched'
+    prefetched_dir.mkdir()
+
+    def prefetch(data, idx, suffix=None):
+        if idx == df.index[0]:
+            raise ValueError('missing file')
+        (prefetched_dir / f'{idx}{suffix}').touch()
+
+    my_reviewer.app.add_component(
+        AppComponent('Prefetch', html.Div('', id='prefetch-div'), callback_output=[Output('prefetch-div', 'children')],
+                     new_data_callback=lambda data, idx, suffix=None: [idx], prefetch_callback=prefetch),
+        suffix='.done'
+    )
+
+    disk_cache_dir = str(tmp_path / 'disk_cache')
+    app_disk_cache_dir = str(tmp_path / 'app_disk_cache')
+    try:
+        set_disk_cache_dir(app_disk_cache_dir)
+        failed = my_reviewer.precompute(disk_cache_dir, n_workers=2)
+        # the disk cache directory of the current process is restored
+        assert get_disk_cache_dir() == app_disk_cache_dir
+    finally:
+        set_disk_cache_dir(None)
+    assert list(failed.keys()) == [df.index[0]]
+    assert sorted(os.listdir(prefetched_dir)) == sorted(f'{idx}.done' for idx in df.index[1:])
+
+    # completed subjects are skipped
+    for f in prefetched_dir.iterdir():
+        f.unlink()
+    my_reviewer.precompute(disk_cache_dir, n_workers=1)
+    assert os.listdir(prefetched_dir) == []
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from AnnoMate.AppComponents.MutationTableComponent import sort_positions, query_mutation_table, gen_table_records, \
+    load_file
+from AnnoMate.AppComponents.cache import clear_caches, set_disk_cache_dir
+from AnnoMate.AppComponents.utils import get_maf
+
+
+def test_query_mutation_table(tmp_path):
+    maf_fn = str(tmp_path / 'test.maf')
+    pd.DataFrame({
+        'Hugo_Symbol': ['TP53', 'KRAS', 'AR', 'TP53', 'KRAS', 'AR'],
+        'Chromosome': ['17', '12', 'X', '17', '12', 'X'],
+        'Start_position': [100, 200, 300, 100, 200, 300],
+        'Reference_Allele': ['A', 'C', 'G', 'A', 'C', 'G'],
+        'Tumor_Seq_Allele2': ['T', 'G', 'C', 'T', 'G', 'C'],
+        'Cluster_Assignment': [2, np.nan, 1, 2, np.nan, 1],
+        't_alt_count': [1, 2, 3, 4, 5, 6],
+        'Tumor_Sample_Barcode': ['s1', 's1', 's1', 's2', 's2', 's2'],
+    }).to_csv(maf_fn, sep='\t', index=False)
+
+    positions = np.arange(6)
+    assert sort_positions(maf_fn, positions, [('Cluster_Assignment', 'asc')]).tolist() == [2, 5, 0, 3, 1, 4]
+    assert sort_positions(maf_fn, positions, [('Cluster_Assignment', 'desc')]).tolist() == [0, 3, 2, 5, 1, 4]
+    assert sort_positions(maf_fn, positions[3:], [('Hugo_Symbol', 'desc')]).tolist() == [3, 4, 5]
+
+    query_args = ('Hugo_Symbol', 'Variant_Classification', 'Cluster_Assignment', 'Tumor_Sample_Barcode', ['t_alt_count'])
+    participant_maf, sample_maf, filtered_maf_cols = query_mutation_table(
+        maf_fn, ['KRAS', 'TP53'], [], [], '{Start_position} > 150', [('Start_position', 'desc')], *query_args
+    )
+    assert participant_maf['id'].tolist() == ['12:200C>G']
+    assert sample_maf.index.tolist() == ['12:200C>G']
+    assert sample_maf['t_alt_count'].loc['12:200C>G'].tolist() == [2, 5]
+    assert 'Cluster_Assignment' not in filtered_maf_cols
+
+    # memoized by query
+    assert query_mutation_table(
+        maf_fn, ['KRAS', 'TP53'], [], [], '{Start_position} > 150', [('Start_position', 'desc')], *query_args
+    )[0] is participant_maf
+
+
+def test_gen_table_records():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', np.nan]}, index=['m1', 'm2'])
+    records = gen_table_records(df)
+    assert records[0] == {'a': 1, 'b': 'x'} and type(records[0]['a']) is int
+    assert np.isnan(records[1]['b'])
+    assert gen_table_records(df, ['a_s1', 'b_s1'])[0] == {'a_s1': 1, 'b_s1': 'x'}
+
+
+def test_load_file_shares_maf(tmp_path):
+    maf_fn = str(tmp_path / 'test.maf')
+    pd.DataFrame({
+        'Chromosome': ['17', '12', '17', '12'],
+        'Start_position': [100, 200, 100, 200],
+        'Reference_Allele': ['A', 'C', 'A', 'C'],
+        'Tumor_Seq_Allele2': ['T', 'G', 'T', 'G'],
+        't_alt_count': [1, 2, 3, 4],
+        'Cluster_Assignment': [1, 2, 1, 2],
+        'Tumor_Sample_Barcode': ['s1', 's1', 's2', 's2'],
+    }).to_csv(maf_fn, sep='\t', index=False)
+
+    try:
+        set_disk_cache_dir(str(tmp_path / 'disk_cache'))
+        for _ in range(2):  # computed, then loaded from the disk cache as after a restart
+            clear_caches()
+            maf_df, maf_cols_options, columns_equivalent = load_file(maf_fn)
+            # the maf table is built on the shared maf store instead of holding a second copy of the maf
+            assert np.shares_memory(maf_df['t_alt_count'].to_numpy(), get_maf(maf_fn)['t_alt_count'].to_numpy())
+            assert maf_df.index.tolist() == ['17:100A>T', '12:200C>G', '17:100A>T', '12:200C>G']
+            assert 'Sample_ID' in maf_cols_options
+            assert columns_equivalent[['Cluster_Assignment', 't_alt_count']].tolist() == [True, False]
+    finally:
+        set_disk_cache_dir(None)
+        clear_caches()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from AnnoMate.AppComponents.PhylogicNDTComponents import load_phylogic_bundle, gen_phylogicNDT_tree, ccf_pmf_plot
+
+
+def test_load_phylogic_bundle(tmp_path):
+    cluster_ccfs_fn = str(tmp_path / 'cluster_ccfs.tsv')
+    pd.DataFrame({
+        'Patient_ID': 'p1',
+        'Sample_ID': ['s1', 's1', 's2', 's2'],
+        'Cluster_ID': [1, 2, 1, 2],
+        'postDP_ccf_mean': [1.0, 0.4, 1.0, 0.1],
+        'postDP_ccf_CI_low': [0.9, 0.3, 0.9, 0.0],
+        'postDP_ccf_CI_high': [1.0, 0.5, 1.0, 0.2],
+    }).to_csv(cluster_ccfs_fn, sep='\t', index=False)
+    tree_fn = str(tmp_path / 'build_tree_posterior.tsv')
+    pd.DataFrame({'n_iter': [30, 20], 'edges': ['None-1,1-2', 'None-1,1-2,1-3']}).to_csv(tree_fn, sep='\t', index=False)
+    maf_fn = str(tmp_path / 'mut_ccfs.tsv')
+    pd.DataFrame({
+        'Patient_ID': 'p1',
+        'Sample_ID': ['s1', 's1', 's1', 's2', 's2', 's2'],
+        'Hugo_Symbol': ['TP53', 'KRAS', 'EGFR', 'TP53', 'KRAS', 'EGFR'],
+        'Chromosome': [17, 12, 7, 17, 12, 7],
+        'Start_position': [100, 200, 300, 100, 200, 300],
+        'Reference_Allele': 'A',
+        'Tumor_Seq_Allele': 'T',
+        'Cluster_Assignment': [1, 1, 2, 1, 1, 2],
+    }).to_csv(maf_fn, sep='\t', index=False)
+    drivers_fn = str(tmp_path / 'drivers.txt')
+    with open(drivers_fn, 'w') as f:
+        f.write('TP53\nEGFR\n')
+
+    bundle = load_phylogic_bundle(cluster_ccfs_fn, tree_fn, maf_fn, drivers_fn=drivers_fn,
+                                  maf_participant_id_col='Patient_ID', maf_hugo_col='Hugo_Symbol',
+                                  maf_chromosome_col='Chromosome', maf_start_pos_col='Start_position',
+                                  maf_cluster_col='Cluster_Assignment')
+    assert bundle['possible_trees'] == ['Tree 1 (n_iter=30)', 'Tree 2 (n_iter=20)']
+    assert bundle['tree_edges'] == [[(1, 2)], [(1, 2), (1, 3)]]
+    assert bundle['tree_clusters'] == [['1', '2'], ['1', '2', '3']]
+    assert bundle['cluster_hugo_dict'] == {1: ['TP53', 'KRAS'], 2: ['EGFR']}
+    assert bundle['cluster_count'] == {1: 2, 2: 1}
+    assert bundle['cluster_driver_hits'] == {1: {'TP53'}, 2: {'EGFR'}}
+    assert bundle['mut_count_dict'] == {1: 2, 2: 1}
+    assert bundle['treatments_df'] is None
+    assert load_phylogic_bundle(cluster_ccfs_fn, tree_fn, maf_fn, drivers_fn=drivers_fn,
+                                maf_participant_id_col='Patient_ID', maf_hugo_col='Hugo_Symbol',
+                                maf_chromosome_col='Chromosome', maf_start_pos_col='Start_position',
+                                maf_cluster_col='Cluster_Assignment') is bundle
+
+    tree, possible_trees = gen_phylogicNDT_tree(bundle, 0)
+    edge_labels = [element['data']['label'] for element in tree.elements if 'source' in element['data']]
+    assert edge_labels == ['2\nTP53 \n', '1\nEGFR \n']
+
+
+def test_ccf_pmf_plot(tmp_path):
+    maf_fn = str(tmp_path / 'mut_ccfs.tsv')
+    pd.DataFrame({
+        'Sample_ID': ['s1', 's1', 's1', 's2', 's2'],
+        'Hugo_Symbol': ['TP53', 'KRAS', 'EGFR', 'TP53', 'EGFR'],
+        'Chromosome': [17, 12, 7, 17, 7],
+        'Start_position': [100, 200, 300, 100, 300],
+        'Reference_Allele': 'A',
+        'Tumor_Seq_Allele': 'T',
+        'Cluster_Assignment': [1, 1, 2, 1, 2],
+        '0.00': [0.2, 0.6, 1.0, 0.0, 0.5],
+        '0.50': [0.8, 0.4, 0.0, 1.0, 0.5],
+    }).to_csv(maf_fn, sep='\t', index=False)
+    data_df = pd.DataFrame({'maf_fn': [maf_fn]}, index=['p1'])
+    cols = dict(maf_sample_id_col='Sample_ID', maf_cluster_col='Cluster_Assignment', maf_hugo_col='Hugo_Symbol',
+                maf_chromosome_col='Chromosome', maf_start_pos_col='Start_position')
+
+    fig, sample_list = ccf_pmf_plot(data_df, 'p1', None, True, None, None, **cols)
+    assert list(sample_list) == ['s1', 's2']
+    bars = {(trace.name, trace.yaxis): list(np.round(trace.y, 6)) for trace in fig.data}
+    assert bars == {('1', 'y'): [0.4, 0.6], ('1', 'y2'): [0.0, 1.0], ('2', 'y'): [1.0, 0.0], ('2', 'y2'): [0.5, 0.5]}
+
+    fig, sample_list = ccf_pmf_plot(data_df, 'p1', None, False, ['12:200A>T'], None, **cols)
+    assert list(sample_list) == ['s1']
+    assert [(trace.name, list(trace.y)) for trace in fig.data] == [('KRAS - 12:200', [0.6, 0.4])]
+
+    # non-default start position column
+    pd.read_csv(maf_fn, sep='\t').rename(columns={'Start_position': 'POS'}).to_csv(maf_fn, sep='\t', index=False)
+    fig, sample_list = ccf_pmf_plot(data_df, 'p1', None, False, ['12:200A>T'], None, **{**cols, 'maf_start_pos_col': 'POS'})
+    assert [(trace.name, list(trace.y)) for trace in fig.data] == [('KRAS - 12:200', [0.6, 0.4])]
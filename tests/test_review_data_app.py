@@ -0,0 +1,389 @@
+import pathlib
+import threading
+import pandas as pd
+import pytest
+from concurrent.futures import ThreadPoolExecutor, wait
+from dash import Dash, html
+from dash.dependencies import Output
+from AnnoMate.ReviewDataApp import ReviewDataApp, AppComponent
+from AnnoMate.Reviewers.ExampleReviewer import ExampleReviewer
+
+tutorial_dir = pathlib.Path(__file__).parents[1] / 'tutorial_notebooks'
+review_table_cols = ['gender', 'age']
+
+
+def gen_example_reviewer(tmp_path, monkeypatch):
+    """ExampleReviewer on the tutorial data, ready to run"""
+    monkeypatch.chdir(tutorial_dir)
+    df = pd.read_csv('example_data/AnnoMate_Tutorial/data_to_review_example.tsv', sep='\t').set_index('sample_id')
+
+    reviewer = ExampleReviewer()
+    reviewer.set_review_data(data_path=str(tmp_path / 'review_data'), description='Review data app test',
+                             sample_df=df, preprocessing_str='Testing preprocessing')
+    reviewer.set_review_app(mut_file_col='mutations_file', sample_cols=review_table_cols)
+    reviewer.set_default_review_data_annotations_configuration()
+    reviewer.set_default_autofill()
+    return reviewer
+
+
+def run_reviewer_app(reviewer, monkeypatch, **run_kwargs):
+    """Run the reviewer and return its dash app without starting the server"""
+    captured = {}
+    monkeypatch.setattr(Dash, 'run', lambda self, *args, **kwargs: captured.update(app=self))
+    with pytest.warns(UserWarning, match='test mode'):
+        reviewer.run(review_data_table_df=reviewer.review_data_interface.data.df[review_table_cols], **run_kwargs)
+    # raise callback errors in the tests
+    captured['app'].server.testing = True
+    return captured['app']
+
+
+def run_example_reviewer(tmp_path, monkeypatch, **run_kwargs):
+    reviewer = gen_example_reviewer(tmp_path, monkeypatch)
+    return reviewer, run_reviewer_app(reviewer, monkeypatch, **run_kwargs)
+
+
+def call_callback(app, callback_name, values, trigger, output_id=None):
+    """
+    Call a registered callback through the dash server like the browser does
+
+    values maps (component id, property) to the value of the callback inputs and states. Returns the updated
+    {component id: {property: value}}, or None if the callback prevented the update.
+    """
+    keys = [
+        key for key, callback in app.callback_map.items()
+        if callback['callback'].__name__ == callback_name and (output_id is None or f'..{output_id}.' in f'..{key}')
+    ]
+    assert len(keys) == 1, keys
+    callback = app.callback_map[keys[0]]
+
+    def fill(io_list):
+        return [dict(**io, value=values.get((io['id'], io['property']))) for io in io_list]
+
+    outputs = [
+        dict(zip(['id', 'property'], output.strip('.').rsplit('.', 1)))
+        for output in keys[0].strip('.').split('...')
+    ]
+    response = app.server.test_client().post('/_dash-update-component', json={
+        'output': keys[0],
+        'outputs': outputs,
+        'inputs': fill(callback['inputs']),
+        'state': fill(callback['state']),
+        'changedPropIds': [f'{trigger[0]}.{trigger[1]}'],
+    })
+    if response.status_code == 204:
+        return None
+    assert response.status_code == 200, response.data.decode()
+    return response.get_json()['response']
+
+
+def test_gen_dropdown_search_options():
+    reviewed_data_df = pd.DataFrame(
+        {'label': ['b-12', 'A-1', 'B-2', 'c-1b', 'b-1', 'a-2']},
+        index=pd.Index(['b-12', 'A-1', 'B-2', 'c-1b', 'b-1', 'a-2'], name='value'),
+    )
+    app = ReviewDataApp()
+    app.set_dropdown_search_index(reviewed_data_df.index)
+
+    def option_values(*args, **kwargs):
+        return [option['value'] for option in app.gen_dropdown_search_options(reviewed_data_df, *args, **kwargs)]
+
+    # case insensitive prefix matches first, then substring matches, each in dropdown order
+    assert option_values('B') == ['b-12', 'B-2', 'b-1', 'c-1b']
+    assert option_values('-1') == ['b-12', 'A-1', 'c-1b', 'b-1']
+    assert option_values('b-1') == ['b-12', 'b-1']
+    assert option_values('1') == ['b-12', 'A-1', 'c-1b', 'b-1']
+    assert option_values('x') == []
+
+    # capped at max_options, keeping the first prefix matches
+    assert option_values('b', max_options=2) == ['b-12', 'B-2']
+    assert option_values('a', max_options=3) == ['A-1', 'a-2']
+    assert option_values(max_options=2) == ['b-12', 'A-1']
+
+    # the current value is always included
+    assert option_values('b', 'c-1b', max_options=2) == ['c-1b', 'b-12', 'B-2']
+    assert option_values('b', 'B-2', max_options=2) == ['b-12', 'B-2']
+
+
+def test_prefetch_subjects():
+    prefetched = []
+
+    def prefetch_callback(data, subject):
+        prefetched.append(subject)
+        if subject == 'bad':
+            raise ValueError('missing file')
+
+    app = ReviewDataApp()
+    app.ordered_more_components = {
+        'component': AppComponent('component', html.Div(children=[]), prefetch_callback=prefetch_callback)
+    }
+    app.prefetch_executor = ThreadPoolExecutor(max_workers=1)
+
+    app.prefetch_subjects(None, ['a', 'bad'])
+    wait(list(app.prefetch_futures.values()))
+
+    # finished prefetches are dropped and failures reported
+    with pytest.warns(UserWarning, match='Prefetching subject bad failed'):
+        app.prefetch_subjects(None, ['a'])
+    wait(list(app.prefetch_futures.values()))
+    assert prefetched == ['a', 'bad', 'a']
+
+    app.prefetch_subjects(None, [])
+    assert app.prefetch_futures == {}
+    app.prefetch_executor.shutdown()
+
+
+def test_gen_review_data_table_view():
+    app = ReviewDataApp()
+    app.review_data_table_data_df = pd.DataFrame(
+        {
+            'gender': ['female', 'male', 'male', 'female', 'male'],
+            'age': [57, 66, 65, 31, 40],
+            'Notes': ['ok 1', '', 'redo 2', '12', 'ok (2)'],
+        },
+        index=pd.Index(['s0', 's1', 's2', 's3', 's4'], name='index'),
+    )
+
+    def view_index(filter_query, sort_by=[]):
+        return app.gen_review_data_table_view(filter_query, sort_by).index.tolist()
+
+    assert view_index('') == ['s0', 's1', 's2', 's3', 's4']
+
+    # numeric column
+    assert view_index('{age} = 66') == ['s1']
+    assert view_index('{age} != 66') == ['s0', 's2', 's3', 's4']
+    assert view_index('{age} < 57') == ['s3', 's4']
+    assert view_index('{age} <= 57') == ['s0', 's3', 's4']
+    assert view_index('{age} > 57') == ['s1', 's2']
+    assert view_index('{age} >= 65') == ['s1', 's2']
+    assert view_index('{age} contains 6') == ['s1', 's2']
+    assert view_index('{age} datestartswith 6') == ['s1', 's2']
+
+    # string columns, including numbers typed in the filter
+    assert view_index('{gender} = male') == ['s1', 's2', 's4']
+    assert view_index('{gender} ne male') == ['s0', 's3']
+    assert view_index('{gender} < m') == ['s0', 's3']
+    assert view_index('{gender} >= m') == ['s1', 's2', 's4']
+    assert view_index('{gender} contains fem') == ['s0', 's3']
+    assert view_index('{gender} datestartswith fe') == ['s0', 's3']
+    assert view_index('{Notes} = 12') == ['s3']
+    assert view_index('{Notes} = "12"') == ['s3']
+    assert view_index('{Notes} contains 1') == ['s0', 's3']
+    assert view_index('{Notes} contains (2') == ['s4']
+    assert view_index('{gender} = male && {age} > 65') == ['s1']
+
+    # multi column sorting and paging
+    sort_by = [{'column_id': 'gender', 'direction': 'desc'}, {'column_id': 'age', 'direction': 'asc'}]
+    assert view_index('', sort_by) == ['s4', 's2', 's1', 's3', 's0']
+    assert view_index('{age} > 40', sort_by) == ['s2', 's1', 's0']
+    page_records, page_count = app.gen_review_data_table_page(1, 2, '', sort_by)
+    assert [r['index'] for r in page_records] == ['s1', 's3']
+    assert page_count == 3
+    assert app.gen_review_data_table_page(0, 2, '{age} > 100', sort_by) == ([], 1)
+
+
+def test_server_review_data_table(tmp_path, monkeypatch):
+    reviewer, app = run_example_reviewer(tmp_path, monkeypatch, review_data_table_mode='server',
+                                         review_data_table_page_size=2)
+    df = reviewer.review_data_interface.data.df
+    filter_query = '{gender} = male'
+    sort_by = [{'column_id': 'age', 'direction': 'desc'}, {'column_id': 'index', 'direction': 'asc'}]
+    view_index = df.loc[df['gender'] == 'male'].reset_index().sort_values(
+        ['age', 'sample_id'], ascending=[False, True]
+    )['sample_id'].tolist()
+    table_state = {
+        ('APP-review-data-table', 'page_current'): 1,
+        ('APP-review-data-table', 'filter_query'): filter_query,
+        ('APP-review-data-table', 'sort_by'): sort_by,
+    }
+
+    response = call_callback(app, 'update_review_data_table_page', table_state,
+                             trigger=('APP-review-data-table', 'page_current'))
+    assert [r['index'] for r in response['APP-review-data-table']['data']] == view_index[2:4]
+    assert [r['age'] for r in response['APP-review-data-table']['data']] == df.loc[view_index[2:4], 'age'].tolist()
+    assert response['APP-review-data-table']['page_count'] == -(-len(view_index) // 2)
+
+    # the selected row is resolved against the filtered and sorted view
+    response = call_callback(
+        app, 'update_sample_via_review_table',
+        {**table_state, ('APP-review-data-table', 'selected_rows'): [1]},
+        trigger=('APP-review-data-table', 'selected_rows')
+    )
+    assert response['APP-dropdown-data-state']['value'] == view_index[3]
+
+    # and the dropdown moves the table to the subject's page and row
+    response = call_callback(
+        app, 'update_sample_via_dropdown',
+        {**table_state, ('APP-dropdown-data-state', 'value'): view_index[4]},
+        trigger=('APP-dropdown-data-state', 'value')
+    )
+    assert response['APP-review-data-table']['page_current'] == 2
+    assert response['APP-review-data-table']['selected_rows'] == [0]
+
+
+def test_submit_button_annotation(tmp_path, monkeypatch):
+    reviewer, app = run_example_reviewer(tmp_path, monkeypatch)
+    review_data = reviewer.review_data_interface
+    subject = review_data.data.index[2]
+    values = {
+        ('APP-submit-button-state', 'n_clicks'): 1,
+        ('APP-dropdown-data-state', 'value'): subject,
+        ('APP-Notes-TextAreaAnnotationDisplay-input-state', 'value'): 'looks good',
+        ('APP-Flag-RadioitemAnnotationDisplay-input-state', 'value'): 'Remove',
+    }
+
+    response = call_callback(app, 'submit_button_annotation', values, trigger=('APP-submit-button-state', 'n_clicks'))
+    assert [(r['index'], r['Notes'], r['Flag']) for r in response['APP-history-table']['data']] == \
+        [(subject, 'looks good', 'Remove')]
+
+    # only the submitted subject's dropdown option and table row are sent back
+    dropdown_operations = response['APP-dropdown-data-state']['options']['operations']
+    assert len(dropdown_operations) == 1
+    assert dropdown_operations[0]['location'] == [2]
+    assert dropdown_operations[0]['params']['value']['value'] == subject
+    assert dropdown_operations[0]['params']['value']['label'].startswith(f'{subject} (Last update: ')
+    table_operations = response['APP-review-data-table']['data']['operations']
+    assert len(table_operations) == 1
+    assert table_operations[0]['location'] == [2]
+    assert table_operations[0]['params']['value'] == {
+        'index': subject, 'gender': review_data.data.df.loc[subject, 'gender'],
+        'age': review_data.data.df.loc[subject, 'age'], 'Notes': 'looks good', 'Flag': 'Remove'
+    }
+
+    # every annotation is validated, not only the first one
+    values[('APP-Flag-RadioitemAnnotationDisplay-input-state', 'value')] = 'Maybe'
+    with pytest.raises(ValueError, match='Maybe'):
+        call_callback(app, 'submit_button_annotation', values, trigger=('APP-submit-button-state', 'n_clicks'))
+    assert review_data.data.annot_df.loc[subject, 'Flag'] == 'Remove'
+    assert review_data.data.history_df.shape[0] == 1
+
+
+def gen_div_component(name, new_data_callback):
+    return AppComponent(name, html.Div(children=[], id=f'{name}-div'), callback_output=[Output(f'{name}-div', 'children')],
+                        new_data_callback=new_data_callback)
+
+
+def select_subject_values(reviewer, subject):
+    """Inputs and states of update_sample_via_dropdown for a native review data table"""
+    table_data = reviewer.app.review_data_table_data_df.reset_index().to_dict('records')
+    return {
+        ('APP-dropdown-data-state', 'value'): subject,
+        ('APP-review-data-table', 'data'): table_data,
+        ('APP-review-data-table', 'derived_virtual_data'): table_data,
+    }
+
+
+def test_component_executor(tmp_path, monkeypatch):
+    fast_done = threading.Event()
+
+    def slow_callback(data, idx):
+        # finishes after the component added after it
+        assert fast_done.wait(timeout=10)
+        return [f'{idx} slow']
+
+    def fast_callback(data, idx):
+        fast_done.set()
+        return [f'{idx} fast']
+
+    def failing_callback(data, idx):
+        raise ValueError('missing file')
+
+    reviewer = gen_example_reviewer(tmp_path, monkeypatch)
+    for component in [gen_div_component('slow', slow_callback), gen_div_component('failing', failing_callback),
+                      gen_div_component('fast', fast_callback)]:
+        reviewer.app.add_component(component)
+    app = run_reviewer_app(reviewer, monkeypatch, component_executor_workers=3)
+
+    subject = reviewer.review_data_interface.data.index[1]
+    with pytest.warns(UserWarning, match=r'Component \(failing\) new_data_callback failed for sample_1'):
+        response = call_callback(app, 'update_sample_via_dropdown', select_subject_values(reviewer, subject),
+                                 trigger=('APP-dropdown-data-state', 'value'))
+    # each output goes to its own component, and the failing component is not updated
+    assert response['slow-div'] == {'children': f'{subject} slow'}
+    assert response['fast-div'] == {'children': f'{subject} fast'}
+    assert 'failing-div' not in response
+    assert response['APP-history-table']['data'] == []
+    reviewer.app.component_executor.shutdown()
+
+
+def test_component_executor_matches_serial(tmp_path, monkeypatch):
+    responses = []
+    for component_executor_workers in [None, 1, 3]:
+        reviewer = gen_example_reviewer(tmp_path / str(component_executor_workers), monkeypatch)
+        reviewer.app.add_component(gen_div_component('subject', lambda data, idx: [idx]))
+        app = run_reviewer_app(reviewer, monkeypatch, component_executor_workers=component_executor_workers)
+        responses.append(call_callback(
+            app, 'update_sample_via_dropdown', select_subject_values(reviewer, 'sample_3'),
+            trigger=('APP-dropdown-data-state', 'value')
+        ))
+        assert (reviewer.app.component_executor is not None) == (component_executor_workers == 3)
+
+    assert responses[0]['subject-div'] == {'children': 'sample_3'}
+    assert responses[1] == responses[0]
+    assert responses[2] == responses[0]
+    reviewer.app.component_executor.shutdown()
+
+
+def test_per_component_callbacks(tmp_path, monkeypatch):
+    def record_new_data_callbacks(reviewer, calls):
+        def recorded(name, new_data_callback):
+            def new_data_callback_recorder(data, *args):
+                calls.append((name, args))
+                return new_data_callback(data, *args)
+            return new_data_callback_recorder
+
+        for component in reviewer.app.more_components.values():
+            component.new_data_callback = recorded(component.name, component.new_data_callback)
+
+    subject = 'sample_1'
+    component_state_values = {('mut-figure-color-radioitem', 'value'): 'blue'}
+
+    single_calls = []
+    reviewer = gen_example_reviewer(tmp_path / 'single', monkeypatch)
+    record_new_data_callbacks(reviewer, single_calls)
+    app = run_reviewer_app(reviewer, monkeypatch)
+    single_response = call_callback(
+        app, 'update_sample_via_dropdown', {**select_subject_values(reviewer, subject), **component_state_values},
+        trigger=('APP-dropdown-data-state', 'value')
+    )
+
+    per_component_calls = []
+    reviewer = gen_example_reviewer(tmp_path / 'per_component', monkeypatch)
+    record_new_data_callbacks(reviewer, per_component_calls)
+    app = run_reviewer_app(reviewer, monkeypatch, component_callback_mode='per_component')
+
+    # one callback per component, updating only that component from the dropdown value and its own states
+    component_callbacks = {
+        key: callback for key, callback in app.callback_map.items()
+        if callback['callback'].__name__ == 'update_component_via_dropdown'
+    }
+    components = list(reviewer.app.more_components.values())
+    assert len(component_callbacks) == len(components)
+    for component, (key, callback) in zip(components, component_callbacks.items()):
+        assert [output.split('@')[0] for output in key.strip('.').split('...')] == \
+            [f'{output.component_id}.{output.component_property}' for output in component.callback_output]
+        assert callback['inputs'] == [{'id': 'APP-dropdown-data-state', 'property': 'value'}]
+        assert callback['state'] == [
+            {'id': c.component_id, 'property': c.component_property}
+            for c in component.callback_input + component.callback_state + component.callback_state_external
+        ]
+
+    # the subject switching callback leaves the components to their own callbacks
+    response = call_callback(
+        app, 'update_sample_via_dropdown', {**select_subject_values(reviewer, subject), **component_state_values},
+        trigger=('APP-dropdown-data-state', 'value')
+    )
+    assert per_component_calls == []
+    assert not any(output.component_id in response for component in components for output in component.callback_output)
+    assert response['APP-history-table'] == single_response['APP-history-table']
+
+    for component in components:
+        output_id = component.callback_output[0].component_id
+        values = {('APP-dropdown-data-state', 'value'): subject, **component_state_values}
+        response = call_callback(app, 'update_component_via_dropdown', values,
+                                 trigger=('APP-dropdown-data-state', 'value'), output_id=output_id)
+        assert response[output_id] == single_response[output_id]
+        values[('APP-dropdown-data-state', 'value')] = None
+        assert call_callback(app, 'update_component_via_dropdown', values,
+                             trigger=('APP-dropdown-data-state', 'value'), output_id=output_id) is None
+    assert per_component_calls == single_calls
+    assert single_calls[-1] == ('Mut vafs', (subject, 'blue'))
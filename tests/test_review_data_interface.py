@@ -0,0 +1,125 @@
+import os
+import pandas as pd
+from AnnoMate.Reviewers.ExampleReviewer import ExampleReviewer
+from AnnoMate.ReviewDataInterface import load_data_pkl
+
+
+def gen_reviewer(data_path, **kwargs):
+    fn = 'tutorial_notebooks/example_data/AnnoMate_Tutorial/data_to_review_example.tsv'
+    df = pd.read_csv(fn, sep='\t').set_index('sample_id')
+
+    my_reviewer = ExampleReviewer()
+    my_reviewer.set_review_data(data_path=data_path,
+                                description='Testing review data interface',
+                                sample_df=df,
+                                preprocessing_str='Testing preprocessing',
+                                **kwargs)
+    my_reviewer.set_default_review_data_annotations()
+    return my_reviewer
+
+
+def test_journal(tmp_path):
+    data_path = str(tmp_path / 'journal_reviewer_data')
+    my_reviewer = gen_reviewer(data_path, journal=True, journal_compact_every=3)
+    review_data_interface = my_reviewer.review_data_interface
+    review_data_interface.mh.set_attribute('freeze_data', True)
+    subjects = review_data_interface.data.index
+
+    pkl_mtime = os.path.getmtime(review_data_interface.data_pkl_fn)
+    review_data_interface._update(subjects[0], {'Notes': 'first', 'Flag': 'Keep'})
+    review_data_interface._update(subjects[1], {'Notes': 'second', 'Flag': 'Remove'})
+
+    # updates are journaled, the pickle file is untouched
+    assert os.path.exists(review_data_interface.journal_fn)
+    assert os.path.getmtime(review_data_interface.data_pkl_fn) == pkl_mtime
+
+    # journal is replayed on load
+    data = load_data_pkl(review_data_interface.data_pkl_fn)
+    assert data.annot_df.loc[subjects[1], 'Notes'] == 'second'
+    assert data.history_df.shape[0] == 2
+    assert pd.api.types.is_datetime64_any_dtype(data.history_df['timestamp'])
+
+    # reloading the frozen session replays and compacts the journal
+    my_reviewer = gen_reviewer(data_path, journal=True)
+    assert my_reviewer.get_annot().loc[subjects[0], 'Flag'] == 'Keep'
+    assert my_reviewer.get_history()['index'].tolist() == subjects[:2]
+    assert not os.path.exists(my_reviewer.review_data_interface.journal_fn)
+
+    # full pickle is rewritten every journal_compact_every updates
+    review_data_interface = my_reviewer.review_data_interface
+    review_data_interface.journal_compact_every = 2
+    review_data_interface._update(subjects[2], {'Notes': 'third', 'Flag': 'Keep'})
+    review_data_interface._update(subjects[3], {'Notes': 'fourth', 'Flag': 'Keep'})
+    assert not os.path.exists(review_data_interface.journal_fn)
+    assert load_data_pkl(review_data_interface.data_pkl_fn).history_df.shape[0] == 4
+
+
+def test_journal_compaction_crash(tmp_path):
+    data_path = str(tmp_path / 'journal_crash_reviewer_data')
+    my_reviewer = gen_reviewer(data_path, journal=True)
+    review_data_interface = my_reviewer.review_data_interface
+    subjects = review_data_interface.data.index
+
+    review_data_interface._update(subjects[0], {'Notes': 'first', 'Flag': 'Keep'})
+    review_data_interface._update(subjects[1], {'Notes': 'second', 'Flag': 'Remove'})
+    with open(review_data_interface.journal_fn, 'rb') as f:
+        journal = f.read()
+
+    # process dies after the compacted pickle replaced the old one, but before the journal was removed
+    review_data_interface.save_data()
+    with open(review_data_interface.journal_fn, 'wb') as f:
+        f.write(journal)
+
+    data = load_data_pkl(review_data_interface.data_pkl_fn)
+    assert data.history_df['index'].tolist() == subjects[:2]
+
+    # later updates are still replayed
+    review_data_interface._update(subjects[2], {'Notes': 'third', 'Flag': 'Keep'})
+    data = load_data_pkl(review_data_interface.data_pkl_fn)
+    assert data.history_df['index'].tolist() == subjects[:3]
+    assert data.annot_df.loc[subjects[2], 'Notes'] == 'third'
+
+
+def test_split_storage_layout(tmp_path):
+    data_path = str(tmp_path / 'split_reviewer_data')
+    my_reviewer = gen_reviewer(data_path, storage_layout='split')
+    review_data_interface = my_reviewer.review_data_interface
+    review_data_interface.mh.set_attribute('freeze_data', True)
+    df = my_reviewer.get_data_attribute('df')
+    subject = review_data_interface.data.index[0]
+
+    df_fn = f'{review_data_interface.data_inputs_dir}/df.pkl'
+    df_mtime = os.path.getmtime(df_fn)
+    review_data_interface._update(subject, {'Notes': 'split', 'Flag': 'Keep'})
+    assert os.path.getmtime(df_fn) == df_mtime
+
+    # input attributes are only read when accessed
+    data = load_data_pkl(review_data_interface.data_pkl_fn)
+    assert 'df' not in vars(data)
+    assert data.annot_df.loc[subject, 'Notes'] == 'split'
+    assert data.list_attributes() == ['index', 'description', 'annot_col_config_dict', 'annot_df', 'history_df', 'df']
+    assert data.df.equals(df)
+
+    my_reviewer = gen_reviewer(data_path, storage_layout='split')
+    assert my_reviewer.get_data_attribute('df').equals(df)
+    assert my_reviewer.get_annot().loc[subject, 'Notes'] == 'split'
+
+
+def test_history_index(tmp_path):
+    my_reviewer = gen_reviewer(str(tmp_path / 'history_reviewer_data'))
+    review_data_interface = my_reviewer.review_data_interface
+    subjects = review_data_interface.data.index
+
+    assert review_data_interface.get_last_update(subjects[0]) is None
+    review_data_interface._update(subjects[0], {'Notes': 'a', 'Flag': 'Keep'})
+    review_data_interface._update(subjects[1], {'Notes': 'b', 'Flag': 'Keep'})
+    review_data_interface._update(subjects[0], {'Notes': 'c', 'Flag': 'Remove'})
+
+    subject_history = review_data_interface.get_subject_history(subjects[0])
+    assert subject_history['Notes'].tolist() == ['a', 'c']
+    assert review_data_interface.get_last_update(subjects[0]) == subject_history['timestamp'].iloc[-1]
+
+    # index is rebuilt when the history table is replaced
+    review_data_interface.data.history_df = review_data_interface.data.history_df.iloc[:1]
+    assert review_data_interface.get_subject_history(subjects[0])['Notes'].tolist() == ['a']
+    assert review_data_interface.get_last_update(subjects[1]) is None
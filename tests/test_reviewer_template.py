@@ -0,0 +1,184 @@
+import functools
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from AnnoMate.Data import DataAnnotation
+from AnnoMate.DataTypes.PatientSampleData import PatientSampleData
+from AnnoMate.ReviewDataApp import ReviewDataApp
+from AnnoMate.ReviewerTemplate import ReviewerTemplate
+from AnnoMate.AppComponents.cache import clear_caches, get_cache_info, set_disk_cache_dir, get_disk_cache_dir
+from AnnoMate.AppComponents.CNVPlotComponent import gen_cnv_plot_app_component
+from AnnoMate.AppComponents.MutationTableComponent import gen_mutation_table_app_component
+from AnnoMate.AppComponents.PhylogicNDTComponents import gen_phylogicNDT_app_component, gen_ccf_pmf_component, \
+    gen_cluster_metrics_component
+
+
+class PatientReviewer(ReviewerTemplate):
+    def gen_data(self,
+                 description: str,
+                 participant_df: pd.DataFrame,
+                 sample_df: pd.DataFrame,
+                 annot_df: pd.DataFrame = None,
+                 annot_col_config_dict: Dict = None,
+                 history_df: pd.DataFrame = None,
+                 index: List = None,
+                 ) -> PatientSampleData:
+        """
+        Parameters
+        ----------
+        participant_df: pd.DataFrame
+            participants with their maf and PhylogicNDT files
+        sample_df: pd.DataFrame
+            samples with their seg file, purity and ploidy
+        """
+        return PatientSampleData(index=participant_df.index.tolist() if index is None else index,
+                                 description=description,
+                                 participant_df=participant_df,
+                                 sample_df=sample_df,
+                                 annot_df=annot_df,
+                                 annot_col_config_dict=annot_col_config_dict,
+                                 history_df=history_df)
+
+    def set_default_review_data_annotations(self):
+        self.add_review_data_annotation('Notes', DataAnnotation('string'))
+
+    def gen_review_app(self) -> ReviewDataApp:
+        """
+        App with the CNV plot, mutation table and PhylogicNDT components
+        """
+        maf_cols = dict(maf_sample_id_col='Sample_ID', maf_chromosome_col='Chromosome',
+                        maf_start_pos_col='Start_position', maf_cluster_col='Cluster_Assignment',
+                        maf_hugo_col='Hugo_Symbol')
+        app = ReviewDataApp()
+        app.add_component(gen_cnv_plot_app_component(), **maf_cols)
+        app.add_component(gen_mutation_table_app_component())
+        app.add_component(gen_phylogicNDT_app_component(), maf_participant_id_col='Patient_ID',
+                          **{k: v for k, v in maf_cols.items() if k != 'maf_sample_id_col'})
+        app.add_component(gen_ccf_pmf_component(), **maf_cols)
+        app.add_component(gen_cluster_metrics_component(), maf_variant_type_col='Variant_Type',
+                          maf_variant_class_col='Variant_Classification', maf_cluster_col='Cluster_Assignment')
+        return app
+
+    def set_default_review_data_annotations_app_display(self):
+        pass
+
+    def set_default_autofill(self):
+        pass
+
+
+def gen_patient_files(data_dir, participant, samples):
+    maf_rows = []
+    for i, sample in enumerate(samples):
+        seg_fn = str(data_dir / f'{sample}.seg')
+        pd.DataFrame({
+            'Chromosome': [1, 1, 2],
+            'Start.bp': [1, 100001, 1],
+            'End.bp': [100000, 5000000, 3000000],
+            'length': [99999, 4899999, 2999999],
+            'mu.major': [1.1, 1.2, 1.3],
+            'mu.minor': [0.9, 0.8, 0.7 + 0.1 * i],
+            'sigma.major': 0.05,
+            'sigma.minor': 0.05,
+            'tau': [2.0, 2.0, 2.1],
+        }).to_csv(seg_fn, sep='\t', index=False)
+        maf_rows.append(pd.DataFrame({
+            'Patient_ID': participant,
+            'Sample_ID': sample,
+            'Hugo_Symbol': ['TP53', 'KRAS', 'EGFR'],
+            'Chromosome': [1, 1, 2],
+            'Start_position': [5000, 200000, 300000],
+            'Reference_Allele': 'A',
+            'Tumor_Seq_Allele': 'T',
+            'Cluster_Assignment': [1, 1, 2],
+            't_alt_count': [20, 15, 5 + i],
+            't_ref_count': [30, 35, 45],
+            'Variant_Type': 'SNP',
+            'Variant_Classification': ['Missense_Mutation', 'Silent', 'Intron'],
+            '0.00': [0.0, 0.2, 0.6],
+            '0.50': [0.2, 0.3, 0.4],
+            '1.00': [0.8, 0.5, 0.0],
+        }))
+    maf_fn = str(data_dir / f'{participant}.mut_ccfs.txt')
+    pd.concat(maf_rows).to_csv(maf_fn, sep='\t', index=False)
+
+    cluster_ccfs_fn = str(data_dir / f'{participant}.cluster_ccfs.txt')
+    pd.DataFrame({
+        'Cluster_ID': np.repeat([1, 2], len(samples)),
+        'Sample_ID': samples * 2,
+        'postDP_ccf_mean': 0.5,
+        'postDP_ccf_CI_low': 0.4,
+        'postDP_ccf_CI_high': 0.6,
+    }).to_csv(cluster_ccfs_fn, sep='\t', index=False)
+    tree_fn = str(data_dir / f'{participant}.build_tree_posterior.txt')
+    pd.DataFrame({'n_iter': [30], 'edges': ['None-1,1-2']}).to_csv(tree_fn, sep='\t', index=False)
+
+    return {'maf_fn': maf_fn, 'cluster_ccfs_fn': cluster_ccfs_fn, 'build_tree_posterior_fn': tree_fn}
+
+
+def test_precompute_disk_cache(tmp_path, capsys):
+    participants = {'p1': ['p1_s1', 'p1_s2'], 'p2': ['p2_s1']}
+    participant_df = pd.DataFrame.from_dict(
+        {participant: gen_patient_files(tmp_path, participant, samples) for participant, samples in participants.items()},
+        orient='index'
+    )
+    sample_df = pd.DataFrame([
+        {'sample_id': sample, 'participant_id': participant, 'collection_date_dfd': i, 'wxs_purity': 0.7,
+         'wxs_ploidy': 2.1, 'cnv_seg_fn': str(tmp_path / f'{sample}.seg')}
+        for participant, samples in participants.items() for i, sample in enumerate(samples)
+    ]).set_index('sample_id')
+
+    my_reviewer = PatientReviewer()
+    my_reviewer.set_review_data(data_path=str(tmp_path / 'review_data'), description='Precompute test',
+                                participant_df=participant_df, sample_df=sample_df)
+    my_reviewer.set_review_app()
+
+    disk_cache_dir = str(tmp_path / 'disk_cache')
+    try:
+        assert my_reviewer.precompute(disk_cache_dir, n_workers=2) == {}
+        assert get_disk_cache_dir() is None
+
+        # subjects whose input files changed are processed again
+        stat = os.stat(participant_df.loc['p2', 'maf_fn'])
+        os.utime(participant_df.loc['p2', 'maf_fn'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        capsys.readouterr()
+        assert my_reviewer.precompute(disk_cache_dir, n_workers=1) == {}
+        assert 'Precomputing 1 subjects (1 already done)' in capsys.readouterr().out
+        stat = os.stat(tmp_path / 'p1_s2.seg')  # a sample of p1
+        os.utime(tmp_path / 'p1_s2.seg', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        my_reviewer.precompute(disk_cache_dir, n_workers=1)
+        assert 'Precomputing 1 subjects (1 already done)' in capsys.readouterr().out
+        my_reviewer.precompute(disk_cache_dir, n_workers=1)
+        assert 'Precomputing 0 subjects (2 already done)' in capsys.readouterr().out
+
+        # as in a new process: nothing cached in memory, every component loads its data from the disk cache
+        set_disk_cache_dir(disk_cache_dir)
+        clear_caches()
+        cache_info_before = get_cache_info()
+        data = my_reviewer.review_data_interface.data
+        for component in my_reviewer.app.more_components.values():
+            for participant in participants:
+                component.prefetch_callback(data, participant)
+        disk_hits = get_cache_info()['disk_hits'] - cache_info_before['disk_hits']
+        module = 'AnnoMate.AppComponents'
+        for loader in [f'{module}.CNVPlotComponent.gen_participant_cnv_and_maf',
+                       f'{module}.utils._read_maf',
+                       f'{module}.MutationTableComponent.load_column_summary',
+                       f'{module}.PhylogicNDTComponents.load_phylogic_bundle',
+                       f'{module}.PhylogicNDTComponents.load_ccf_pmf_tensor',
+                       f'{module}.PhylogicNDTComponents.gen_cluster_metric_figure']:
+            assert disk_hits[loader] == len(participants), loader
+    finally:
+        set_disk_cache_dir(None)
+        clear_caches()
+
+
+def test_clear_cache():
+    @functools.lru_cache(maxsize=2)
+    def gen_value(x):
+        return x * 2
+
+    gen_value(1)
+    PatientReviewer().clear_cache()
+    # unregistered functools.lru_cache functions are cleared too
+    assert gen_value.cache_info().currsize == 0